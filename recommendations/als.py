@@ -0,0 +1,178 @@
+"""
+Implicit-feedback matrix factorization (ALS) recommender.
+
+Follows Hu, Koren & Volinsky's implicit ALS: every scored (user, place) pair
+is a positive preference with confidence 1 + alpha * score, unobserved pairs
+are negative preferences with confidence 1. User and item factors are solved
+alternately in closed form. The trained artifact is a pair of float32 factor
+matrices of rank ~64 plus the id arrays, so serving is one dot product and a
+top-N, and retrains warm-start from the previous factors.
+"""
+import logging
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from recommendations import cache_keys, cache_management, selection, user_based
+
+logger = logging.getLogger(__name__)
+
+
+def get_als_settings():
+    als_settings = settings.RECOMMENDATION_SETTINGS.get('ALS_SETTINGS', {})
+    return {
+        'rank': als_settings.get('rank', 64),
+        'regularization': als_settings.get('regularization', 0.1),
+        'alpha': als_settings.get('alpha', 20.0),
+        'iterations': als_settings.get('iterations', 15),
+        'warm_start_iterations': als_settings.get('warm_start_iterations', 3),
+        'seed': als_settings.get('seed', 0),
+    }
+
+# --- Training ---
+
+def _solve_factors(confidence, fixed, regularization):
+    """
+    One ALS half-step: for every row u of `confidence` (CSR holding alpha * score),
+    solves (FᵀF + Fᵀ(C_u - I)F + λI) x_u = Fᵀ C_u p_u against the fixed factors F.
+    """
+    fixed = fixed.astype(np.float64)
+    rank = fixed.shape[1]
+    gram = fixed.T @ fixed + regularization * np.eye(rank)
+    solved = np.zeros((confidence.shape[0], rank), dtype=np.float32)
+    indptr, indices, data = confidence.indptr, confidence.indices, confidence.data
+    for row in range(confidence.shape[0]):
+        start, end = indptr[row], indptr[row + 1]
+        if start == end:
+            continue
+        factors = fixed[indices[start:end]]
+        extra = data[start:end].astype(np.float64)
+        lhs = gram + (factors.T * extra) @ factors
+        rhs = factors.T @ (extra + 1.0)
+        solved[row] = np.linalg.solve(lhs, rhs)
+    return solved
+
+def _initial_factors(ids, previous_ids, previous_factors, rank, rng):
+    """Small random factors, overwritten with the previous model's rows where ids match."""
+    factors = (rng.standard_normal((len(ids), rank)) * 0.01).astype(np.float32)
+    if previous_factors is None or previous_factors.shape[1] != rank:
+        return factors, 0
+    positions = np.searchsorted(previous_ids, ids).clip(max=max(len(previous_ids) - 1, 0))
+    reused = (previous_ids[positions] == ids) if len(previous_ids) else np.zeros(len(ids), dtype=bool)
+    factors[reused] = previous_factors[positions[reused]]
+    return factors, int(reused.sum())
+
+def train_als(user_item_matrix, user_ids, place_ids, previous_model=None, config=None):
+    """
+    Trains (or warm-starts) implicit ALS on a CSR user-item score matrix.
+    Returns the model dict stored in the cache.
+    """
+    config = config or get_als_settings()
+    rank, rng = config['rank'], np.random.default_rng(config['seed'])
+
+    confidence = user_item_matrix.astype(np.float32).tocsr()
+    confidence.data = np.clip(confidence.data, 0, None) * config['alpha']
+    confidence.eliminate_zeros()
+    confidence_t = confidence.T.tocsr()
+
+    previous_model = previous_model or {}
+    user_factors, reused_users = _initial_factors(
+        user_ids, previous_model.get('user_ids'), previous_model.get('user_factors'), rank, rng
+    )
+    item_factors, reused_items = _initial_factors(
+        place_ids, previous_model.get('place_ids'), previous_model.get('item_factors'), rank, rng
+    )
+    warm = reused_items > 0
+    iterations = config['warm_start_iterations'] if warm else config['iterations']
+
+    started = time.monotonic()
+    for _ in range(iterations):
+        user_factors = _solve_factors(confidence, item_factors, config['regularization'])
+        item_factors = _solve_factors(confidence_t, user_factors, config['regularization'])
+    logger.info(
+        f"ALS: {iterations} iterations ({'warm start' if warm else 'cold start'}, reused "
+        f"{reused_users} user / {reused_items} item factors) on {len(user_ids)}x{len(place_ids)} "
+        f"in {time.monotonic() - started:.2f}s."
+    )
+    return {
+        'user_ids': user_ids,
+        'place_ids': place_ids,
+        'user_factors': user_factors,
+        'item_factors': item_factors,
+        'rank': rank,
+        'trained_at': timezone.now(),
+    }
+
+def rebuild_als_model_cache(cold_start=False):
+    """
+    Retrains the ALS model from the materialized user-place scores and caches it.
+    Warm-starts from the cached model unless `cold_start`.
+    This function is intended to be called by a cache-building process (e.g., a task).
+    """
+    try:
+        all_interactions = user_based._load_user_place_scores()
+        if all_interactions.empty:
+            logger.warning("No interaction data available for ALS training.")
+            return {}
+        user_item_matrix, user_ids, place_ids = user_based.build_user_item_matrix(all_interactions)
+        previous_model = None if cold_start else cache.get(cache_keys.ALS_MODEL_KEY)
+        model = train_als(user_item_matrix, user_ids, place_ids, previous_model)
+
+        # Kept until the next retrain replaces it: readers serve the last published
+        # model, and the retrain warm-starts from it.
+        cache.set(cache_keys.ALS_MODEL_KEY, model, timeout=None)
+        size_mb = (model['user_factors'].nbytes + model['item_factors'].nbytes) / 2**20
+        logger.info(f"Successfully trained and cached ALS model ({size_mb:.1f} MB of factors).")
+        return model
+    except Exception as e:
+        logger.error(f"Error rebuilding ALS model cache: {e}", exc_info=True)
+        return {}
+
+def get_als_model(force_refresh=False):
+    """
+    Returns the last published ALS model, or {} if none has been trained yet, in
+    which case the global rebuild is queued to train it. Only `force_refresh=True`,
+    meant for cache-building processes, trains synchronously.
+    """
+    if force_refresh:
+        return rebuild_als_model_cache()
+    cached_value = cache.get(cache_keys.ALS_MODEL_KEY)
+    if cached_value is None:
+        logger.warning("No ALS model has been published yet; queued the global rebuild to train it.")
+        cache_management.request_global_rebuild()
+        return {}
+    return cached_value
+
+# --- Serving ---
+
+def get_als_recommendations(user_id, collab_data=None, num_recommendations=10, filter_interacted=True, model=None):
+    logger.info(f"ALS: Starting recommendations for user {user_id}")
+    try:
+        model = model or get_als_model()
+        if not model:
+            logger.warning(f"ALS: Exiting for user {user_id} because the model is not available.")
+            return []
+
+        user_ids = model['user_ids']
+        row = np.searchsorted(user_ids, user_id)
+        if row >= len(user_ids) or user_ids[row] != user_id:
+            logger.warning(f"ALS: User {user_id} is not in the model. Exiting.")
+            return []
+
+        scores = model['item_factors'] @ model['user_factors'][row]
+        place_ids = model['place_ids']
+        if filter_interacted:
+            user_interacted_places = cache_management.get_user_interacted_places(user_id)
+            if user_interacted_places:
+                keep = ~np.isin(place_ids, np.fromiter(user_interacted_places, dtype=np.int64))
+                place_ids, scores = place_ids[keep], scores[keep]
+
+        final_recs = place_ids[selection.top_n_positions(scores, num_recommendations)].tolist()
+        logger.info(f"ALS: User {user_id}: Successfully generated {len(final_recs)} final recommendations.")
+        return final_recs
+    except Exception as e:
+        logger.error(f"Error in ALS recommendations for user {user_id}: {e}", exc_info=True)
+        return []
@@ -0,0 +1,326 @@
+"""
+Whole-population batch layer.
+
+Computes the same hybrid scores as `hybrid.compute_hybrid_scores` for every
+target user at once: user-based scores as S·R (top-K neighbor similarities
+times the user-item matrix), item-based scores as R·S (ratings times the
+top-K item similarities) or ALS scores as U·Vᵀ, content-based scores as U·Pᵀ (user profiles
+against scaled item profiles) and the shared popularity ranking. Each
+component keeps its per-row top-N, and the rank-decayed, weighted blend is
+written to the cache with pipelined `set_many` calls.
+"""
+import logging
+import time
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+from django.utils import timezone
+from scipy.sparse import csr_matrix
+from sklearn.preprocessing import normalize
+
+from review_place.models import CustomUser, Review, PlaceLike, UserActivity
+from recommendations import (
+    als, cache_keys, content_based, data_utils, hybrid, item_based, popularity_based, selection, user_based
+)
+
+logger = logging.getLogger(__name__)
+
+NUM_CANDIDATES = 50  # per-model list length used by hybrid.compute_hybrid_scores
+
+
+def get_batch_settings():
+    batch_settings = settings.RECOMMENDATION_SETTINGS.get('BATCH', {})
+    return {
+        'active_days': batch_settings.get('active_days', 7),
+        'block_size': batch_settings.get('block_size', 1000),
+        'write_chunk_size': batch_settings.get('write_chunk_size', 1000),
+    }
+
+def get_active_user_ids(days=7):
+    since = timezone.now() - timedelta(days=days)
+    return np.fromiter(
+        CustomUser.objects.filter(last_login__gte=since).order_by('id').values_list('id', flat=True),
+        dtype=np.int64
+    )
+
+# --- Per-Row Top-N ---
+
+def _top_n_rows(scores, n):
+    """
+    Top-n columns of each row of a dense score block, best first.
+    Returns (positions, valid) of shape (rows, n); entries scored -inf are invalid.
+    """
+    positions, _ = selection.top_k_rows(scores, min(n, scores.shape[1]))
+    valid = positions >= 0
+    return np.where(valid, positions, 0), valid
+
+def _decayed_weights(valid, alpha):
+    """DECAY_ALPHA ** rank for each valid entry, normalized to sum to 1 per row."""
+    decay = np.where(valid, alpha ** np.arange(valid.shape[1]), 0.0)
+    totals = decay.sum(axis=1, keepdims=True)
+    return np.divide(decay, totals, out=np.zeros_like(decay), where=totals > 0)
+
+# --- Components ---
+
+def _rating_matrices(user_item_matrix):
+    """The positive ratings R and their 0/1 pattern, the two right-hand sides of S·R."""
+    ratings = user_item_matrix.astype(np.float64)
+    ratings.data[ratings.data < 0] = 0
+    ratings.eliminate_zeros()
+    rated = ratings.copy()
+    rated.data[:] = 1
+    return ratings, rated
+
+def _user_based_block(collab_rows, collab_data, ratings, rated, top_k):
+    """S·R for a block of users; -inf where no neighbor scored the place."""
+    user_item_matrix = collab_data['user_item_matrix']
+    scores = np.full((len(collab_rows), user_item_matrix.shape[1]), -np.inf)
+    known = collab_rows >= 0
+    if not known.any():
+        return scores
+
+    rows = collab_rows[known]
+    neighbor_index = collab_data['neighbor_index'][rows][:, :top_k]
+    neighbor_scores = collab_data['neighbor_scores'][rows][:, :top_k].astype(np.float64)
+    keep = (neighbor_index >= 0) & (neighbor_scores > 0)
+    block_rows = np.broadcast_to(np.arange(len(rows))[:, None], keep.shape)
+    similarity = csr_matrix(
+        (neighbor_scores[keep], (block_rows[keep], neighbor_index[keep])),
+        shape=(len(rows), user_item_matrix.shape[0])
+    )
+
+    weighted = (similarity @ ratings).toarray()
+    normalizer = (similarity @ rated).toarray()
+    scores[known] = np.where(normalizer > 0, weighted / np.where(normalizer > 0, normalizer, 1), -np.inf)
+    return scores
+
+def _item_based_inputs(collab_data):
+    """The user-item ratings re-indexed onto the item similarity matrix, or None."""
+    item_data = item_based.get_item_based_data()
+    if not item_data:
+        return None
+    item_positions = pd.Index(item_data['place_ids']).get_indexer(collab_data['place_ids'])
+    ratings = collab_data['user_item_matrix'].tocoo()
+    keep = (item_positions[ratings.col] >= 0) & (ratings.data > 0)
+    user_ratings = csr_matrix(
+        (ratings.data[keep].astype(np.float64), (ratings.row[keep], item_positions[ratings.col[keep]])),
+        shape=(ratings.shape[0], len(item_data['place_ids']))
+    )
+    return {'place_ids': item_data['place_ids'], 'item_similarity': item_data['item_similarity'], 'ratings': user_ratings}
+
+def _item_based_block(collab_rows, inputs):
+    """R·S for a block of users: summed similarities of the places they scored; -inf if none."""
+    scores = np.full((len(collab_rows), len(inputs['place_ids'])), -np.inf)
+    known = collab_rows >= 0
+    if known.any():
+        block_scores = (inputs['ratings'][collab_rows[known]] @ inputs['item_similarity']).toarray()
+        scores[known] = np.where(block_scores > 0, block_scores, -np.inf)
+    return scores
+
+def _als_block(user_block, model):
+    """U·Vᵀ for a block of users; rows of users missing from the model are all -inf."""
+    positions = np.searchsorted(model['user_ids'], user_block).clip(max=len(model['user_ids']) - 1)
+    known = model['user_ids'][positions] == user_block
+    scores = np.full((len(user_block), len(model['place_ids'])), -np.inf)
+    if known.any():
+        scores[known] = model['user_factors'][positions[known]] @ model['item_factors'].T
+    return scores
+
+def _content_based_inputs(collab_data):
+    """
+    Item profiles (from the shared content feature artifact) and the rating weights
+    needed to build every user profile at once. Returns None when content-based
+    scoring is unavailable.
+    """
+    features = content_based.get_content_features()
+    if not features:
+        return None
+
+    # Re-index the user-item matrix columns onto the profile rows.
+    profile_positions = pd.Index(features['place_ids']).get_indexer(collab_data['place_ids'])
+    ratings = collab_data['user_item_matrix'].tocoo()
+    keep = (profile_positions[ratings.col] >= 0) & (ratings.data > 0)
+    weights = csr_matrix(
+        (ratings.data[keep].astype(np.float64), (ratings.row[keep], profile_positions[ratings.col[keep]])),
+        shape=(ratings.shape[0], len(features['place_ids']))
+    )
+
+    return {
+        'user_ids': features['user_ids'],
+        # Score columns follow the index rows; `weights` columns follow the profile rows.
+        'place_ids': features['index'].ids,
+        'profiles': features['profiles'].astype(np.float64),
+        'mean_profile': features['mean_profile'],
+        'scaled_profiles': features['index'].vectors,
+        'scaler': features['scaler'],
+        'weights': weights,
+    }
+
+def _content_based_block(user_block, collab_rows, inputs):
+    """U·Pᵀ for a block of users; rows of users unknown to users_df are all -inf."""
+    profiles = inputs['profiles']
+    user_profiles = np.tile(inputs['mean_profile'], (len(user_block), 1))
+    known = collab_rows >= 0
+    if known.any():
+        weights = inputs['weights'][collab_rows[known]]
+        totals = np.asarray(weights.sum(axis=1)).ravel()
+        rated = totals > 0
+        weighted_profiles = np.asarray(weights @ profiles)
+        rows = np.flatnonzero(known)[rated]
+        user_profiles[rows] = weighted_profiles[rated] / totals[rated, None]
+
+    scaled_users = normalize(inputs['scaler'].transform(user_profiles))
+    scores = scaled_users @ inputs['scaled_profiles'].T
+    scores[~np.isin(user_block, inputs['user_ids'])] = -np.inf
+    return scores
+
+def _dynamic_weight_table(user_ids):
+    """`hybrid.get_dynamic_weights` for many users with three grouped COUNT queries."""
+    weight_config = settings.RECOMMENDATION_SETTINGS['WEIGHT_CONFIG']
+    totals = np.zeros(len(user_ids), dtype=np.int64)
+    querysets = [
+        Review.objects.all(),
+        PlaceLike.objects.all(),
+        UserActivity.objects.filter(activity_type='view', content_type_id=data_utils.get_place_content_type_id()),
+    ]
+    for queryset in querysets:
+        counts = pd.Series(dict(queryset.order_by().values_list('user_id').annotate(n=Count('id'))), dtype=np.int64)
+        totals += counts.reindex(user_ids, fill_value=0).to_numpy()
+
+    weights = np.empty((len(user_ids), 3))
+    weights[:] = weight_config['high_weight']
+    weights[totals < weight_config['medium_threshold']] = weight_config['medium_weight']
+    weights[totals < weight_config['low_threshold']] = weight_config['low_weight']
+    return weights
+
+def _adjust_weights(base_weights, available):
+    """Renormalizes weights over the models that returned results, as compute_hybrid_scores does."""
+    weights = np.where(available, base_weights, 0.0)
+    totals = weights.sum(axis=1, keepdims=True)
+    equal = available / np.maximum(available.sum(axis=1, keepdims=True), 1)
+    return np.where(totals > 0, weights / np.where(totals > 0, totals, 1), equal)
+
+# --- Driver ---
+
+def compute_batch_scores(user_ids, collab_data):
+    """
+    Yields (user_id, {place_id: hybrid_score}) for every user in `user_ids`,
+    computed block by block with matrix operations.
+    """
+    alpha = settings.RECOMMENDATION_SETTINGS['DECAY_ALPHA']
+    block_size = get_batch_settings()['block_size']
+    collab_data = collab_data or {}
+    has_collab = collab_data.get('user_item_matrix') is not None and len(collab_data.get('user_ids', [])) > 0
+
+    if has_collab:
+        collab_user_ids = collab_data['user_ids']
+        positions = np.searchsorted(collab_user_ids, user_ids).clip(max=len(collab_user_ids) - 1)
+        collab_rows = np.where(collab_user_ids[positions] == user_ids, positions, -1)
+        top_k = max(10, int(len(collab_user_ids) * 0.1))
+        ratings, rated = _rating_matrices(collab_data['user_item_matrix'])
+    else:
+        collab_rows = np.full(len(user_ids), -1)
+
+    # The collaborative slot is filled by user-based (S·R), item-based (R·S) or ALS (U·Vᵀ) scores.
+    collaborative_component = hybrid.get_collaborative_component()
+    item_inputs, als_model = None, None
+    if has_collab and collaborative_component == 'item_based':
+        item_inputs = _item_based_inputs(collab_data)
+    elif collaborative_component == 'als':
+        als_model = als.get_als_model()
+
+    content_inputs = None
+    if has_collab:
+        try:
+            content_inputs = _content_based_inputs(collab_data)
+        except Exception as e:
+            logger.error(f"Batch: content-based scoring unavailable: {e}")
+
+    popularity = np.asarray(popularity_based.get_popularity_based_recommendations(num_recommendations=NUM_CANDIDATES))
+    popularity_weights = _decayed_weights(np.ones((1, len(popularity)), dtype=bool), alpha)[0]
+    base_weights = _dynamic_weight_table(user_ids)
+
+    for start in range(0, len(user_ids), block_size):
+        end = min(start + block_size, len(user_ids))
+        block_users, block_rows = user_ids[start:end], collab_rows[start:end]
+        components = []
+
+        if als_model:
+            cf_top, cf_valid = _top_n_rows(_als_block(block_users, als_model), NUM_CANDIDATES)
+            components.append((als_model['place_ids'][cf_top], _decayed_weights(cf_valid, alpha), cf_valid))
+        elif item_inputs is not None:
+            cf_top, cf_valid = _top_n_rows(_item_based_block(block_rows, item_inputs), NUM_CANDIDATES)
+            components.append((item_inputs['place_ids'][cf_top], _decayed_weights(cf_valid, alpha), cf_valid))
+        elif has_collab and collaborative_component not in ('item_based', 'als'):
+            cf_top, cf_valid = _top_n_rows(_user_based_block(block_rows, collab_data, ratings, rated, top_k), NUM_CANDIDATES)
+            components.append((collab_data['place_ids'][cf_top], _decayed_weights(cf_valid, alpha), cf_valid))
+        else:
+            components.append(None)
+
+        if content_inputs is not None:
+            cb_top, cb_valid = _top_n_rows(_content_based_block(block_users, block_rows, content_inputs), NUM_CANDIDATES)
+            components.append((content_inputs['place_ids'][cb_top], _decayed_weights(cb_valid, alpha), cb_valid))
+        else:
+            components.append(None)
+
+        rows = len(block_users)
+        components.append((
+            np.broadcast_to(popularity, (rows, len(popularity))),
+            np.broadcast_to(popularity_weights, (rows, len(popularity))),
+            np.ones((rows, len(popularity)), dtype=bool)
+        ))
+
+        available = np.column_stack([
+            component[2].any(axis=1) if component is not None else np.zeros(rows, dtype=bool)
+            for component in components
+        ])
+        model_weights = _adjust_weights(base_weights[start:end], available)
+
+        for row, user_id in enumerate(block_users):
+            if not available[row].any():
+                continue
+            place_parts, score_parts = [], []
+            for model, component in enumerate(components):
+                if component is None or not available[row, model]:
+                    continue
+                place_ids, decay, valid = component
+                place_parts.append(place_ids[row][valid[row]])
+                score_parts.append(model_weights[row, model] * decay[row][valid[row]])
+            places, inverse = np.unique(np.concatenate(place_parts), return_inverse=True)
+            scores = np.bincount(inverse, weights=np.concatenate(score_parts))
+            yield int(user_id), dict(zip(places.tolist(), scores.tolist()))
+
+def generate_batch_recommendations(user_ids=None, collab_data=None):
+    """
+    Computes and caches hybrid scores for `user_ids` (default: users active in the
+    last `BATCH['active_days']` days). Returns the number of users written.
+    """
+    config = get_batch_settings()
+    timeout = settings.RECOMMENDATION_SETTINGS.get('CACHING', {}).get('GLOBAL_CACHE_TIMEOUT', 3600 * 2)
+    if user_ids is None:
+        user_ids = get_active_user_ids(config['active_days'])
+    user_ids = np.sort(np.asarray(user_ids, dtype=np.int64))
+    if len(user_ids) == 0:
+        logger.info("Batch: no users to process.")
+        return 0
+
+    started = time.monotonic()
+    collab_data = collab_data or user_based.get_user_collaborative_filtering_data()
+
+    written, pending = 0, {}
+    for user_id, scores in compute_batch_scores(user_ids, collab_data):
+        pending[cache_keys.batch_recommendations_key(user_id)] = scores
+        if len(pending) >= config['write_chunk_size']:
+            cache.set_many(pending, timeout=timeout)
+            written += len(pending)
+            pending = {}
+    if pending:
+        cache.set_many(pending, timeout=timeout)
+        written += len(pending)
+
+    logger.info(f"Batch: wrote recommendations for {written}/{len(user_ids)} users in {time.monotonic() - started:.2f}s.")
+    return written
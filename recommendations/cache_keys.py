@@ -6,23 +6,43 @@ from django.conf import settings
 # --- Key Constants ---
 # These are defined here to avoid magic strings in the recommendation engine.
 # They can be versioned by changing the string value.
-CLEANED_DATA_KEY = 'cleaned_data_all_v4'
-USER_COLLABORATIVE_FILTERING_DATA_KEY = 'user_collaborative_filtering_data_v1'
-SCALED_PROFILES_KEY = 'scaled_item_profiles_v3'
+CLEANED_DATA_GENERATION_KEY = 'cleaned_data_generation_v5'
+CLEANED_DATA_PART_KEY_TEMPLATE = 'cleaned_data_{generation}_{frame}_v5'
+CLEANED_DATA_WATERMARKS_KEY = 'cleaned_data_watermarks_v1'
+USER_COLLABORATIVE_FILTERING_DATA_KEY = 'user_collaborative_filtering_data_v4'
+ITEM_BASED_DATA_KEY = 'item_based_data_v1'
+ALS_MODEL_KEY = 'als_model_v1'
+CONTENT_FEATURES_KEY = 'content_features_v2'
+# {'generation', 'version'} of the published content feature artifact.
+CONTENT_FEATURES_VERSION_KEY = 'content_features_version_v1'
+# Stored without expiry; rows are reused for as long as a place's description hash is unchanged.
+DESCRIPTION_EMBEDDINGS_KEY = 'description_embeddings_v1'
 POPULARITY_RECS_KEY = 'popularity_recs_v1'
+# Set for a minute when a reader queues a rebuild, so a burst of misses queues it once.
+GLOBAL_REBUILD_REQUESTED_KEY = 'global_rebuild_requested_v1'
+SIMILAR_PLACES_REQUESTED_KEY = 'similar_places_requested_v1'
 USER_INTERACTED_PLACES_KEY_TEMPLATE = 'user_interacted_places_{user_id}_v2'
+USER_CONTENT_PROFILE_KEY_TEMPLATE = 'user_content_profile_{user_id}_v3'
+USER_CONTENT_PROFILE_SEQUENCE_KEY_TEMPLATE = 'user_content_profile_sequence_{user_id}_v1'
 
-
-# --- Key Generation Functions ---
+# Redis sets (raw client, not the Django cache) of ids changed since the last delta refresh.
+DIRTY_USERS_KEY = 'recs:dirty_users'
+DIRTY_PLACES_KEY = 'recs:dirty_places'
+# Users whose cached neighbors must be patched, and users patched since the
+# current full user-similarity build started (re-queued when it is published).
+DIRTY_NEIGHBOR_USERS_KEY = 'recs:dirty_neighbor_users'
+PATCHED_NEIGHBOR_USERS_KEY = 'recs:patched_neighbor_users'
+# Redis hash (raw client) of {place_id: comma-separated similar place ids}.
+SIMILAR_PLACES_KEY = 'recs:similar_places'
 
 
+# --- Key Generation Functions ---
 
-def place_similar_key(place_id):
+def cleaned_data_part_key(generation, frame_name):
     """
-    Generate cache key for similar places using a template from settings.
+    Generate cache key for one frame of a cleaned data generation.
     """
-    template = settings.RECOMMENDATION_SETTINGS['CACHING'].get('SIMILAR_PLACES_KEY_TEMPLATE', 'similar_to:{place_id}_v1')
-    return template.format(place_id=place_id)
+    return CLEANED_DATA_PART_KEY_TEMPLATE.format(generation=generation, frame=frame_name)
 
 def batch_recommendations_key(user_id):
     """
@@ -43,3 +63,15 @@ def user_interacted_places_key(user_id):
     Generate cache key for the set of places a user has interacted with.
     """
     return USER_INTERACTED_PLACES_KEY_TEMPLATE.format(user_id=user_id)
+
+def user_content_profile_key(user_id):
+    """
+    Generate cache key for a user's running content profile (weighted sum and weight).
+    """
+    return USER_CONTENT_PROFILE_KEY_TEMPLATE.format(user_id=user_id)
+
+def user_content_profile_sequence_key(user_id):
+    """
+    Generate cache key for the counter of a user's score changes.
+    """
+    return USER_CONTENT_PROFILE_SEQUENCE_KEY_TEMPLATE.format(user_id=user_id)
@@ -19,9 +19,9 @@ def get_user_interacted_places(user_id):
     if interacted_set is None:
         logger.info(f"Interacted places for user {user_id} not in cache. Calculating.")
 
-        # We need the full cleaned data to get all interactions
-        cleaned_data = data_utils.load_and_clean_all_data()
-        all_interactions_df = data_utils.get_all_scored_interactions(cleaned_data)
+        # Only the interaction frames are needed, not users or places.
+        interaction_data = data_utils.load_frames('reviews', 'likes', 'visits', 'shares')
+        all_interactions_df = data_utils.get_all_scored_interactions(interaction_data)
 
         if all_interactions_df.empty:
             interacted_set = set()
@@ -33,3 +33,30 @@ def get_user_interacted_places(user_id):
         cache.set(cache_key, interacted_set, timeout=timeout)
 
     return interacted_set
+
+def _queue_once(requested_key, task):
+    """Queues a Celery task unless it was queued under `requested_key` in the last minute."""
+    if not cache.add(requested_key, True, timeout=60):
+        return
+    try:
+        task.delay()
+        logger.info(f"Queued {task.name} for a missing shared artifact.")
+    except Exception as e:
+        logger.error(f"Could not queue {task.name}: {e}")
+
+def request_global_rebuild():
+    """
+    Queues the global rebuild for a reader that found a shared artifact missing;
+    readers never build one themselves. Does nothing while a rebuild is running
+    or was requested in the last minute.
+    """
+    from recommendations import tasks  # tasks imports the engine, which imports this module
+
+    if not tasks.is_lock_active():
+        _queue_once(cache_keys.GLOBAL_REBUILD_REQUESTED_KEY, tasks.schedule_global_rebuild_if_needed)
+
+def request_similar_places_rebuild():
+    """Queues the similar-places build for a reader that found none published, at most once a minute."""
+    from recommendations import tasks
+
+    _queue_once(cache_keys.SIMILAR_PLACES_REQUESTED_KEY, tasks.rebuild_similar_places_task)
@@ -1,48 +1,125 @@
 import pandas as pd
 import numpy as np
+import redis
 from django.core.cache import cache
-from sklearn.metrics.pairwise import cosine_similarity
+from gensim.models import KeyedVectors
 from sklearn.preprocessing import OneHotEncoder, StandardScaler
-from pythainlp.tokenize import word_tokenize
+from sklearn.preprocessing import normalize as l2_normalize
 from pythainlp.word_vector import WordVector
-from pythainlp.corpus import thai_stopwords
-from pythainlp.util import normalize
+import hashlib
 import logging
-import re
-import string
+import os
 import time
 from django.conf import settings
 
 from review_place.models import CustomUser
-from recommendations import cache_keys, data_utils, user_based, cache_management
+from recommendations.models import UserPlaceScore
+from recommendations import (
+    cache_keys, data_utils, user_based, cache_management, feature_store, vector_index, versioned_dir
+)
+from recommendations.text_processing import preprocess_thai_text, tokenize_batch
 
 logger = logging.getLogger(__name__)
 _thai2vec_model = None
 
-def preprocess_thai_text(text):
-    if not isinstance(text, str):
-        return []
-    text = normalize(text)
-    text = re.sub(rf'[\s{string.punctuation}a-zA-Z0-9]+', '', text)
-    tokens = word_tokenize(text, engine='newmm')
-    stop_words = thai_stopwords()
-    filtered_tokens = [word for word in tokens if word not in stop_words and not word.isspace()]
-    return filtered_tokens
+def get_thai2vec_settings():
+    """Returns (path, use_mmap) of the exported Thai2Vec vectors."""
+    thai2vec_settings = settings.RECOMMENDATION_SETTINGS.get('THAI2VEC', {})
+    return thai2vec_settings.get('PATH'), thai2vec_settings.get('MMAP', True)
+
+def resolve_thai2vec_path(path):
+    """
+    Path of the published export for the configured `path`. Each export of
+    `manage.py export_thai2vec` is a `<dir>/<version>/<file name>` directory and
+    `<dir>/CURRENT` names the published one; a plain file at `path` (from older
+    exports) is used when there is no pointer.
+    """
+    directory, file_name = os.path.split(path)
+    version = versioned_dir.current(directory)
+    return os.path.join(directory, version, file_name) if version else path
 
 def get_thai2vec_model(force_refresh=False):
+    """
+    Loads the exported vectors memory-mapped (read-only, shared between processes)
+    when `manage.py export_thai2vec` has been run, otherwise pythainlp's model.
+    """
     global _thai2vec_model
     if force_refresh or _thai2vec_model is None:
+        path, use_mmap = get_thai2vec_settings()
         try:
-            _thai2vec_model = WordVector().get_model()
-            logger.info("Successfully loaded KeyedVectors model using pythainlp.WordVector.")
+            path = resolve_thai2vec_path(path) if path else None
+            if path and os.path.exists(path):
+                _thai2vec_model = KeyedVectors.load(path, mmap='r' if use_mmap else None)
+                logger.info(f"Loaded KeyedVectors model from {path} (mmap={use_mmap}).")
+            else:
+                _thai2vec_model = WordVector().get_model()
+                logger.info(
+                    "Successfully loaded KeyedVectors model using pythainlp.WordVector. "
+                    "Run `manage.py export_thai2vec` to share one memory-mapped copy across processes."
+                )
         except Exception as e:
-            logger.error(f"Error loading model from pythainlp: {e}")
+            logger.error(f"Error loading Thai2Vec model: {e}")
             _thai2vec_model = None
     return _thai2vec_model
 
+# --- Description Embedding Cache ---
+# Averaged word vectors of place descriptions, kept as one float32 matrix keyed by
+# place id and a hash of the description text. Only new places and places whose
+# description hash changed are re-embedded.
+
+def _average_word_vectors(tokens, thai2vec_model):
+    vectors = [thai2vec_model[word] for word in tokens if word in thai2vec_model]
+    return np.mean(vectors, axis=0) if vectors else np.zeros(thai2vec_model.vector_size)
+
+def get_doc_vector(text, thai2vec_model):
+    return _average_word_vectors(preprocess_thai_text(text), thai2vec_model)
+
+def _description_hash(text):
+    text = text if isinstance(text, str) else ''
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little')
+
+def get_description_vectors(places_df, thai2vec_model):
+    """
+    Description embeddings for `places_df`, in its row order, reusing the stored
+    vector of every place whose description hash is unchanged.
+    """
+    place_ids = places_df.index.to_numpy(dtype=np.int64)
+    if 'description' in places_df.columns:
+        descriptions = places_df['description'].to_numpy()
+    else:
+        # Snapshot-backed frames carry no free text.
+        descriptions = data_utils.load_text_column('places', 'description').reindex(places_df.index).to_numpy()
+    hashes = np.fromiter((_description_hash(text) for text in descriptions), dtype=np.uint64, count=len(descriptions))
+    vectors = np.zeros((len(place_ids), thai2vec_model.vector_size), dtype=np.float32)
+
+    store = cache.get(cache_keys.DESCRIPTION_EMBEDDINGS_KEY)
+    reuse = np.zeros(len(place_ids), dtype=bool)
+    if store and len(store['place_ids']) and store['vectors'].shape[1] == thai2vec_model.vector_size:
+        positions = np.searchsorted(store['place_ids'], place_ids).clip(max=len(store['place_ids']) - 1)
+        reuse = (store['place_ids'][positions] == place_ids) & (store['hashes'][positions] == hashes)
+        vectors[reuse] = store['vectors'][positions[reuse]]
+
+    embed_rows = np.flatnonzero(~reuse)
+    for row, tokens in zip(embed_rows, tokenize_batch(descriptions[embed_rows])):
+        vectors[row] = _average_word_vectors(tokens, thai2vec_model)
+
+    if len(embed_rows) or not store or len(store['place_ids']) != len(place_ids):
+        order = np.argsort(place_ids)
+        cache.set(cache_keys.DESCRIPTION_EMBEDDINGS_KEY, {
+            'place_ids': place_ids[order],
+            'hashes': hashes[order],
+            'vectors': vectors[order],
+        }, timeout=None)
+        logger.info(f"Embedded {len(embed_rows)} of {len(place_ids)} place descriptions; reused the rest.")
+    return vectors
+
 def _create_item_profiles(places_df, users_df, all_interactions):
+    """
+    Returns (profiles, encoder): one row per place with named feature columns, and
+    the OneHotEncoder fitted on the categorical columns.
+    """
     if places_df.empty:
-        return pd.DataFrame(), [], 0
+        return pd.DataFrame(), None
 
     all_gender_choices = [choice[0] for choice in CustomUser.GENDER_CHOICES]
     all_gender_dummies = pd.get_dummies(pd.DataFrame({'gender': all_gender_choices})['gender'], prefix='gender')
@@ -64,11 +141,7 @@ def _create_item_profiles(places_df, users_df, all_interactions):
     if not thai2vec_model:
         raise RuntimeError("Thai2Vec model not available.")
 
-    def get_doc_vector(text):
-        tokens = preprocess_thai_text(text)
-        vectors = [thai2vec_model[word] for word in tokens if word in thai2vec_model]
-        return np.mean(vectors, axis=0) if vectors else np.zeros(thai2vec_model.vector_size)
-    desc_vectors = np.vstack(places_df['description'].apply(get_doc_vector).values)
+    desc_vectors = get_description_vectors(places_df, thai2vec_model)
 
     encoder = OneHotEncoder(handle_unknown='ignore')
     categorical_features = encoder.fit_transform(places_df[['category', 'location', 'price_range']])
@@ -80,137 +153,381 @@ def _create_item_profiles(places_df, users_df, all_interactions):
         places_df[['average_rating']].fillna(0).values,
         demographic_features
     ])
+    columns = (
+        [f'desc_{i}' for i in range(desc_vectors.shape[1])]
+        + encoder.get_feature_names_out().tolist()
+        + ['average_rating', 'mean_age'] + gender_cols
+    )
 
-    return pd.DataFrame(item_profiles_combined, index=places_df.index), gender_cols, categorical_features.shape[1]
-
-def _create_weighted_user_profile(user_id, user_item_matrix, unscaled_item_profiles):
-    if user_id in user_item_matrix.index:
-        user_ratings = user_item_matrix.loc[user_id]
-        user_rated_items_indices = user_ratings[user_ratings > 0].index
-        
-        if not user_rated_items_indices.empty:
-            weights = user_ratings[user_rated_items_indices].values
-            rated_item_profiles = unscaled_item_profiles.loc[user_rated_items_indices].values
-            sum_of_weights = np.sum(weights)
-            
-            if sum_of_weights > 0:
-                return np.dot(weights, rated_item_profiles) / sum_of_weights
-            else:
-                return rated_item_profiles.mean(axis=0)
+    return pd.DataFrame(item_profiles_combined, index=places_df.index, columns=columns), encoder
 
-    logger.info(f"Using average item profile for user {user_id} due to insufficient interactions.")
-    return unscaled_item_profiles.mean(axis=0)
-
-def _calculate_content_similarity(user_profile, item_profiles):
-    scaler = StandardScaler()
-    scaled_item_profiles = scaler.fit_transform(item_profiles.values)
-    scaled_user_profile = scaler.transform(user_profile.reshape(1, -1))
-    similarity_scores = cosine_similarity(scaled_user_profile, scaled_item_profiles)
-    return pd.DataFrame(similarity_scores.T, index=item_profiles.index, columns=['similarity'])
-
-def _rebuild_scaled_item_profiles():
-    logger.info("Starting scaled item profiles computation.")
-    cleaned_data = data_utils.load_and_clean_all_data(force_refresh=True)
-    places_df = cleaned_data['places_df']
-    if places_df.empty: return pd.DataFrame()
-    users_df = cleaned_data['users_df']
-    all_interactions = data_utils.get_all_scored_interactions(cleaned_data)
-    unscaled_profiles, _, _ = _create_item_profiles(places_df, users_df, all_interactions)
-    if unscaled_profiles.empty: return pd.DataFrame()
-    scaler = StandardScaler()
-    scaled_profiles_values = scaler.fit_transform(unscaled_profiles.values)
-    return pd.DataFrame(scaled_profiles_values, index=unscaled_profiles.index)
-
-def rebuild_scaled_item_profiles_cache():
+# --- Content Feature Artifact ---
+# The fitted feature pipeline (item profiles, OneHotEncoder, StandardScaler, column
+# schema and vector index) is built once per cleaned data generation and shared by
+# every consumer: per-user CBF, stored user profiles, batch scoring, the
+# similar-places build and evaluation. Each fit gets a version id; it is written
+# to the feature store on disk (FEATURE_STORE['ENABLED']) and to the cache, and only
+# then published by flipping the version pointer, so a reader never mixes parts
+# of two fits. Profiles are contiguous float32 matrices with an id -> row dict,
+# so nothing on the serving path goes through pandas.
+# Readers serve the last published version until a newer one is published, even
+# after the cleaned data has moved to a new generation: fitting only happens in
+# `rebuild_content_features_cache`, under a lock, from a cache-building task.
+# Each process keeps the artifact of the published version in memory, so a call
+# costs one cache round trip for the version pointer.
+
+CONTENT_FEATURES_LOCK_KEY = f"content_features_lock:{cache_keys.CONTENT_FEATURES_KEY}"
+
+_features_memo = {'version': None, 'features': None}
+
+def _build_content_features():
+    """
+    Fits the content feature pipeline on the current cleaned data.
+    Returns the artifact dict, or {} if there are no places or users.
+    """
+    frames = data_utils.load_frames('users', 'places')
+    generation = data_utils.get_data_generation()
+    users_df, places_df = frames['users_df'], frames['places_df']
+    if places_df.empty or users_df.empty:
+        return {}
+
+    all_interactions = user_based._load_user_place_scores()
+    profiles, encoder = _create_item_profiles(places_df, users_df, all_interactions)
+    if profiles.empty:
+        return {}
+
+    # Carry the previous generation's scaler and index over (a fresh copy from the
+    # cache, not this process's memo, which readers may still hold) and apply only the changed rows.
+    previous = cache.get(cache_keys.CONTENT_FEATURES_KEY) or {}
+    scaler, refit = _fit_scaler(profiles, previous)
+    place_ids = profiles.index.to_numpy(dtype=np.int32)
+    scaled_profiles = np.ascontiguousarray(l2_normalize(scaler.transform(profiles.values)), dtype=np.float32)
+    return {
+        'generation': generation,
+        'version': feature_store.new_version_id(),
+        'columns': profiles.columns.tolist(),
+        'place_ids': place_ids,
+        'place_rows': dict(zip(place_ids.tolist(), range(len(place_ids)))),
+        'user_ids': np.sort(users_df.index.to_numpy()),
+        'profiles': np.ascontiguousarray(profiles.values, dtype=np.float32),
+        'mean_profile': profiles.values.mean(axis=0),
+        'encoder': encoder,
+        'scaler': scaler,
+        # The standardized, L2-normalized float32 matrix lives only in the index
+        # (`index.vectors`, rows matching `index.ids`).
+        'index': vector_index.sync_index(previous.get('index'), place_ids, scaled_profiles, rebuild=refit),
+    }
+
+def _fit_scaler(profiles, previous):
+    """
+    Returns (scaler, refit). The previous fit's scaler is kept while the feature
+    columns are unchanged and a fresh fit's means and scales have moved by less
+    than VECTOR_INDEX['scaler_tolerance'] standard deviations, so unchanged places
+    keep identical vectors and the index sync only touches the places that
+    changed. A refit changes every vector, so the caller rebuilds the index.
+    """
+    fitted = StandardScaler().fit(profiles.values)
+    scaler = previous.get('scaler')
+    if scaler is None or previous.get('columns') != profiles.columns.tolist():
+        return fitted, True
+    drift = max(
+        np.max(np.abs(fitted.mean_ - scaler.mean_) / scaler.scale_, initial=0),
+        np.max(np.abs(fitted.scale_ / scaler.scale_ - 1), initial=0),
+    )
+    if drift > vector_index.get_vector_index_settings()['scaler_tolerance']:
+        logger.info(f"Content feature scaling drifted by {drift:.3f} std devs; refitting and rebuilding the index.")
+        return fitted, True
+    return scaler, False
+
+def rebuild_content_features_cache():
+    """
+    Builds the content feature artifact for the current data generation, stores it
+    on disk and in the cache, then publishes its version. If another build holds the
+    lock, returns the published artifact (or {}) without building.
+    This function is intended to be called by a cache-building process (e.g., a task).
+    """
+    if not cache.add(CONTENT_FEATURES_LOCK_KEY, 'building', timeout=600):
+        logger.info("Content features are already being built; skipping this build.")
+        return peek_content_features() or {}
     try:
-        scaled_profiles_df = _rebuild_scaled_item_profiles()
-        if not scaled_profiles_df.empty:
-            cache_config = settings.RECOMMENDATION_SETTINGS.get('CACHING', {})
-            timeout = cache_config.get('GLOBAL_CACHE_TIMEOUT', 3600 * 2)
-            cache.set(cache_keys.SCALED_PROFILES_KEY, scaled_profiles_df, timeout=timeout)
-            logger.info("Successfully rebuilt and cached scaled item profiles.")
-        return scaled_profiles_df
+        started = time.monotonic()
+        features = _build_content_features()
+        if not features:
+            logger.warning("Content feature build produced no data. Not caching.")
+            return {}
+        cache_config = settings.RECOMMENDATION_SETTINGS.get('CACHING', {})
+        timeout = cache_config.get('GLOBAL_CACHE_TIMEOUT', 3600 * 2)
+        if feature_store.is_enabled():
+            try:
+                feature_store.write_features(features)
+            except OSError as e:
+                logger.warning(f"Could not write content feature version '{features['version']}' to disk: {e}")
+        cache.set(cache_keys.CONTENT_FEATURES_KEY, features, timeout=timeout)
+        # The pointer outlives the cached artifact: a process that finds it on disk
+        # need not refit the pipeline just because the cache entry expired.
+        cache.set(
+            cache_keys.CONTENT_FEATURES_VERSION_KEY,
+            {'generation': features['generation'], 'version': features['version']},
+            timeout=None
+        )
+        _features_memo.update(version=features['version'], features=features)
+        logger.info(
+            f"Built content features {features['version']} for generation {features['generation']}: "
+            f"{features['profiles'].shape[0]} places x {features['profiles'].shape[1]} features "
+            f"({(features['profiles'].nbytes + features['index'].vectors.nbytes) / 2**20:.1f} MB) "
+            f"in {time.monotonic() - started:.2f}s."
+        )
+        return features
     except Exception as e:
-        logger.error(f"Error rebuilding scaled item profiles cache: {e}")
-        return pd.DataFrame()
-
-def get_scaled_item_profiles(force_refresh=False):
-    if not force_refresh:
-        cached_value = cache.get(cache_keys.SCALED_PROFILES_KEY)
-        if cached_value is not None: return cached_value
-    lock_key = f"item_profiles_lock:{cache_keys.SCALED_PROFILES_KEY}"
-    if cache.add(lock_key, 'building', timeout=600):
-        try:
-            return rebuild_scaled_item_profiles_cache()
-        finally:
-            cache.delete(lock_key)
+        logger.error(f"Error rebuilding content features cache: {e}", exc_info=True)
+        return {}
+    finally:
+        cache.delete(CONTENT_FEATURES_LOCK_KEY)
+
+def peek_content_features():
+    """
+    The last published content feature artifact if this process, the feature store
+    or the cache has it, else None. Never builds.
+    """
+    pointer = cache.get(cache_keys.CONTENT_FEATURES_VERSION_KEY)
+    if pointer is not None:
+        version = pointer['version']
+    elif feature_store.is_enabled():
+        # The pointer was lost (e.g. a cache flush); the on-disk CURRENT is the last publish.
+        version = feature_store.current_version()
     else:
-        time.sleep(5)
-        return get_scaled_item_profiles(force_refresh=False)
+        version = None
+    if version is None:
+        return None
+    if _features_memo['version'] == version:
+        return _features_memo['features']
+
+    features = None
+    if feature_store.is_enabled():
+        try:
+            features = feature_store.read_features(version)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read content feature version '{version}': {e}")
+    if features is None:
+        cached_value = cache.get(cache_keys.CONTENT_FEATURES_KEY)
+        if cached_value is not None and cached_value['version'] == version:
+            features = cached_value
+    if features is not None:
+        _features_memo.update(version=version, features=features)
+    return features
+
+def get_content_features(force_refresh=False):
+    """
+    Returns the last published content feature artifact, or {} if none has been
+    published yet (the global rebuild publishes one). Only `force_refresh=True`,
+    meant for cache-building processes, fits a new version synchronously.
+    """
+    if force_refresh:
+        return rebuild_content_features_cache()
+    features = peek_content_features()
+    if features is None:
+        logger.warning("No content features have been published yet; the next global rebuild builds them.")
+        return {}
+    return features
+
+# --- Per-User Profiles ---
+# A user's content profile is the score-weighted mean of the unscaled profiles of
+# the places they scored. It is stored as a running weighted sum plus total weight
+# for one feature version, so each score change (including the negative deltas
+# of deletions) is applied in O(d) without blocking on a lock.
+#
+# Every score change takes the next value of a per-user sequence counter before
+# its transaction commits, and a stored profile records the sequence it reflects.
+# A delta is applied only on top of the profile of the sequence just before its
+# own; otherwise the profile is dropped. A recompute reads the counter after the
+# table, so it can never claim less than it read and a delta is never counted
+# twice. Readers use a stored profile only when its sequence is the current one.
+
+def next_profile_sequence(user_id):
+    """
+    Takes the next sequence number of a user's score changes. Call it inside the
+    transaction that writes the score, before it commits.
+    """
+    key = cache_keys.user_content_profile_sequence_key(user_id)
+    cache.add(key, 0, timeout=None)
+    return cache.incr(key)
+
+def _user_profile_from_scores(user_id, features):
+    """(weighted_sum, total_weight) of a user's scored places known to the artifact."""
+    place_rows = features['place_rows']
+    profile_sum = np.zeros(features['profiles'].shape[1], dtype=np.float64)
+    total_weight = 0.0
+    scores = UserPlaceScore.objects.filter(user_id=user_id, score__gt=0).values_list('place_id', 'score')
+    rows_and_weights = [(place_rows[place_id], score) for place_id, score in scores if place_id in place_rows]
+    if rows_and_weights:
+        rows, weights = map(np.asarray, zip(*rows_and_weights))
+        profile_sum = weights.astype(np.float64) @ features['profiles'][rows].astype(np.float64)
+        total_weight = float(weights.sum())
+    return profile_sum, total_weight
+
+def _store_user_profile(user_id, stored):
+    cache_config = settings.RECOMMENDATION_SETTINGS.get('CACHING', {})
+    timeout = cache_config.get('GLOBAL_CACHE_TIMEOUT', 3600 * 2)
+    cache.set(cache_keys.user_content_profile_key(user_id), stored, timeout=timeout)
+
+def get_user_content_profile(user_id, features):
+    """The user's unscaled content profile, or the average place profile if they scored nothing."""
+    key = cache_keys.user_content_profile_key(user_id)
+    sequence_key = cache_keys.user_content_profile_sequence_key(user_id)
+    values = cache.get_many([key, sequence_key])
+    stored = values.get(key)
+    if (stored is None or stored['version'] != features['version']
+            or stored['sequence'] != values.get(sequence_key, 0)):
+        profile_sum, total_weight = _user_profile_from_scores(user_id, features)
+        stored = {
+            'version': features['version'],
+            'sequence': cache.get(sequence_key, 0),
+            'sum': profile_sum,
+            'weight': total_weight,
+        }
+        _store_user_profile(user_id, stored)
+
+    if stored['weight'] > 1e-9:
+        return stored['sum'] / stored['weight']
+    logger.info(f"Using average item profile for user {user_id} due to insufficient interactions.")
+    return features['mean_profile']
+
+def apply_user_profile_delta(user_id, place_id, delta, sequence):
+    """
+    Adds `delta` times a place's profile to the user's stored running sum, where
+    `sequence` is the change's number from `next_profile_sequence`. When the stored
+    profile cannot be updated safely it is dropped and recomputed on next use.
+    """
+    key = cache_keys.user_content_profile_key(user_id)
+    stored = cache.get(key)
+    if stored is None:
+        return
+    features = peek_content_features()
+    if features is None or stored['version'] != features['version'] or stored['sequence'] != sequence - 1:
+        cache.delete(key)
+        return
+
+    row = features['place_rows'].get(place_id)
+    # Places newer than the artifact are not part of any profile yet.
+    if row is not None:
+        stored['sum'] += delta * features['profiles'][row].astype(np.float64)
+        stored['weight'] += delta
+    stored['sequence'] = sequence
+    _store_user_profile(user_id, stored)
 
 def get_content_based_recommendations(user_id, collab_data, num_recommendations=10, filter_interacted=True):
     logger.info(f"CBF: Starting content-based recommendations for user {user_id}")
     try:
-        if not collab_data:
-            logger.warning(f"CBF: Exiting for user {user_id} because collab_data is empty.")
-            return []
-        
-        user_item_matrix = collab_data.get('user_item_matrix')
-        logger.info(f"CBF: Loading cleaned data for user {user_id}...")
-        cleaned_data = data_utils.load_and_clean_all_data()
-        users_df = cleaned_data['users_df']
-        places_df = cleaned_data['places_df']
-
-        if user_item_matrix is None:
-            logger.warning(f"CBF: Exiting for user {user_id} because user_item_matrix is None.")
-            return []
-        if places_df.empty:
-            logger.warning(f"CBF: Exiting for user {user_id} because places_df is empty.")
+        features = get_content_features()
+        if not features:
+            logger.warning(f"CBF: Exiting for user {user_id} because content features are not available.")
             return []
-        if users_df.empty:
-            logger.warning(f"CBF: Exiting for user {user_id} because users_df is empty.")
-            return []
-
-        logger.info(f"CBF: Creating item profiles for user {user_id}...")
-        unscaled_item_profiles, _, _ = _create_item_profiles(places_df, users_df, collab_data.get('all_interactions'))
 
-        if unscaled_item_profiles.empty:
-            logger.warning(f"CBF: Exiting for user {user_id} because unscaled_item_profiles is empty.")
-            return []
-        
-        if user_id not in users_df.index: 
+        if user_based._user_row(features['user_ids'], user_id) is None:
             logger.warning(f"CBF: Exiting because user {user_id} not in users_df.")
             return []
 
-        logger.info(f"CBF: Creating weighted user profile for user {user_id}.")
-        user_profile = _create_weighted_user_profile(user_id, user_item_matrix, unscaled_item_profiles)
-        
-        logger.info(f"CBF: Calculating similarity for user {user_id}.")
-        similarity_df = _calculate_content_similarity(user_profile, unscaled_item_profiles)
-        
-        recommendations_df = similarity_df.sort_values(by='similarity', ascending=False)
-        if filter_interacted:
-            interacted = cache_management.get_user_interacted_places(user_id)
-            recommendations_df = recommendations_df.drop(index=recommendations_df.index.intersection(interacted), errors='ignore')
+        user_profile = get_user_content_profile(user_id, features)
+
+        logger.info(f"CBF: Searching similar places for user {user_id}.")
+        scaled_user_profile = l2_normalize(features['scaler'].transform(user_profile.reshape(1, -1)))
+        interacted = cache_management.get_user_interacted_places(user_id) if filter_interacted else None
+        place_ids, _ = features['index'].search(scaled_user_profile, num_recommendations, exclude_ids=interacted)
 
         logger.info(f"CBF: Successfully generated recommendations for user {user_id}.")
-        return recommendations_df.head(num_recommendations).index.tolist()
+        return place_ids.tolist()
     except Exception as e:
         logger.error(f"Error in content-based recommendations for user {user_id}: {e}", exc_info=True)
         return []
 
+# --- Similar Places ---
+# Every place's top-K most similar places are computed in one blocked pass over
+# the vector index of standardized, L2-normalized profiles (so cosine similarity
+# is a plain product) and published as one Redis hash, {place_id: "id,id,..."}. The hash is
+# written under a temporary key and renamed into place, so readers never see a
+# half-written build; `get_similar_places` is then a single HGET.
+
+def get_similar_places_settings():
+    """Returns (top_k, block_size) for the similar-places build."""
+    similar_settings = settings.RECOMMENDATION_SETTINGS.get('SIMILAR_PLACES', {})
+    return similar_settings.get('top_k', 20), similar_settings.get('block_size', 1000)
+
+def _get_redis_client():
+    return redis.from_url(settings.CELERY_BROKER_URL)
+
+def rebuild_similar_places():
+    """
+    Computes the top-K similar places of every place and atomically replaces the
+    Redis hash read by `get_similar_places`. Returns the number of places written.
+    This function is intended to be called by a cache-building process (e.g., a task).
+    """
+    try:
+        features = get_content_features()
+        if not features:
+            logger.warning("No content features available for similar places. Not publishing.")
+            return 0
+
+        started = time.monotonic()
+        k, block_size = get_similar_places_settings()
+        index = features['index']
+        neighbor_ids, _ = index.search_batch(index.vectors, k, query_ids=index.ids, block_size=block_size)
+        mapping = {
+            int(place_id): ','.join(map(str, neighbors[neighbors >= 0].tolist()))
+            for place_id, neighbors in zip(index.ids, neighbor_ids)
+        }
+
+        redis_client = _get_redis_client()
+        building_key = f"{cache_keys.SIMILAR_PLACES_KEY}:building"
+        pipeline = redis_client.pipeline()
+        pipeline.delete(building_key)
+        items = list(mapping.items())
+        for chunk_start in range(0, len(items), 1000):
+            pipeline.hset(building_key, mapping=dict(items[chunk_start:chunk_start + 1000]))
+        pipeline.rename(building_key, cache_keys.SIMILAR_PLACES_KEY)
+        pipeline.execute()
+        logger.info(
+            f"Published top-{k} similar places for {len(mapping)} places "
+            f"in {time.monotonic() - started:.2f}s."
+        )
+        return len(mapping)
+    except Exception as e:
+        logger.error(f"Error rebuilding similar places: {e}", exc_info=True)
+        return 0
+
+def remove_similar_places(place_id):
+    """
+    Drops a deleted place's entry. Other places' lists still name it until the next
+    rebuild, so `get_similar_places` skips ids that have no entry of their own.
+    """
+    try:
+        _get_redis_client().hdel(cache_keys.SIMILAR_PLACES_KEY, place_id)
+    except Exception as e:
+        logger.error(f"Could not remove similar places of place {place_id}: {e}")
+
 def get_similar_places(place_id, num_recommendations=5, force_refresh=False):
-    cache_config = settings.RECOMMENDATION_SETTINGS.get('CACHING', {})
-    cache_key = cache_keys.place_similar_key(place_id)
-    if not force_refresh:
-        cached = cache.get(cache_key)
-        if cached is not None: return cached
-    item_profiles = get_scaled_item_profiles(force_refresh=force_refresh)
-    if item_profiles.empty or place_id not in item_profiles.index: return []
-    target_vector = item_profiles.loc[[place_id]]
-    sim_scores = cosine_similarity(target_vector, item_profiles)
-    sim_df = pd.DataFrame(sim_scores.T, index=item_profiles.index, columns=['similarity'])
-    recs = sim_df.drop(place_id).sort_values(by='similarity', ascending=False).head(num_recommendations).index.tolist()
-    timeout = cache_config.get('SIMILAR_PLACES_TIMEOUT', 3600 * 2)
-    cache.set(cache_key, recs, timeout=timeout)
-    return recs
+    """
+    Looks up the precomputed similar places of a place, skipping places deleted
+    since the last build. If nothing has been published yet, returns [] and queues
+    the build; only `force_refresh=True` builds synchronously.
+    """
+    try:
+        if force_refresh:
+            rebuild_similar_places()
+        redis_client = _get_redis_client()
+        value = redis_client.hget(cache_keys.SIMILAR_PLACES_KEY, place_id)
+        if value is None:
+            if not redis_client.exists(cache_keys.SIMILAR_PLACES_KEY):
+                logger.warning("No similar places have been published yet; queued the build.")
+                cache_management.request_similar_places_rebuild()
+            return []
+        if not value:
+            return []
+        similar_ids = value.decode().split(',')
+        # Every published place has an entry; a missing one was deleted since the build.
+        exists = redis_client.hmget(cache_keys.SIMILAR_PLACES_KEY, similar_ids)
+        return [
+            int(similar_id) for similar_id, entry in zip(similar_ids, exists) if entry is not None
+        ][:num_recommendations]
+    except Exception as e:
+        logger.error(f"Error looking up similar places for place {place_id}: {e}")
+        return []
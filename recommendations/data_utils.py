@@ -1,79 +1,210 @@
+import numpy as np
 import pandas as pd
+import redis
+from django.contrib.contenttypes.models import ContentType
 from django.core.cache import cache
+from django.db import IntegrityError, connections, transaction
+from django.db.models import Max, Q
+from django.utils import timezone
 from review_place.models import Review, CustomUser, Place, PlaceLike, UserActivity
-from recommendations import cache_keys
+from recommendations.models import UserPlaceScore
+from recommendations import cache_keys, snapshot
 from django.conf import settings
 import logging
-from itertools import islice
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
 
 logger = logging.getLogger(__name__)
 
 # --- Data Fetching Methods ---
+# The `since` / `user_ids` / `ids` arguments restrict a fetch to the rows needed
+# by an incremental (delta) refresh: rows at or past a high-water mark, plus every
+# row belonging to an entity that was marked dirty since the last refresh.
 
-def get_user_data(use_iterator=False):
-    users = CustomUser.objects.all().values('id', 'gender', 'date_of_birth')
-    if use_iterator:
-        return users.iterator()
-    return pd.DataFrame(list(users))
+def _restrict(queryset, time_field=None, since=None, id_field=None, ids=None):
+    if since is None and ids is None:
+        return queryset
+    condition = Q(pk__in=[])
+    if since is not None:
+        condition |= Q(**{f'{time_field}__gte': since})
+    if ids:
+        condition |= Q(**{f'{id_field}__in': list(ids)})
+    return queryset.filter(condition)
 
-def get_place_data():
-    places = Place.objects.all().values(
-        'id', 'place_name', 'category', 'location', 'description',
-        'average_rating', 'price_range', 'total_reviews', 'visit_count'
-    )
-    return pd.DataFrame(list(places))
-
-def get_review_data(use_iterator=False):
-    reviews = Review.objects.filter(status='published').values('user_id', 'place_id', 'rating')
-    if use_iterator:
-        return reviews.iterator()
-    return pd.DataFrame(list(reviews))
-
-def get_like_data(use_iterator=False):
-    likes = PlaceLike.objects.all().values('user_id', 'place_id')
-    if use_iterator:
-        return likes.iterator()
-    return pd.DataFrame(list(likes))
-
-def get_visit_data(use_iterator=False):
-    visits = UserActivity.objects.filter(activity_type='view', content_type__model='place').values('user_id', 'object_id')
-    if use_iterator:
-        return visits.iterator()
-    df = pd.DataFrame(list(visits))
-    df = df.rename(columns={'object_id': 'place_id'})
-    return df
+def _streaming_cursor(connection):
+    """
+    A cursor that streams rows from the server instead of buffering the whole
+    result client-side: Django's chunked cursor (server-side on PostgreSQL) or,
+    on MySQL, an unbuffered SSCursor.
+    """
+    if connection.vendor == 'mysql':
+        from MySQLdb.cursors import SSCursor
+        connection.ensure_connection()
+        return connection.connection.cursor(SSCursor)
+    return connection.chunked_cursor()
+
+def _fetch_columns(queryset, columns, chunk_size=10000):
+    """
+    Streams `queryset` straight into preallocated typed NumPy arrays, one per column.
+
+    Rows are read with `fetchmany` from a raw cursor over the `values_list` SQL,
+    so no per-row dict or model instance is ever built.
+
+    Args:
+        queryset: The filtered queryset to read.
+        columns (list): (field_name, numpy dtype) pairs, in select order.
+        chunk_size (int): Rows per `fetchmany` round trip.
+
+    Returns:
+        dict of {field_name: np.ndarray}.
+    """
+    fields = [field for field, _ in columns]
+    capacity = queryset.count()
+    arrays = [np.empty(capacity, dtype=dtype) for _, dtype in columns]
+    sql, params = queryset.values_list(*fields).query.sql_with_params()
+
+    connection = connections[queryset.db]
+    filled = 0
+    cursor = _streaming_cursor(connection)
+    try:
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            end = filled + len(rows)
+            if end > capacity:
+                # Rows were inserted between COUNT and SELECT; grow geometrically.
+                capacity = max(end, capacity * 2)
+                arrays = [np.resize(array, capacity) for array in arrays]
+            for array, values in zip(arrays, zip(*rows)):
+                array[filled:end] = values
+            filled = end
+    finally:
+        cursor.close()
+
+    return {field: array[:filled] for field, array in zip(fields, arrays)}
+
+USER_COLUMNS = [('id', np.int32), ('gender', object), ('date_of_birth', object)]
+PLACE_COLUMNS = [
+    ('id', np.int32), ('place_name', object), ('category', object), ('location', object),
+    ('description', object), ('average_rating', np.float32), ('price_range', object),
+    ('total_reviews', np.int32), ('visit_count', np.int32)
+]
+REVIEW_COLUMNS = [('user_id', np.int32), ('place_id', np.int32), ('rating', np.float32)]
+PAIR_COLUMNS = [('user_id', np.int32), ('place_id', np.int32)]
+ACTIVITY_COLUMNS = [('user_id', np.int32), ('object_id', np.int32)]
+
+def get_place_content_type_id():
+    """
+    ContentType id of Place, resolved once per process (Django caches the lookup),
+    so place-scoped activity filters hit the composite index without joining
+    django_content_type.
+    """
+    return ContentType.objects.get_for_model(Place).id
+
+def _place_activities(activity_type):
+    # The generic relation has no foreign key, so deleting a Place leaves its
+    # activities behind; only rows pointing at existing places are returned.
+    # order_by() drops Meta.ordering, which would otherwise force a sort of the whole result.
+    return UserActivity.objects.filter(
+        activity_type=activity_type, content_type_id=get_place_content_type_id(),
+        object_id__in=Place.objects.values('id')
+    ).order_by()
+
+def get_user_data(since=None, ids=None):
+    users = _restrict(CustomUser.objects.all(), 'date_joined', since, 'id', ids)
+    return pd.DataFrame(_fetch_columns(users, USER_COLUMNS))
 
-def get_share_data(use_iterator=False):
-    shares = UserActivity.objects.filter(activity_type='share', content_type__model='place').values('user_id', 'object_id')
-    if use_iterator:
-        return shares.iterator()
-    df = pd.DataFrame(list(shares))
-    df = df.rename(columns={'object_id': 'place_id'})
+def get_place_data(since=None, ids=None):
+    places = _restrict(Place.objects.all(), 'updated_at', since, 'id', ids)
+    return pd.DataFrame(_fetch_columns(places, PLACE_COLUMNS))
+
+def get_review_data(since=None, user_ids=None):
+    reviews = _restrict(Review.objects.filter(status='published'), 'review_date', since, 'user_id', user_ids)
+    return pd.DataFrame(_fetch_columns(reviews, REVIEW_COLUMNS))
+
+def get_like_data(since=None, user_ids=None):
+    likes = _restrict(PlaceLike.objects.order_by(), 'created_at', since, 'user_id', user_ids)
+    return pd.DataFrame(_fetch_columns(likes, PAIR_COLUMNS))
+
+def get_visit_data(since=None, user_ids=None):
+    visits = _restrict(_place_activities('view'), 'timestamp', since, 'user_id', user_ids)
+    df = pd.DataFrame(_fetch_columns(visits, ACTIVITY_COLUMNS))
+    return df.rename(columns={'object_id': 'place_id'})
+
+def get_share_data(since=None, user_ids=None):
+    shares = _restrict(_place_activities('share'), 'timestamp', since, 'user_id', user_ids)
+    df = pd.DataFrame(_fetch_columns(shares, ACTIVITY_COLUMNS))
+    return df.rename(columns={'object_id': 'place_id'})
+
+# --- Frame Schemas ---
+# Compact dtypes for every frame in the cleaned bundle: int32 ids, float32 scores
+# and ratings, and Categorical for low-cardinality text. Applied once after
+# cleaning (and again after a delta merge, since concatenating Categoricals with
+# different categories falls back to object) so cached copies stay compact.
+
+FRAME_SCHEMAS = {
+    'users_df': {
+        'index': np.int32,
+        'columns': {'gender': 'category', 'age': np.float32},
+    },
+    'places_df': {
+        'index': np.int32,
+        'columns': {
+            'category': 'category', 'location': 'category', 'price_range': 'category',
+            'average_rating': np.float32, 'total_reviews': np.int32, 'visit_count': np.int32,
+        },
+    },
+    'reviews_df': {'columns': {'user_id': np.int32, 'place_id': np.int32, 'rating': np.float32}},
+    'likes_df': {'columns': {'user_id': np.int32, 'place_id': np.int32}},
+    'visits_df': {'columns': {'user_id': np.int32, 'place_id': np.int32}},
+    'shares_df': {'columns': {'user_id': np.int32, 'place_id': np.int32}},
+    'scored_interactions': {'columns': {'user_id': np.int32, 'place_id': np.int32, 'score': np.float32}},
+}
+
+def apply_schema(df, frame_name):
+    """Casts `df` to the compact schema registered for `frame_name`."""
+    schema = FRAME_SCHEMAS[frame_name]
+    dtypes = {column: dtype for column, dtype in schema['columns'].items() if column in df.columns}
+    df = df.astype(dtypes) if dtypes else df
+    if 'index' not in schema:
+        # Interaction rows carry no meaningful index; a RangeIndex costs no memory.
+        return df.reset_index(drop=True)
+    if len(df.index) and df.index.dtype != schema['index']:
+        df.index = df.index.astype(schema['index'])
     return df
 
+def apply_schemas(data):
+    return {frame_name: apply_schema(df, frame_name) for frame_name, df in data.items()}
+
 # --- Data Cleaning Methods ---
 
-def _clean_users_df(df):
+def _clean_users_df(df, fallback_age=None):
     if df.empty:
         return df.set_index('id') if 'id' in df.columns else df
 
     df_cleaned = df.copy()
     df_cleaned.loc[:, 'gender'] = df_cleaned['gender'].fillna("Unknown")
 
-    today = pd.to_datetime('today').date()
-    df_cleaned.loc[:, 'age'] = df_cleaned['date_of_birth'].apply(
-        lambda dob: (today.year - dob.year - ((today.month, today.day) < (dob.month, dob.day))) if pd.notnull(dob) else None
-    )
+    # datetime64 rather than `date` objects (or the ISO strings some backends
+    # return from a raw cursor), so the column stores and merges as a plain array.
+    dob = pd.to_datetime(df_cleaned['date_of_birth'])
+    df_cleaned['date_of_birth'] = dob
+
+    today = pd.to_datetime('today')
+    before_birthday = (dob.dt.month > today.month) | ((dob.dt.month == today.month) & (dob.dt.day > today.day))
+    df_cleaned['age'] = today.year - dob.dt.year - before_birthday.astype(int)
 
     if 'age' in df_cleaned.columns and df_cleaned['age'].isnull().any():
-        mean_age = df_cleaned['age'].mean()
+        mean_age = df_cleaned['age'].mean() if fallback_age is None else fallback_age
         df_cleaned.loc[:, 'age'] = df_cleaned['age'].fillna(mean_age)
 
     df_cleaned.drop_duplicates(subset='id', inplace=True)
     df_cleaned.set_index('id', inplace=True)
     return df_cleaned
 
-def _clean_places_df(df):
+def _clean_places_df(df, fallback_price_range=None, fallback_rating=None):
     if df.empty:
         return df.set_index('id') if 'id' in df.columns else df
 
@@ -83,12 +214,15 @@ def _clean_places_df(df):
     df_cleaned.loc[:, 'location'] = df_cleaned['location'].fillna("Unknown")
     df_cleaned.loc[:, 'description'] = df_cleaned['description'].fillna("")
 
-    if not df_cleaned['price_range'].mode().empty:
+    if fallback_price_range is not None:
+        df_cleaned.loc[:, 'price_range'] = df_cleaned['price_range'].fillna(fallback_price_range)
+    elif not df_cleaned['price_range'].mode().empty:
         df_cleaned.loc[:, 'price_range'] = df_cleaned['price_range'].fillna(df_cleaned['price_range'].mode()[0])
     else:
         df_cleaned.loc[:, 'price_range'] = df_cleaned['price_range'].fillna("Unknown")
 
-    df_cleaned.loc[:, 'average_rating'] = df_cleaned['average_rating'].fillna(df_cleaned['average_rating'].mean())
+    mean_rating = df_cleaned['average_rating'].mean() if fallback_rating is None else fallback_rating
+    df_cleaned.loc[:, 'average_rating'] = df_cleaned['average_rating'].fillna(mean_rating)
     df_cleaned.loc[:, 'total_reviews'] = df_cleaned['total_reviews'].fillna(0)
     df_cleaned.loc[:, 'visit_count'] = df_cleaned['visit_count'].fillna(0)
     df_cleaned.drop_duplicates(subset='id', inplace=True)
@@ -108,17 +242,100 @@ def clean_interactions_df(df, interaction_type):
         df_cleaned.drop_duplicates(subset=['user_id', 'place_id'], inplace=True)
     return df_cleaned
 
+# --- Dirty Tracking ---
+# Signal handlers record which users and places changed. A delta refresh reloads
+# exactly those entities, which is how deletions and edits that do not move a
+# timestamp (e.g. a review's rating or status) reach the cached frames.
+
+def _get_redis_client():
+    return redis.from_url(settings.CELERY_BROKER_URL)
+
+def mark_users_dirty(user_ids):
+    """Flag users whose profile or interactions must be reloaded on the next delta refresh."""
+    _mark_dirty(cache_keys.DIRTY_USERS_KEY, user_ids)
+
+def mark_places_dirty(place_ids):
+    """Flag places that must be reloaded (or dropped) on the next delta refresh."""
+    _mark_dirty(cache_keys.DIRTY_PLACES_KEY, place_ids)
+
+def mark_neighbors_dirty(user_ids):
+    """Flag users whose cached neighbors must be patched by the next incremental update."""
+    _mark_dirty(cache_keys.DIRTY_NEIGHBOR_USERS_KEY, user_ids)
+
+def pop_dirty_neighbors():
+    """Returns and clears the users flagged by `mark_neighbors_dirty`."""
+    try:
+        return _pop_dirty(cache_keys.DIRTY_NEIGHBOR_USERS_KEY)
+    except Exception as e:
+        logger.error(f"Could not read dirty neighbor flags: {e}")
+        return set()
+
+def restore_dirty_neighbors(user_ids):
+    _restore_dirty(cache_keys.DIRTY_NEIGHBOR_USERS_KEY, user_ids)
+
+def mark_neighbors_patched(user_ids):
+    """Record users patched into the cached bundle since the running full build started."""
+    _mark_dirty(cache_keys.PATCHED_NEIGHBOR_USERS_KEY, user_ids)
+
+def clear_patched_neighbors():
+    try:
+        _get_redis_client().delete(cache_keys.PATCHED_NEIGHBOR_USERS_KEY)
+    except Exception as e:
+        logger.error(f"Could not clear patched neighbor flags: {e}")
+
+def requeue_patched_neighbors():
+    """Moves the users patched during a full build back to the dirty set."""
+    try:
+        pipeline = _get_redis_client().pipeline()
+        pipeline.sunionstore(
+            cache_keys.DIRTY_NEIGHBOR_USERS_KEY,
+            [cache_keys.DIRTY_NEIGHBOR_USERS_KEY, cache_keys.PATCHED_NEIGHBOR_USERS_KEY]
+        )
+        pipeline.delete(cache_keys.PATCHED_NEIGHBOR_USERS_KEY)
+        pipeline.execute()
+    except Exception as e:
+        logger.error(f"Could not re-queue patched neighbor flags: {e}")
+
+def _mark_dirty(key, ids):
+    ids = [i for i in ids if i is not None]
+    if not ids:
+        return
+    try:
+        _get_redis_client().sadd(key, *ids)
+    except Exception as e:
+        logger.error(f"Could not mark {ids} dirty under '{key}': {e}")
+
+def _pop_dirty(key):
+    """Atomically read and clear a dirty set."""
+    pipeline = _get_redis_client().pipeline()
+    pipeline.smembers(key)
+    pipeline.delete(key)
+    members, _ = pipeline.execute()
+    return {int(member) for member in members}
+
+def _restore_dirty(key, ids):
+    if ids:
+        _mark_dirty(key, list(ids))
+
 # --- Data Loading and Caching ---
 
-def load_and_clean_all_data(force_refresh=False):
-    cache_config = settings.RECOMMENDATION_SETTINGS.get('CACHING', {})
-    if not force_refresh:
-        cached_data = cache.get(cache_keys.CLEANED_DATA_KEY)
-        if cached_data is not None:
-            logger.info("Serving cleaned data from cache.")
-            return cached_data
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+def _current_watermarks():
+    """
+    High-water mark of each source. Taken *before* reading rows so that anything
+    written during the load is picked up again (and de-duplicated) next time.
+    An empty source gets the epoch so that its first rows count as new.
+    """
+    return {
+        'users': CustomUser.objects.aggregate(mark=Max('date_joined'))['mark'] or _EPOCH,
+        'places': Place.objects.aggregate(mark=Max('updated_at'))['mark'] or _EPOCH,
+        'reviews': Review.objects.aggregate(mark=Max('review_date'))['mark'] or _EPOCH,
+        'likes': PlaceLike.objects.aggregate(mark=Max('created_at'))['mark'] or _EPOCH,
+        'activities': UserActivity.objects.aggregate(mark=Max('timestamp'))['mark'] or _EPOCH,
+    }
 
-    logger.info("Loading and cleaning all data from database.")
+def _load_full():
     users_df = _clean_users_df(get_user_data())
     places_df = _clean_places_df(get_place_data())
     reviews_df = clean_interactions_df(get_review_data(), 'reviews')
@@ -126,7 +343,7 @@ def load_and_clean_all_data(force_refresh=False):
     visits_df = clean_interactions_df(get_visit_data(), 'visits')
     shares_df = clean_interactions_df(get_share_data(), 'shares')
 
-    data = {
+    return {
         'users_df': users_df,
         'places_df': places_df,
         'reviews_df': reviews_df,
@@ -135,8 +352,295 @@ def load_and_clean_all_data(force_refresh=False):
         'shares_df': shares_df
     }
 
+def _merge_indexed(cached_df, fresh_df, stale_ids):
+    """Replace or drop rows of an id-indexed frame (users/places)."""
+    stale_ids = set(stale_ids) | set(fresh_df.index)
+    kept = cached_df[~cached_df.index.isin(stale_ids)] if not cached_df.empty else cached_df
+    if fresh_df.empty:
+        return kept
+    if kept.empty:
+        return fresh_df
+    return pd.concat([kept, fresh_df])
+
+def _merge_interactions(cached_df, fresh_df, dirty_user_ids, interaction_type):
+    """Drop every cached row of a dirty user, then append the reloaded rows."""
+    kept = cached_df
+    if not cached_df.empty and dirty_user_ids:
+        kept = cached_df[~cached_df['user_id'].isin(dirty_user_ids)]
+    if fresh_df.empty:
+        return kept
+    if kept.empty:
+        return fresh_df
+    merged = pd.concat([kept, fresh_df], ignore_index=True)
+    return clean_interactions_df(merged, interaction_type)
+
+def _drop_deleted_places(interactions_df, places_df):
+    """Drops interaction rows of places that are no longer in `places_df`."""
+    if interactions_df.empty:
+        return interactions_df
+    return interactions_df[interactions_df['place_id'].isin(places_df.index)]
+
+def _load_delta(cached_data, marks, dirty_users, dirty_places):
+    users_df = cached_data['users_df']
+    places_df = cached_data['places_df']
+    if snapshot.is_enabled():
+        # Snapshot reads leave free text out (see `snapshot`); the merged frame is written back whole.
+        places_df = snapshot.read_snapshot(get_data_generation(), frames=['places_df'], with_text=True)['places_df']
+
+    # Re-read an overlap window behind each high-water mark: a row stamped before
+    # the mark but committed after it was taken would otherwise be skipped until
+    # the next full reload. Re-read rows are de-duplicated by the merges below.
+    overlap = timedelta(seconds=settings.RECOMMENDATION_SETTINGS.get('CACHING', {}).get('DELTA_OVERLAP_SECONDS', 300))
+    marks = {source: mark - overlap for source, mark in marks.items() if source != 'full_refresh_at'}
+
+    fresh_users = _clean_users_df(
+        get_user_data(since=marks['users'], ids=dirty_users),
+        fallback_age=users_df['age'].mean() if 'age' in users_df else None
+    )
+    price_mode = places_df['price_range'].mode() if 'price_range' in places_df else pd.Series(dtype=object)
+    fresh_places = _clean_places_df(
+        get_place_data(since=marks['places'], ids=dirty_places),
+        fallback_price_range=price_mode.iloc[0] if not price_mode.empty else None,
+        fallback_rating=places_df['average_rating'].mean() if 'average_rating' in places_df else None
+    )
+
+    fresh_reviews = clean_interactions_df(get_review_data(since=marks['reviews'], user_ids=dirty_users), 'reviews')
+    fresh_likes = clean_interactions_df(get_like_data(since=marks['likes'], user_ids=dirty_users), 'likes')
+    fresh_visits = clean_interactions_df(get_visit_data(since=marks['activities'], user_ids=dirty_users), 'visits')
+    fresh_shares = clean_interactions_df(get_share_data(since=marks['activities'], user_ids=dirty_users), 'shares')
+
+    logger.info(
+        f"Delta refresh: {len(dirty_users)} dirty users, {len(dirty_places)} dirty places, "
+        f"{len(fresh_reviews) + len(fresh_likes) + len(fresh_visits) + len(fresh_shares)} interaction rows reloaded."
+    )
+
+    places_df = _merge_indexed(places_df, fresh_places, dirty_places)
+    # Deleting a place leaves its activities behind (generic relation), and its
+    # visitors are not marked dirty, so drop rows of deleted places here.
+    return {
+        'users_df': _merge_indexed(users_df, fresh_users, dirty_users),
+        'places_df': places_df,
+        'reviews_df': _drop_deleted_places(
+            _merge_interactions(cached_data['reviews_df'], fresh_reviews, dirty_users, 'reviews'), places_df),
+        'likes_df': _drop_deleted_places(
+            _merge_interactions(cached_data['likes_df'], fresh_likes, dirty_users, 'likes'), places_df),
+        'visits_df': _drop_deleted_places(
+            _merge_interactions(cached_data['visits_df'], fresh_visits, dirty_users, 'visits'), places_df),
+        'shares_df': _drop_deleted_places(
+            _merge_interactions(cached_data['shares_df'], fresh_shares, dirty_users, 'shares'), places_df),
+    }
+
+# --- Frame Storage ---
+# Each frame is stored as its own part, all parts of one build sharing a
+# generation id. The generation pointer is only flipped after every part is
+# written, so a reader never mixes frames from two builds. Parts live either in
+# the columnar snapshot (SNAPSHOT['ENABLED']) or as separate cache keys.
+
+FRAME_NAMES = ('users_df', 'places_df', 'reviews_df', 'likes_df', 'visits_df', 'shares_df')
+
+# Per-process memo of frames already read from the current generation.
+_frame_memo = {'generation': None, 'frames': {}}
+
+def _frame_name(name):
+    frame_name = name if name.endswith('_df') else f'{name}_df'
+    if frame_name not in FRAME_NAMES:
+        raise ValueError(f"Unknown cleaned data frame '{name}'.")
+    return frame_name
+
+def _read_frames(frame_names):
+    """
+    Returns {frame_name: DataFrame} for the current generation, or None if the
+    generation or any requested part is missing. The memo is only switched to a
+    new generation once its parts were read, so it keeps the last complete one.
+    """
+    generation = cache.get(cache_keys.CLEANED_DATA_GENERATION_KEY)
+    if generation is None:
+        return None
+    memo = _frame_memo['frames'] if _frame_memo['generation'] == generation else {}
+
+    missing = [name for name in frame_names if name not in memo]
+    if missing:
+        if snapshot.is_enabled():
+            try:
+                loaded = snapshot.read_snapshot(generation, frames=missing)
+            except (OSError, KeyError, ValueError) as e:
+                logger.warning(f"Could not read data snapshot '{generation}': {e}")
+                return None
+        else:
+            part_keys = {cache_keys.cleaned_data_part_key(generation, name): name for name in missing}
+            parts = cache.get_many(list(part_keys))
+            if len(parts) != len(part_keys):
+                return None
+            loaded = {part_keys[key]: df for key, df in parts.items()}
+        memo = {**memo, **loaded}
+        _frame_memo.update(generation=generation, frames=memo)
+    return {name: memo[name] for name in frame_names}
+
+def _read_last_frames(frame_names):
+    """
+    Frames of the last complete generation: the one this process last read, else
+    the published on-disk snapshot. Returns None if neither has every frame.
+    """
+    memo = _frame_memo['frames']
+    if all(name in memo for name in frame_names):
+        return {name: memo[name] for name in frame_names}
+    if snapshot.is_enabled():
+        try:
+            frames = snapshot.read_snapshot(frames=frame_names)
+        except (OSError, KeyError, ValueError) as e:
+            logger.warning(f"Could not read the published data snapshot: {e}")
+            return None
+        if frames is not None:
+            return frames
+    return None
+
+def _store_frames(data, timeout):
+    generation = snapshot.new_generation_id()
+    previous_generation = cache.get(cache_keys.CLEANED_DATA_GENERATION_KEY)
+
+    if snapshot.is_enabled():
+        snapshot.write_snapshot(data, generation=generation)
+    else:
+        cache.set_many(
+            {cache_keys.cleaned_data_part_key(generation, name): df for name, df in data.items()},
+            timeout=timeout
+        )
+    cache.set(cache_keys.CLEANED_DATA_GENERATION_KEY, generation, timeout=timeout)
+
+    if previous_generation and not snapshot.is_enabled():
+        # Give in-flight readers of the old generation a moment, then let it go.
+        for name in FRAME_NAMES:
+            cache.touch(cache_keys.cleaned_data_part_key(previous_generation, name), timeout=60)
+
+    # Hand back the stored view (memory-mapped for snapshots) so callers behave
+    # the same on a cache hit and a miss.
+    return _read_frames(list(data)) or data
+
+def load_text_column(frame, column):
+    """
+    A free-text column of a cleaned frame (e.g. `load_text_column('places', 'description')`),
+    indexed like the frame. Snapshot-backed frames leave free text out (see
+    `snapshot`), so it is decoded here for the caller alone.
+    """
+    frame_name = _frame_name(frame)
+    if snapshot.is_enabled():
+        # The current generation, else the published one `load_frames` falls back to.
+        for generation in (get_data_generation(), None):
+            try:
+                text = snapshot.read_snapshot(generation, frames=[frame_name], columns={frame_name: [column]})
+            except (OSError, KeyError, ValueError) as e:
+                logger.warning(f"Could not read '{column}' of data snapshot '{generation}': {e}")
+                continue
+            if text is not None:
+                return text[frame_name][column]
+    return load_frames(frame)[frame_name][column]
+
+def get_data_generation():
+    """Id of the cleaned data generation currently served, or None if nothing is loaded."""
+    return cache.get(cache_keys.CLEANED_DATA_GENERATION_KEY)
+
+CLEANED_DATA_BUILD_LOCK_KEY = f"cleaned_data_build_lock:{cache_keys.CLEANED_DATA_GENERATION_KEY}"
+CLEANED_DATA_BUILD_LOCK_TIMEOUT = 600
+
+def load_frames(*names):
+    """
+    Returns only the requested cleaned frames, e.g. `load_frames('places', 'likes')`.
+
+    Names may be given with or without the `_df` suffix; the result is a dict
+    keyed by the full frame name, like the bundle from `load_and_clean_all_data`.
+    Consumers that need one or two frames should use this instead of loading the
+    whole bundle.
+
+    If a part of the current generation is missing, the last complete generation
+    is served until the scheduled rebuild publishes a new one. Only when there is
+    none at all is the data built here, by one process at a time.
+    """
+    frame_names = [_frame_name(name) for name in names] or list(FRAME_NAMES)
+    frames = _read_frames(frame_names)
+    if frames is not None:
+        return frames
+
+    frames = _read_last_frames(frame_names)
+    if frames is not None:
+        logger.warning("Cleaned data generation is incomplete; serving the last complete generation.")
+        return frames
+
+    deadline = time.monotonic() + CLEANED_DATA_BUILD_LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        if cache.add(CLEANED_DATA_BUILD_LOCK_KEY, 'building', timeout=CLEANED_DATA_BUILD_LOCK_TIMEOUT):
+            try:
+                # Another process may have published while we waited for the lock.
+                frames = _read_frames(frame_names)
+                if frames is None:
+                    data = load_and_clean_all_data(force_refresh=True)
+                    frames = {name: data[name] for name in frame_names}
+                return frames
+            finally:
+                cache.delete(CLEANED_DATA_BUILD_LOCK_KEY)
+        time.sleep(0.5)
+        frames = _read_frames(frame_names)
+        if frames is not None:
+            return frames
+
+    logger.error("Timed out waiting for the cleaned data build; loading an unpublished copy.")
+    data = apply_schemas(_load_full())
+    return {name: data[name] for name in frame_names}
+
+def load_and_clean_all_data(force_refresh=False, incremental=False):
+    """
+    Returns the cleaned data bundle (users, places and the four interaction frames).
+
+    With `incremental=True` a refresh merges only the rows that are new or changed
+    since the previous load (per-source high-water marks plus the dirty sets filled
+    by the signal handlers) into the cached frames. A full reload still happens when
+    nothing is cached yet or when the last full load is older than
+    `FULL_DATA_REFRESH_INTERVAL`, which also catches writes that bypass signals.
+    """
+    cache_config = settings.RECOMMENDATION_SETTINGS.get('CACHING', {})
+    cached_data = None
+    if not force_refresh or incremental:
+        cached_data = _read_frames(FRAME_NAMES)
+    if not force_refresh and cached_data is not None:
+        logger.info("Serving cleaned data from cache.")
+        return cached_data
+
+    marks = cache.get(cache_keys.CLEANED_DATA_WATERMARKS_KEY) if incremental else None
+    full_interval = cache_config.get('FULL_DATA_REFRESH_INTERVAL', 3600 * 6)
+    can_delta = (
+        cached_data is not None and marks is not None
+        and timezone.now() - marks['full_refresh_at'] < timedelta(seconds=full_interval)
+    )
+
+    new_marks = _current_watermarks()
+    data = None
+    if can_delta:
+        dirty_users, dirty_places = set(), set()
+        try:
+            dirty_users = _pop_dirty(cache_keys.DIRTY_USERS_KEY)
+            dirty_places = _pop_dirty(cache_keys.DIRTY_PLACES_KEY)
+            data = _load_delta(cached_data, marks, dirty_users, dirty_places)
+            new_marks['full_refresh_at'] = marks['full_refresh_at']
+        except Exception as e:
+            logger.error(f"Delta refresh failed, falling back to a full reload: {e}", exc_info=True)
+            _restore_dirty(cache_keys.DIRTY_USERS_KEY, dirty_users)
+            _restore_dirty(cache_keys.DIRTY_PLACES_KEY, dirty_places)
+            data = None
+
+    if data is None:
+        logger.info("Loading and cleaning all data from database.")
+        if incremental:
+            # Everything dirty up to now is covered by the full load.
+            try:
+                _pop_dirty(cache_keys.DIRTY_USERS_KEY)
+                _pop_dirty(cache_keys.DIRTY_PLACES_KEY)
+            except Exception as e:
+                logger.warning(f"Could not clear dirty sets before full reload: {e}")
+        data = _load_full()
+        new_marks['full_refresh_at'] = timezone.now()
+
     timeout = cache_config.get('GLOBAL_CACHE_TIMEOUT', 3600 * 2)
-    cache.set(cache_keys.CLEANED_DATA_KEY, data, timeout=timeout)
+    data = _store_frames(apply_schemas(data), timeout)
+    cache.set(cache_keys.CLEANED_DATA_WATERMARKS_KEY, new_marks, timeout=timeout)
     return data
 
 def get_all_scored_interactions(cleaned_data):
@@ -152,10 +656,11 @@ def get_all_scored_interactions(cleaned_data):
     visits_df = cleaned_data.get('visits_df', pd.DataFrame())
     shares_df = cleaned_data.get('shares_df', pd.DataFrame())
 
-    reviews_df_scored = reviews_df.assign(score=reviews_df['rating'] / REVIEW_MAX) if not reviews_df.empty else pd.DataFrame(columns=['user_id', 'place_id', 'score'])
-    likes_df_scored = likes_df.assign(score=LIKE_WEIGHT) if not likes_df.empty else pd.DataFrame(columns=['user_id', 'place_id', 'score'])
-    visits_df_scored = visits_df.assign(score=VISIT_WEIGHT) if not visits_df.empty else pd.DataFrame(columns=['user_id', 'place_id', 'score'])
-    shares_df_scored = shares_df.assign(score=SHARE_WEIGHT) if not shares_df.empty else pd.DataFrame(columns=['user_id', 'place_id', 'score'])
+    empty_scored = pd.DataFrame(columns=['user_id', 'place_id', 'score'])
+    reviews_df_scored = reviews_df.assign(score=reviews_df['rating'] / REVIEW_MAX) if not reviews_df.empty else empty_scored
+    likes_df_scored = likes_df.assign(score=LIKE_WEIGHT) if not likes_df.empty else empty_scored
+    visits_df_scored = visits_df.assign(score=VISIT_WEIGHT) if not visits_df.empty else empty_scored
+    shares_df_scored = shares_df.assign(score=SHARE_WEIGHT) if not shares_df.empty else empty_scored
 
     all_interactions = pd.concat([
         reviews_df_scored[['user_id', 'place_id', 'score']],
@@ -163,13 +668,76 @@ def get_all_scored_interactions(cleaned_data):
         visits_df_scored[['user_id', 'place_id', 'score']],
         shares_df_scored[['user_id', 'place_id', 'score']]
     ])
-    return all_interactions
-
-def chunked_iterator(iterable, size):
-    """Yield successive n-sized chunks from an iterable."""
-    it = iter(iterable)
-    while True:
-        chunk = tuple(islice(it, size))
-        if not chunk:
-            return
-        yield chunk
+    return apply_schema(all_interactions, 'scored_interactions')
+
+# --- Materialized User-Place Scores ---
+
+def score_user_place(user_id, place_id):
+    """
+    Scores one (user, place) pair straight from the source tables, with the same
+    weights and de-duplication as `get_all_scored_interactions` followed by a
+    per-pair sum: the latest published review, plus one like, view and share at most.
+    """
+    rec_settings = settings.RECOMMENDATION_SETTINGS
+    score = 0.0
+
+    rating = (
+        Review.objects.filter(user_id=user_id, place_id=place_id, status='published')
+        .order_by('-id').values_list('rating', flat=True).first()
+    )
+    if rating is not None:
+        score += rating / rec_settings['REVIEW_MAX']
+    if PlaceLike.objects.filter(user_id=user_id, place_id=place_id).exists():
+        score += rec_settings['LIKE_WEIGHT']
+
+    activities = UserActivity.objects.filter(
+        user_id=user_id, content_type_id=get_place_content_type_id(), object_id=place_id
+    )
+    if activities.filter(activity_type='view').exists():
+        score += rec_settings['VISIT_WEIGHT']
+    if activities.filter(activity_type='share').exists():
+        score += rec_settings.get('SHARE_WEIGHT', 0.4)
+    return score
+
+def refresh_user_place_score(user_id, place_id):
+    """
+    Recomputes and atomically upserts the materialized score of one pair.
+    Recomputing (rather than adding a delta) keeps the row idempotent under
+    repeated views and out-of-order signals. Returns (old_score, new_score).
+    """
+    for attempt in range(2):
+        try:
+            with transaction.atomic():
+                row = UserPlaceScore.objects.select_for_update().filter(user_id=user_id, place_id=place_id).first()
+                old_score = row.score if row else 0.0
+                new_score = score_user_place(user_id, place_id)
+                if new_score > 0:
+                    if row:
+                        row.score = new_score
+                        row.save(update_fields=['score', 'updated_at'])
+                    else:
+                        UserPlaceScore.objects.create(user_id=user_id, place_id=place_id, score=new_score)
+                elif row:
+                    row.delete()
+            return old_score, new_score
+        except IntegrityError:
+            # A missing row cannot be locked, so a concurrent refresh of the same new
+            # pair may insert it first. Retry once: the row now exists and is locked.
+            if attempt:
+                raise
+
+def aggregate_user_place_scores():
+    """Scores every (user, place) pair from the raw interaction tables in one pass."""
+    interaction_data = {
+        'reviews_df': clean_interactions_df(get_review_data(), 'reviews'),
+        'likes_df': clean_interactions_df(get_like_data(), 'likes'),
+        'visits_df': clean_interactions_df(get_visit_data(), 'visits'),
+        'shares_df': clean_interactions_df(get_share_data(), 'shares'),
+    }
+    all_interactions = get_all_scored_interactions(interaction_data)
+    return all_interactions.groupby(['user_id', 'place_id'], as_index=False)['score'].sum()
+
+def get_user_place_scores():
+    """Loads the materialized (user_id, place_id, score) table as a compact frame."""
+    columns = [('user_id', np.int32), ('place_id', np.int32), ('score', np.float32)]
+    return pd.DataFrame(_fetch_columns(UserPlaceScore.objects.order_by(), columns))
@@ -2,13 +2,17 @@ import logging
 import redis
 from django.conf import settings
 from django.core.cache import cache
+from django.db import transaction
 
 from recommendations import (
+    als,
+    batch,
     cache_keys,
     cache_management,
     content_based,
     data_utils,
     hybrid,
+    item_based,
     user_based
 )
 
@@ -58,7 +62,7 @@ class RecommendationEngine:
 
     def get_similar_places(self, place_id, num_recommendations=5, force_refresh=False):
         """
-        Finds places that are most similar to a given place based on content.
+        Looks up the precomputed places most similar to a given place based on content.
         """
         return content_based.get_similar_places(place_id, num_recommendations, force_refresh)
 
@@ -90,33 +94,69 @@ class RecommendationEngine:
         """
         return hybrid.compute_hybrid_scores(user_id, collab_data)
 
+    def generate_batch_recommendations(self, user_ids=None, collab_data=None):
+        """
+        Computes and caches hybrid scores for many users at once (see `batch`).
+        """
+        return batch.generate_batch_recommendations(user_ids, collab_data)
+
     # --- Cache Rebuilding Facade ---
     # These methods provide a clean API for the Celery tasks to call.
 
-    def rebuild_user_similarity_cache(self):
+    def rebuild_user_similarity_cache(self, with_neighbors=True):
         """Triggers the rebuild of the user similarity cache."""
-        return user_based.rebuild_user_similarity_cache()
+        return user_based.rebuild_user_similarity_cache(with_neighbors)
+
+    def update_dirty_user_neighbors(self):
+        """Patches the neighbors of users whose scores changed in the cached user similarity data."""
+        return user_based.update_dirty_user_neighbors()
+
+    def rebuild_item_similarity_cache(self):
+        """Triggers the rebuild of the item-item similarity cache."""
+        return item_based.rebuild_item_similarity_cache()
+
+    def rebuild_als_model_cache(self, cold_start=False):
+        """Triggers a (warm-started) retrain of the ALS model."""
+        return als.rebuild_als_model_cache(cold_start)
 
-    def rebuild_scaled_item_profiles_cache(self):
-        """Triggers the rebuild of the scaled item profiles cache."""
-        return content_based.rebuild_scaled_item_profiles_cache()
+    def rebuild_content_features_cache(self):
+        """Triggers the rebuild of the fitted content feature artifact."""
+        return content_based.rebuild_content_features_cache()
+
+    def rebuild_similar_places(self):
+        """Triggers the bulk top-K similar places build."""
+        return content_based.rebuild_similar_places()
+
+    def remove_similar_places(self, place_id):
+        """Drops a deleted place from the similar places lookup."""
+        return content_based.remove_similar_places(place_id)
+
+    def refresh_user_place_score(self, user_id, place_id):
+        """
+        Refreshes one materialized score and, if it changed, applies the delta to the
+        user's content profile and flags their neighbors for the next incremental
+        update instead of waiting for the next full rebuild.
+        """
+        with transaction.atomic():
+            old_score, new_score = data_utils.refresh_user_place_score(user_id, place_id)
+            if old_score == new_score:
+                return
+            # Numbered before the new score commits (see content_based "Per-User Profiles").
+            sequence = content_based.next_profile_sequence(user_id)
+        content_based.apply_user_profile_delta(user_id, place_id, new_score - old_score, sequence)
+        if user_based.incremental_updates_enabled():
+            data_utils.mark_neighbors_dirty([user_id])
 
     # --- Data Loading Facade ---
 
-    def load_and_clean_all_data(self, force_refresh=False):
+    def load_and_clean_all_data(self, force_refresh=False, incremental=False):
         """Facade for the data loading and cleaning utility."""
-        return data_utils.load_and_clean_all_data(force_refresh)
+        return data_utils.load_and_clean_all_data(force_refresh, incremental)
 
     def _get_all_scored_interactions(self, cleaned_data):
         """Facade for getting scored interactions."""
         return data_utils.get_all_scored_interactions(cleaned_data)
 
-    def _create_item_profiles(self, places_df, users_df, all_interactions):
-        """Facade for creating item profiles, needed by evaluation command."""
-        # This is a bit of a leaky abstraction, but required for the eval command
-        # without duplicating the logic there.
-        return content_based._create_item_profiles(places_df, users_df, all_interactions)
-
 
 # Singleton instance for easy access throughout the Django application
 recommendation_engine = RecommendationEngine()
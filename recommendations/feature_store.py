@@ -0,0 +1,97 @@
+"""
+On-disk versions of the fitted content feature pipeline.
+
+Each fit of the pipeline (item profiles, OneHotEncoder, StandardScaler, column
+schema and vector index) gets its own version id and is written as one joblib
+file plus a `manifest.json`. Arrays are stored uncompressed, so readers load
+them with mmap_mode='r' and every process on the host shares the same pages.
+Versions are published behind a `CURRENT` pointer (see `versioned_dir`), so
+readers only ever see complete versions.
+
+Layout:
+    <ROOT>/CURRENT                      id of the latest version
+    <ROOT>/<version>/manifest.json
+    <ROOT>/<version>/features.joblib
+"""
+import json
+import logging
+import os
+
+import joblib
+from django.conf import settings
+from django.utils import timezone
+
+from recommendations import snapshot, versioned_dir
+
+logger = logging.getLogger(__name__)
+
+FEATURE_STORE_FORMAT_VERSION = 1
+MANIFEST_NAME = 'manifest.json'
+FEATURES_NAME = 'features.joblib'
+
+
+def get_feature_store_config():
+    return settings.RECOMMENDATION_SETTINGS.get('FEATURE_STORE', {})
+
+def is_enabled():
+    return bool(get_feature_store_config().get('ENABLED', False))
+
+def _root():
+    config = get_feature_store_config()
+    return config.get('ROOT') or os.path.join(settings.BASE_DIR, 'recommendation_data', 'features')
+
+def new_version_id():
+    """Sortable, unique id of one pipeline fit."""
+    return snapshot.new_generation_id()
+
+# --- Writer ---
+
+def write_features(features):
+    """
+    Writes a content feature artifact as a new version and publishes it.
+    Returns the manifest.
+    """
+    version = features['version']
+    manifest = {
+        'format': FEATURE_STORE_FORMAT_VERSION,
+        'version': version,
+        'generation': features['generation'],
+        'created_at': timezone.now().isoformat(),
+        'places': int(features['profiles'].shape[0]),
+        'columns': list(features['columns']),
+    }
+
+    def write(directory):
+        joblib.dump(features, os.path.join(directory, FEATURES_NAME))
+        with open(os.path.join(directory, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+
+    versioned_dir.publish(_root(), version, write, keep=get_feature_store_config().get('KEEP', 3))
+    logger.info(f"Published content feature version '{version}' for generation '{features['generation']}'.")
+    return manifest
+
+# --- Reader ---
+
+def current_version():
+    return versioned_dir.current(_root())
+
+def read_manifest(version):
+    with open(os.path.join(_root(), version, MANIFEST_NAME), encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('format') != FEATURE_STORE_FORMAT_VERSION:
+        raise ValueError(f"Unsupported feature store format {manifest.get('format')} in '{version}'.")
+    return manifest
+
+def read_features(version=None):
+    """
+    Loads a content feature artifact (default: `CURRENT`) with its arrays
+    memory-mapped read-only, or returns None if the version does not exist.
+    """
+    version = version or current_version()
+    if version is None:
+        return None
+    directory = os.path.join(_root(), version)
+    if not os.path.isdir(directory):
+        return None
+    read_manifest(version)
+    return joblib.load(os.path.join(directory, FEATURES_NAME), mmap_mode='r')
@@ -2,7 +2,7 @@ import logging
 from django.conf import settings
 
 from review_place.models import Review, PlaceLike, UserActivity
-from recommendations import user_based, content_based, popularity_based
+from recommendations import als, data_utils, user_based, item_based, content_based, popularity_based
 
 logger = logging.getLogger(__name__)
 
@@ -17,7 +17,9 @@ def get_dynamic_weights(user_id):
     try:
         num_reviews = Review.objects.filter(user_id=user_id).count()
         num_likes = PlaceLike.objects.filter(user_id=user_id).count()
-        num_visits = UserActivity.objects.filter(user_id=user_id, activity_type='view', content_type__model='place').count()
+        num_visits = UserActivity.objects.filter(
+            user_id=user_id, activity_type='view', content_type_id=data_utils.get_place_content_type_id()
+        ).count()
 
         total_interactions = num_reviews + num_likes + num_visits
 
@@ -33,6 +35,18 @@ def get_dynamic_weights(user_id):
         # Fallback to medium weights
         return WEIGHT_CONFIG.get("medium_weight", (0.4, 0.5, 0.1))
 
+def get_collaborative_component():
+    """'user_based' (default), 'item_based' or 'als': which CF model fills the collaborative slot."""
+    return settings.RECOMMENDATION_SETTINGS.get('COLLABORATIVE_COMPONENT', 'user_based')
+
+def get_collaborative_recommendations(user_id, collab_data, num_recommendations=50):
+    component = get_collaborative_component()
+    if component == 'item_based':
+        return item_based.get_item_based_recommendations(user_id, collab_data, num_recommendations, filter_interacted=False)
+    if component == 'als':
+        return als.get_als_recommendations(user_id, collab_data, num_recommendations, filter_interacted=False)
+    return user_based.get_user_based_recommendations(user_id, collab_data, num_recommendations, filter_interacted=False)
+
 def compute_hybrid_scores(user_id, collab_data):
     """
     The core computation logic for generating hybrid recommendation scores.
@@ -45,7 +59,7 @@ def compute_hybrid_scores(user_id, collab_data):
     base_weights = list(get_dynamic_weights(user_id))
 
     # 2. Get recommendations from all models
-    user_based_recs = user_based.get_user_based_recommendations(user_id, collab_data, 50, filter_interacted=False)
+    user_based_recs = get_collaborative_recommendations(user_id, collab_data, 50)
     content_based_recs = content_based.get_content_based_recommendations(user_id, collab_data, 50, filter_interacted=False)
     popularity_recs = popularity_based.get_popularity_based_recommendations(num_recommendations=50)
 
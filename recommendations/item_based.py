@@ -0,0 +1,134 @@
+import logging
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from scipy.sparse import csr_matrix
+
+from recommendations import cache_keys, cache_management, selection, user_based
+from recommendations.models import UserPlaceScore
+
+logger = logging.getLogger(__name__)
+
+
+def get_item_based_settings():
+    item_settings = settings.RECOMMENDATION_SETTINGS.get('ITEM_BASED_SETTINGS', {})
+    return item_settings.get('top_k_neighbors', 50), item_settings.get('build_block_size', 500)
+
+def _rebuild_item_similarity_matrix():
+    """
+    Computes each place's top-K most similar places (adjusted cosine: user-mean-centered
+    scores, compared column-wise) from the materialized (user, place, score) table.
+    Returns {'item_similarity': CSR (n_places x n_places, positive scores only),
+    'place_ids': sorted place ids for its rows/columns}, or {} if there is no data.
+    """
+    logger.info("Starting item similarity matrix computation.")
+    all_interactions = user_based._load_user_place_scores()
+    if all_interactions.empty:
+        logger.warning("No interaction data available for item similarity matrix.")
+        return {}
+
+    user_item_matrix, _, place_ids = user_based.build_user_item_matrix(all_interactions)
+    if user_item_matrix.nnz == 0:
+        return {}
+
+    k, block_size = get_item_based_settings()
+    item_user_centered = user_based.mean_center_rows(user_item_matrix).T.tocsr()
+    neighbor_index, neighbor_scores = user_based.build_neighbors(item_user_centered, k, block_size=block_size)
+
+    keep = (neighbor_index >= 0) & (neighbor_scores > 0)
+    rows = np.broadcast_to(np.arange(len(place_ids))[:, None], keep.shape)
+    item_similarity = csr_matrix(
+        (neighbor_scores[keep], (rows[keep], neighbor_index[keep])),
+        shape=(len(place_ids), len(place_ids))
+    )
+    logger.info(f"Finished item similarity matrix computation: {len(place_ids)} places, top {k} neighbors each.")
+    return {'item_similarity': item_similarity, 'place_ids': place_ids}
+
+def rebuild_item_similarity_cache():
+    """
+    Computes and caches the top-K item-item similarity matrix.
+    This function is intended to be called by a cache-building process (e.g., a task).
+    """
+    try:
+        item_data = _rebuild_item_similarity_matrix()
+        if item_data:
+            # Kept until the next build replaces it: readers serve the last published
+            # matrix rather than building one themselves.
+            cache.set(cache_keys.ITEM_BASED_DATA_KEY, item_data, timeout=None)
+            logger.info("Successfully rebuilt and cached item similarity data.")
+            return item_data
+        logger.warning("Item similarity rebuild produced no data. Not caching.")
+        return {}
+    except Exception as e:
+        logger.error(f"Error rebuilding item similarity cache: {e}")
+        return {}
+
+def get_item_based_data(force_refresh=False):
+    """
+    Returns the last published item similarity data, or {} if none has been
+    published yet, in which case the global rebuild is queued to build it.
+    Only `force_refresh=True`, meant for cache-building processes, builds synchronously.
+    """
+    if force_refresh:
+        return rebuild_item_similarity_cache()
+    cached_value = cache.get(cache_keys.ITEM_BASED_DATA_KEY)
+    if cached_value is None:
+        logger.warning("No item similarity data has been published yet; queued the global rebuild to build it.")
+        cache_management.request_global_rebuild()
+        return {}
+    return cached_value
+
+def _get_user_scores(user_id, collab_data):
+    """
+    The user's (place_id, score) pairs. Read from the cached CF bundle when it has
+    the user, otherwise straight from the UserPlaceScore table (e.g. new users).
+    """
+    ratings = user_based.get_user_ratings(user_id, collab_data or {})
+    if not ratings.empty:
+        return ratings.index.to_numpy(), ratings.to_numpy(dtype=np.float64)
+    rows = list(UserPlaceScore.objects.filter(user_id=user_id, score__gt=0).values_list('place_id', 'score'))
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    place_ids, scores = zip(*rows)
+    return np.asarray(place_ids), np.asarray(scores, dtype=np.float64)
+
+def score_places_from_items(place_positions, scores, item_similarity):
+    """
+    Sums the similarity-weighted scores of the neighbors of each interacted place:
+    score(j) = sum_i r_i * sim(i, j). Returns a dense array over all places.
+    """
+    return item_similarity[place_positions].T @ scores
+
+def get_item_based_recommendations(user_id, collab_data=None, num_recommendations=10, filter_interacted=True, item_data=None):
+    logger.info(f"IBF: Starting item-based recommendations for user {user_id}")
+    try:
+        item_data = item_data or get_item_based_data()
+        if not item_data:
+            logger.warning(f"IBF: Exiting for user {user_id} because item similarity data is not available.")
+            return []
+
+        place_ids = item_data['place_ids']
+        rated_place_ids, rated_scores = _get_user_scores(user_id, collab_data)
+        positions = np.searchsorted(place_ids, rated_place_ids).clip(max=len(place_ids) - 1)
+        known = place_ids[positions] == rated_place_ids
+        if not known.any():
+            logger.warning(f"IBF: User {user_id} has no interactions with indexed places. Exiting.")
+            return []
+
+        scores = score_places_from_items(positions[known], rated_scores[known], item_data['item_similarity'])
+        candidates = np.flatnonzero(scores > 0)
+        candidate_ids, candidate_scores = place_ids[candidates], scores[candidates]
+
+        if filter_interacted:
+            user_interacted_places = cache_management.get_user_interacted_places(user_id)
+            if user_interacted_places:
+                keep = ~np.isin(candidate_ids, np.fromiter(user_interacted_places, dtype=np.int64))
+                candidate_ids, candidate_scores = candidate_ids[keep], candidate_scores[keep]
+
+        final_recs = candidate_ids[selection.top_n_positions(candidate_scores, num_recommendations)].tolist()
+        logger.info(f"IBF: User {user_id}: Successfully generated {len(final_recs)} final recommendations.")
+        return final_recs
+    except Exception as e:
+        logger.error(f"Error in item-based recommendations for user {user_id}: {e}", exc_info=True)
+        return []
@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from recommendations import data_utils
+from recommendations.models import UserPlaceScore
+
+
+class Command(BaseCommand):
+    help = (
+        'Re-syncs the materialized UserPlaceScore table with the raw review, like and '
+        'activity history. The signal handlers keep it current afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Users per upsert batch.')
+
+    def handle(self, *args, **options):
+        # Rows a signal refresh writes from here on are computed from tables at least
+        # as new as the aggregate below, so they are never overwritten.
+        started = timezone.now()
+        self.stdout.write('Aggregating interaction scores...')
+        scores = data_utils.aggregate_user_place_scores()
+        scores = scores[scores['score'] > 0]
+        by_user = {}
+        for user_id, place_id, score in scores[['user_id', 'place_id', 'score']].itertuples(index=False):
+            by_user.setdefault(int(user_id), {})[int(place_id)] = float(score)
+
+        user_ids = sorted(by_user)
+        updated = created = 0
+        for start in range(0, len(user_ids), options['batch_size']):
+            batch_users = user_ids[start:start + options['batch_size']]
+            with transaction.atomic():
+                # Locked rows make a concurrent refresh of the same pair wait and then
+                # recompute from the tables; a pair it inserts first is left alone.
+                existing = {
+                    (row.user_id, row.place_id): row
+                    for row in UserPlaceScore.objects.select_for_update().filter(user_id__in=batch_users)
+                }
+                to_update, to_create = [], []
+                for user_id in batch_users:
+                    for place_id, score in by_user[user_id].items():
+                        row = existing.get((user_id, place_id))
+                        if row is None:
+                            to_create.append(UserPlaceScore(user_id=user_id, place_id=place_id, score=score))
+                        elif row.updated_at < started:
+                            row.score, row.updated_at = score, timezone.now()
+                            to_update.append(row)
+                UserPlaceScore.objects.bulk_update(to_update, ['score', 'updated_at'])
+                UserPlaceScore.objects.bulk_create(to_create, ignore_conflicts=True)
+            updated += len(to_update)
+            created += len(to_create)
+
+        # Rows neither in the aggregate nor refreshed since it started are stale.
+        removed, _ = UserPlaceScore.objects.filter(updated_at__lt=started).delete()
+        self.stdout.write(self.style.SUCCESS(
+            f'Synced user-place scores: {created} created, {updated} updated, {removed} removed.'
+        ))
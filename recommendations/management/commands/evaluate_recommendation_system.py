@@ -21,13 +21,14 @@ class Command(BaseCommand):
             self.stdout.write(self.style.NOTICE('Rebuilding global recommendation caches...'))
             # This now returns the data, so we can use it directly
             collab_data = recommendation_engine.rebuild_user_similarity_cache() 
-            recommendation_engine.rebuild_scaled_item_profiles_cache()
 
             # Load and clean all data using the engine, forcing a refresh
             self.stdout.write(self.style.NOTICE('Loading and cleaning all data with force_refresh=True...'))
             cleaned_data = recommendation_engine.load_and_clean_all_data(force_refresh=True)
             users_df = cleaned_data['users_df']
             places_df = cleaned_data['places_df']
+            # Fitted after the refresh, so diversity and CBF use the same feature version.
+            features = recommendation_engine.rebuild_content_features_cache()
 
             # --- Prepare Ground Truth using the new scoring logic from the engine ---
             all_interactions = recommendation_engine._get_all_scored_interactions(cleaned_data)
@@ -46,11 +47,11 @@ class Command(BaseCommand):
             self.stdout.write(self.style.NOTICE('Filtering users for meaningful evaluation...'))
             user_item_matrix = collab_data.get('user_item_matrix')
 
-            if user_item_matrix is None or user_item_matrix.empty:
+            if user_item_matrix is None or user_item_matrix.nnz == 0:
                 self.stdout.write(self.style.ERROR("User-item matrix is empty. Cannot perform evaluation."))
                 return
 
-            valid_user_ids = set(user_item_matrix.index)
+            valid_user_ids = set(collab_data['user_ids'].tolist())
             original_user_count = len(ground_truth_dict)
             
             # Filter the ground truth dictionary
@@ -68,8 +69,12 @@ class Command(BaseCommand):
 
             # --- Prepare Item Profiles for Diversity Calculation ---
             self.stdout.write(self.style.NOTICE('Generating item profiles for diversity calculation...'))
-            item_profiles_for_eval, _, _ = recommendation_engine._create_item_profiles(places_df, users_df, all_interactions)
-            
+            item_profiles_for_eval = pd.DataFrame()
+            if features:
+                item_profiles_for_eval = pd.DataFrame(
+                    features['profiles'], index=features['place_ids'], columns=features['columns']
+                )
+
             if item_profiles_for_eval.empty:
                 self.stdout.write(self.style.WARNING("Could not generate item profiles. Diversity will be 0."))
             else:
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from review_place.models import CustomUser, UserActivity
+from recommendations import data_utils
+
+
+class Command(BaseCommand):
+    help = (
+        'Prints the database query plans for the place-scoped UserActivity reads used by the '
+        'recommendation loaders and dynamic hybrid weights. Run it before and after '
+        '`migrate review_place 0003` on a seeded database to compare the plans. The loaders '
+        'keep only activities of existing places with an `object_id IN (SELECT id FROM place)` '
+        'subquery; their plans should still search useractivity_type_object_idx.'
+    )
+
+    def _queries(self):
+        """The hot UserActivity reads, built exactly as the recommendation code builds them."""
+        place_type_id = data_utils.get_place_content_type_id()
+        sample_user = CustomUser.objects.order_by('id').values_list('id', flat=True).first() or 0
+
+        return {
+            'visit loader (get_visit_data)': data_utils._place_activities('view').values_list('user_id', 'object_id'),
+            'share loader (get_share_data)': data_utils._place_activities('share').values_list('user_id', 'object_id'),
+            'dynamic weights visit count (hybrid.get_dynamic_weights)': UserActivity.objects.filter(
+                user_id=sample_user, activity_type='view', content_type_id=place_type_id
+            ).values('id'),
+            'legacy join on content_type__model': UserActivity.objects.filter(
+                activity_type='view', content_type__model='place'
+            ).values_list('user_id', 'object_id'),
+        }
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS(f'Query plans on {connection.vendor}:'))
+        for label, queryset in self._queries().items():
+            self.stdout.write(self.style.NOTICE(f'\n-- {label}'))
+            self.stdout.write(str(queryset.query))
+            try:
+                self.stdout.write(queryset.explain())
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f'Could not explain query: {e}'))
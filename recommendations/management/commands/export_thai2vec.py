@@ -0,0 +1,63 @@
+import os
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from gensim.models import KeyedVectors, Word2Vec
+from pythainlp.word_vector import WordVector
+from recommendations import content_based, snapshot, versioned_dir
+
+
+class Command(BaseCommand):
+    help = (
+        'Exports the Thai2Vec word vectors once as gensim KeyedVectors with the vector '
+        'matrix in a separate .npy file, which every process then memory-maps read-only. '
+        'Each export is a new version directory next to '
+        "RECOMMENDATION_SETTINGS['THAI2VEC']['PATH'], published by swapping a CURRENT pointer."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source',
+            help='A Word2Vec model saved by train_word2vec_model. Defaults to the pythainlp Thai2Vec model.'
+        )
+        parser.add_argument('--path', help='Output path (defaults to the THAI2VEC PATH setting).')
+        parser.add_argument('--keep', type=int, default=2, help='Exported versions to keep on disk.')
+
+    def _load_source(self, source):
+        if source:
+            return Word2Vec.load(source).wv
+        return WordVector().get_model()
+
+    def handle(self, *args, **options):
+        path = options['path'] or content_based.get_thai2vec_settings()[0]
+        if not path:
+            self.stdout.write(self.style.ERROR("No output path given and THAI2VEC PATH is not set."))
+            return
+
+        self.stdout.write('Loading source vectors...')
+        vectors = self._load_source(options['source'])
+        vectors.vectors = np.ascontiguousarray(vectors.vectors, dtype=np.float32)
+
+        # Both files of an export go into their own version directory, moved into place
+        # whole before CURRENT is swapped, so a reader never pairs a .kv with another
+        # export's .npy. Processes holding a previous version keep their mappings.
+        directory, file_name = os.path.split(os.path.abspath(path))
+        version = snapshot.new_generation_id()
+        versioned_dir.publish(
+            directory, version,
+            write=lambda version_dir: vectors.save(os.path.join(version_dir, file_name), separately=['vectors']),
+            keep=options['keep'],
+            # The export directory may hold other files; only exports count as versions.
+            is_version=lambda version_dir: os.path.isfile(os.path.join(version_dir, file_name))
+        )
+        path = os.path.join(directory, version, file_name)
+
+        started = time.perf_counter()
+        loaded = KeyedVectors.load(path, mmap='r')
+        load_ms = 1000 * (time.perf_counter() - started)
+        self.stdout.write(self.style.SUCCESS(
+            f'Exported {len(loaded.index_to_key)} vectors of size {loaded.vector_size} to {path} '
+            f'(memory-mapped load: {load_ms:.1f} ms).'
+        ))
+
@@ -1,13 +1,10 @@
 import logging
-import re
-import string
+import os
 import pandas as pd
 from gensim.models import Word2Vec
-from pythainlp.corpus import thai_stopwords
-from pythainlp.tokenize import word_tokenize
-from pythainlp.util import normalize
 from django.core.management.base import BaseCommand
 from review_place.models import Place
+from recommendations.text_processing import tokenize_batch
 
 class Command(BaseCommand):
     help = 'Trains and saves the Thai2Vec Word2Vec model.'
@@ -16,22 +13,17 @@ class Command(BaseCommand):
     # Note: This saves to the CWD of the manage.py command.
     THAI2VEC_MODEL_PATH = 'thai2vec.model'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tokenize-workers', type=int, default=os.cpu_count() or 1,
+            help='Processes used to tokenize descriptions (defaults to all cores).'
+        )
+
     def _get_place_data(self):
         """Fetches place data from the database."""
         places = Place.objects.all().values('id', 'description')
         return pd.DataFrame(list(places))
 
-    def _preprocess_thai_text(self, text):
-        """Preprocesses Thai text for Word2Vec training."""
-        if not isinstance(text, str):
-            return []
-        text = normalize(text)
-        text = re.sub(rf'[\s{string.punctuation}a-zA-Z0-9]+', '', text)
-        tokens = word_tokenize(text, engine='newmm')
-        stop_words = thai_stopwords()
-        filtered_tokens = [word for word in tokens if word not in stop_words and not word.isspace()]
-        return filtered_tokens
-
     def handle(self, *args, **options):
         """The main logic of the management command."""
         logger = logging.getLogger(__name__)
@@ -44,7 +36,7 @@ class Command(BaseCommand):
             return
 
         self.stdout.write(f'Preprocessing text from {len(places_df)} places...')
-        sentences = [self._preprocess_thai_text(text) for text in places_df['description'].dropna()]
+        sentences = tokenize_batch(places_df['description'].dropna().tolist(), workers=options['tokenize_workers'])
 
         if not any(sentences):
             self.stdout.write(self.style.WARNING('No valid sentences found after preprocessing. Aborting.'))
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-17 02:44
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('review_place', '0003_useractivity_composite_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserPlaceScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('place', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_scores', to='review_place.place')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='place_scores', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'User Place Score',
+                'verbose_name_plural': 'User Place Scores',
+                'unique_together': {('user', 'place')},
+            },
+        ),
+    ]
@@ -0,0 +1,65 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import migrations
+
+
+def backfill_user_place_scores(apps, schema_editor):
+    """
+    Fills UserPlaceScore from the existing review, like and activity history, with
+    the same rules as `data_utils.score_user_place`: the latest published review,
+    plus one like, view and share at most. The signal handlers keep it current
+    from here on. Uses the historical models so it keeps working as models change.
+    """
+    Review = apps.get_model('review_place', 'Review')
+    PlaceLike = apps.get_model('review_place', 'PlaceLike')
+    UserActivity = apps.get_model('review_place', 'UserActivity')
+    Place = apps.get_model('review_place', 'Place')
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    UserPlaceScore = apps.get_model('recommendations', 'UserPlaceScore')
+
+    rec_settings = settings.RECOMMENDATION_SETTINGS
+    scores = defaultdict(float)
+
+    latest_ratings = {}
+    reviews = Review.objects.filter(status='published').order_by('id')
+    for user_id, place_id, rating in reviews.values_list('user_id', 'place_id', 'rating').iterator():
+        latest_ratings[(user_id, place_id)] = rating
+    for pair, rating in latest_ratings.items():
+        scores[pair] += rating / rec_settings['REVIEW_MAX']
+
+    for pair in set(PlaceLike.objects.order_by().values_list('user_id', 'place_id').iterator()):
+        scores[pair] += rec_settings['LIKE_WEIGHT']
+
+    place_type = ContentType.objects.filter(app_label='review_place', model='place').first()
+    if place_type is not None:
+        weights = {'view': rec_settings['VISIT_WEIGHT'], 'share': rec_settings.get('SHARE_WEIGHT', 0.4)}
+        activities = UserActivity.objects.filter(
+            activity_type__in=list(weights), content_type_id=place_type.id,
+            object_id__in=Place.objects.values('id')
+        ).order_by()
+        for user_id, place_id, activity_type in set(
+            activities.values_list('user_id', 'object_id', 'activity_type').iterator()
+        ):
+            scores[(user_id, place_id)] += weights[activity_type]
+
+    UserPlaceScore.objects.bulk_create(
+        [
+            UserPlaceScore(user_id=user_id, place_id=place_id, score=score)
+            for (user_id, place_id), score in scores.items() if score > 0
+        ],
+        batch_size=5000,
+        ignore_conflicts=True
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recommendations', '0001_initial'),
+        ('contenttypes', '0002_remove_content_type_name'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_user_place_scores, migrations.RunPython.noop),
+    ]
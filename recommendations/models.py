@@ -0,0 +1,23 @@
+from django.db import models
+from django.conf import settings
+
+
+class UserPlaceScore(models.Model):
+    """
+    Materialized interaction score of one user for one place: the same weighted
+    sum of review, like, view and share that `data_utils.get_all_scored_interactions`
+    produces, kept current by the interaction signal handlers so similarity
+    builds can read one compact table instead of the raw event history.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='place_scores')
+    place = models.ForeignKey('review_place.Place', on_delete=models.CASCADE, related_name='user_scores')
+    score = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('user', 'place')
+        verbose_name = "User Place Score"
+        verbose_name_plural = "User Place Scores"
+
+    def __str__(self):
+        return f'{self.user_id} -> {self.place_id}: {self.score:.3f}'
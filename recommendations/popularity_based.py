@@ -30,10 +30,12 @@ def get_popularity_based_recommendations(num_recommendations=10, force_refresh=F
     logger.info("Calculating popularity based recommendations.")
 
     try:
-        cleaned_data = data_utils.load_and_clean_all_data(force_refresh=force_refresh)
-        places_df = cleaned_data['places_df'].copy()
-        likes_df = cleaned_data['likes_df']
-        shares_df = cleaned_data['shares_df']
+        if force_refresh:
+            data_utils.load_and_clean_all_data(force_refresh=True)
+        frames = data_utils.load_frames('places', 'likes', 'shares')
+        places_df = frames['places_df'].copy()
+        likes_df = frames['likes_df']
+        shares_df = frames['shares_df']
 
         if places_df.empty:
             return []
@@ -0,0 +1,35 @@
+"""
+Forked process pools for the CPU-bound build steps (similarity blocks, text
+tokenization), with one rule for when a pool may be used and one serial fallback.
+"""
+import logging
+import multiprocessing
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def can_fork_pool():
+    """
+    Forking is only safe from a single-threaded process: a child of a threaded one
+    (e.g. a threaded web worker running an on-miss rebuild) can deadlock on a lock
+    another thread held at fork time.
+    """
+    return 'fork' in multiprocessing.get_all_start_methods() and threading.active_count() == 1
+
+def run_parallel_or_serial(workers, parallel, serial, activity):
+    """
+    Returns `parallel(context)`, given a `fork` multiprocessing context, when
+    `workers` > 1; falls back to `serial()` where child processes are not allowed
+    (e.g. inside a daemonic worker), `fork` is unavailable, or the calling process
+    runs other threads. `activity` names the work in log messages, e.g. 'tokenizing'.
+    """
+    if workers > 1 and not can_fork_pool():
+        logger.warning(f"Process pool unavailable in this process; {activity} serially.")
+    elif workers > 1:
+        try:
+            return parallel(multiprocessing.get_context('fork'))
+        except (AssertionError, OSError) as e:
+            # Daemonic processes (e.g. prefork Celery children) cannot spawn a pool.
+            logger.warning(f"Process pool could not start ({e}); {activity} serially.")
+    return serial()
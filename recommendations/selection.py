@@ -0,0 +1,40 @@
+"""
+Top-K selection over score arrays, shared by the neighbor builds, the vector
+indexes and the recommendation rankings: `np.argpartition` down to the k best
+entries, then a stable sort of those k only.
+"""
+import numpy as np
+
+
+def top_k_rows(scores, k):
+    """
+    Top-k columns of each row of a 2-D score block, best first.
+
+    Returns (positions, top_scores) of shape (rows, k). Entries scored -inf (or
+    NaN), and the tail of rows with fewer than k columns, are padding: position
+    -1 and score 0.
+    """
+    rows, n_columns = scores.shape
+    positions = np.full((rows, k), -1, dtype=np.int64)
+    top_scores = np.zeros((rows, k), dtype=scores.dtype)
+    k_eff = min(k, n_columns)
+    if k_eff <= 0:
+        return positions, top_scores
+    if k_eff < n_columns:
+        top = np.argpartition(-scores, k_eff - 1, axis=1)[:, :k_eff]
+    else:
+        top = np.broadcast_to(np.arange(n_columns), (rows, n_columns))
+    values = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-values, axis=1, kind='stable')
+    top = np.take_along_axis(top, order, axis=1)
+    values = np.take_along_axis(values, order, axis=1)
+    valid = np.isfinite(values)
+    positions[:, :k_eff] = np.where(valid, top, -1)
+    top_scores[:, :k_eff] = np.where(valid, values, 0)
+    return positions, top_scores
+
+def top_n_positions(scores, n):
+    """Positions of the n highest finite entries of a 1-D score array, best first."""
+    positions, _ = top_k_rows(np.asarray(scores)[None, :], max(n, 0))
+    positions = positions[0]
+    return positions[positions >= 0]
@@ -1,13 +1,27 @@
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.db import transaction
 from django.dispatch import receiver
 from review_place.models import Review, PlaceLike, Place, CustomUser, UserActivity
 from django.conf import settings
+from recommendations import data_utils
 from recommendations.tasks import (
     invalidate_similar_places_task,
     process_realtime_interaction,
+    refresh_user_place_score_task,
     schedule_global_rebuild_if_needed
 )
 
+def schedule_score_refresh(user_id, place_id):
+    """
+    Queues the refresh of the materialized UserPlaceScore row (and the profile and
+    neighbor updates that follow it) once the surrounding transaction commits, so
+    cascading deletes never write a row for a user or place being removed.
+    """
+    if user_id and place_id:
+        # robust=True: the triggering write has already committed, so a failure to
+        # enqueue is logged instead of turning the request into an error.
+        transaction.on_commit(lambda: refresh_user_place_score_task.delay(user_id, place_id), robust=True)
+
 # --- Review Signal Handlers ---
 
 @receiver(post_save, sender=Review)
@@ -19,6 +33,9 @@ def handle_review_save(sender, instance, created, **kwargs):
     user = instance.user
     place = instance.place
     score = instance.rating / settings.RECOMMENDATION_SETTINGS.get('REVIEW_MAX', 5.0)
+    # Rating edits and status changes do not move `review_date`, so flag the user.
+    data_utils.mark_users_dirty([instance.user_id])
+    schedule_score_refresh(instance.user_id, instance.place_id)
 
     if user and place and score > 0:
         # On update, this sends the new score, effectively boosting the item.
@@ -30,6 +47,8 @@ def handle_review_delete(sender, instance, **kwargs):
     """
     Handles a deleted review by reversing its score in the Speed Layer.
     """
+    data_utils.mark_users_dirty([instance.user_id])
+    schedule_score_refresh(instance.user_id, instance.place_id)
     user = instance.user
     place = instance.place
     score = instance.rating / settings.RECOMMENDATION_SETTINGS.get('REVIEW_MAX', 5.0)
@@ -65,6 +84,7 @@ def handle_interaction_creation(sender, instance, created, **kwargs):
             score = settings.RECOMMENDATION_SETTINGS.get('SHARE_WEIGHT', 0.4)
 
     if user and place and score > 0:
+        schedule_score_refresh(user.id, place.id)
         process_realtime_interaction.delay(user.id, place.id, score)
 
 
@@ -74,6 +94,7 @@ def handle_interaction_deletion(sender, instance, **kwargs):
     """
     Handles deleted interactions (Likes, Visits, Shares) by reversing the score.
     """
+    data_utils.mark_users_dirty([instance.user_id])
     user = instance.user
     place = None
     score = 0.0
@@ -89,18 +110,47 @@ def handle_interaction_deletion(sender, instance, **kwargs):
             score = settings.RECOMMENDATION_SETTINGS.get('SHARE_WEIGHT', 0.4)
 
     if user and place and score > 0:
+        schedule_score_refresh(user.id, place.id)
         process_realtime_interaction.delay(user.id, place.id, -score)
 
 
 # --- Global Cache Rebuild Triggers ---
 
+# Fields that change a place's one-hot feature columns. Any other edit (description,
+# rating, contact details...) is merged by the next scheduled rebuild: the place is
+# marked dirty and its description embedding is recomputed once its hash changes.
+STRUCTURAL_PLACE_FIELDS = ('category', 'location', 'price_range')
+
+@receiver(pre_save, sender=Place)
+def remember_structural_place_fields(sender, instance, update_fields=None, **kwargs):
+    """Keeps the stored structural fields so post_save can tell whether they changed."""
+    instance._structural_fields_before = None
+    if instance.pk and (update_fields is None or set(update_fields) & set(STRUCTURAL_PLACE_FIELDS)):
+        instance._structural_fields_before = (
+            Place.objects.filter(pk=instance.pk).values(*STRUCTURAL_PLACE_FIELDS).first()
+        )
+
+def _structural_place_change(instance, created, update_fields):
+    if created:
+        return True
+    if update_fields is not None and not set(update_fields) & set(STRUCTURAL_PLACE_FIELDS):
+        return False
+    before = getattr(instance, '_structural_fields_before', None)
+    return before is None or any(before[field] != getattr(instance, field) for field in STRUCTURAL_PLACE_FIELDS)
+
 @receiver([post_save, post_delete], sender=Place)
 def trigger_place_related_rebuild(sender, instance, **kwargs):
     """
     Handles cache updates after a Place is created, updated, or deleted.
-    Schedules a global cache rebuild, as a change in place data is significant.
+    Every change is merged by the next delta refresh; a global rebuild is only
+    scheduled now when the place set or its structural fields change.
     """
-    invalidate_similar_places_task.delay(instance.id)
+    data_utils.mark_places_dirty([instance.id])
+    if kwargs.get('signal') is post_delete:
+        # Edited places keep their similar places until the scheduled rebuild replaces them.
+        invalidate_similar_places_task.delay(instance.id)
+    elif not _structural_place_change(instance, kwargs.get('created', False), kwargs.get('update_fields')):
+        return
     schedule_global_rebuild_if_needed.delay()
 
 @receiver([post_save, post_delete], sender=CustomUser)
@@ -109,4 +159,5 @@ def trigger_user_profile_rebuild(sender, instance, **kwargs):
     Handles cache updates after a CustomUser is created, updated, or deleted.
     Schedules a global cache rebuild, as a change in user data is significant.
     """
+    data_utils.mark_users_dirty([instance.id])
     schedule_global_rebuild_if_needed.delay()
@@ -0,0 +1,212 @@
+"""
+Columnar on-disk snapshots of the cleaned data bundle.
+
+Each snapshot generation is a directory holding one `.npy` file per column plus
+a `manifest.json` describing the frames. Numeric and categorical columns are
+memory-mapped on read, so web and Celery processes on the same host share the
+same page-cache pages instead of each unpickling a private copy, and a reader
+only touches the frames and columns it asks for.
+
+Free-text columns (e.g. place descriptions) are stored as one UTF-8 buffer plus
+offsets, but decoding them creates private Python strings in every process that
+reads them, so they are left out of a default read: only a reader that names
+them in `columns` decodes them (see `data_utils.load_text_column`).
+
+Layout:
+    <ROOT>/CURRENT                      name of the latest generation
+    <ROOT>/<generation>/manifest.json
+    <ROOT>/<generation>/<frame>/c<N>.npy ...
+"""
+import json
+import logging
+import os
+import uuid
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.utils import timezone
+
+from recommendations import versioned_dir
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT_VERSION = 1
+MANIFEST_NAME = 'manifest.json'
+
+
+def get_snapshot_config():
+    return settings.RECOMMENDATION_SETTINGS.get('SNAPSHOT', {})
+
+def is_enabled():
+    return bool(get_snapshot_config().get('ENABLED', False))
+
+def _root():
+    config = get_snapshot_config()
+    return config.get('ROOT') or os.path.join(settings.BASE_DIR, 'recommendation_data', 'snapshots')
+
+def new_generation_id():
+    """Sortable, unique id shared by every part of one cleaned data build."""
+    return f"{timezone.now().strftime('%Y%m%d%H%M%S%f')}-{uuid.uuid4().hex[:8]}"
+
+# --- Column Encoding ---
+
+def _write_text(path_prefix, values):
+    """Stores strings as one UTF-8 byte buffer plus int64 offsets (Arrow-style)."""
+    mask = pd.isnull(values)
+    encoded = [b'' if is_null else str(value).encode('utf-8') for value, is_null in zip(values, mask)]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(item) for item in encoded], out=offsets[1:])
+    np.save(f'{path_prefix}.data.npy', np.frombuffer(b''.join(encoded), dtype=np.uint8))
+    np.save(f'{path_prefix}.offsets.npy', offsets)
+    if mask.any():
+        np.save(f'{path_prefix}.mask.npy', np.asarray(mask, dtype=bool))
+    return bool(mask.any())
+
+def _read_text(path_prefix, has_nulls):
+    data = np.load(f'{path_prefix}.data.npy', mmap_mode='r')
+    offsets = np.load(f'{path_prefix}.offsets.npy')
+    buffer = data.tobytes()
+    values = np.array(
+        [buffer[start:end].decode('utf-8') for start, end in zip(offsets[:-1], offsets[1:])],
+        dtype=object
+    )
+    if has_nulls:
+        values[np.load(f'{path_prefix}.mask.npy')] = None
+    return values
+
+def _column_kind(series):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return 'categorical'
+    if series.dtype.kind in 'biufM':
+        return 'numeric'
+    non_null = series.dropna()
+    if non_null.map(lambda value: isinstance(value, str)).all():
+        return 'text'
+    converted = pd.to_datetime(non_null, errors='coerce')
+    if not converted.isnull().any():
+        return 'datetime'
+    raise ValueError(f"Column '{series.name}' has an unsupported dtype for snapshots: {series.dtype}")
+
+def _write_column(directory, position, series):
+    prefix = os.path.join(directory, f'c{position}')
+    kind = _column_kind(series)
+    meta = {'name': series.name, 'kind': kind}
+    if kind == 'numeric':
+        np.save(f'{prefix}.npy', np.ascontiguousarray(series.to_numpy()))
+        meta['dtype'] = str(series.dtype)
+    elif kind == 'datetime':
+        np.save(f'{prefix}.npy', pd.to_datetime(series).to_numpy(dtype='datetime64[ns]'))
+        meta['dtype'] = 'datetime64[ns]'
+    elif kind == 'categorical':
+        np.save(f'{prefix}.codes.npy', series.cat.codes.to_numpy())
+        meta['categories'] = series.cat.categories.tolist()
+        meta['ordered'] = bool(series.cat.ordered)
+    else:
+        meta['has_nulls'] = _write_text(prefix, series.to_numpy(dtype=object))
+    return meta
+
+def _read_column(directory, position, meta):
+    prefix = os.path.join(directory, f'c{position}')
+    kind = meta['kind']
+    if kind in ('numeric', 'datetime'):
+        return np.load(f'{prefix}.npy', mmap_mode='r')
+    if kind == 'categorical':
+        codes = np.load(f'{prefix}.codes.npy', mmap_mode='r')
+        return pd.Categorical.from_codes(codes, categories=meta['categories'], ordered=meta['ordered'])
+    return _read_text(prefix, meta['has_nulls'])
+
+# --- Writer ---
+
+def _write_frame(directory, df):
+    os.makedirs(directory)
+    frame_meta = {'rows': len(df), 'index': None, 'columns': []}
+    if df.index.name is not None or not isinstance(df.index, pd.RangeIndex):
+        index_series = df.index.to_series(index=pd.RangeIndex(len(df)), name=df.index.name)
+        frame_meta['index'] = _write_column(directory, 'index', index_series)
+    for position, column in enumerate(df.columns):
+        frame_meta['columns'].append(_write_column(directory, position, df[column].reset_index(drop=True)))
+    return frame_meta
+
+def write_snapshot(data, generation=None):
+    """
+    Writes a dict of DataFrames as a new snapshot generation and publishes it
+    (see `versioned_dir.publish`), so readers never see a partial snapshot.
+    Returns the manifest.
+    """
+    generation = generation or new_generation_id()
+    manifest = {
+        'version': SNAPSHOT_FORMAT_VERSION,
+        'generation': generation,
+        'created_at': timezone.now().isoformat(),
+        'frames': {}
+    }
+
+    def write(directory):
+        for frame_name, df in data.items():
+            manifest['frames'][frame_name] = _write_frame(os.path.join(directory, frame_name), df)
+        with open(os.path.join(directory, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+
+    versioned_dir.publish(_root(), generation, write, keep=get_snapshot_config().get('KEEP', 3))
+    logger.info(f"Published data snapshot generation '{generation}'.")
+    return manifest
+
+# --- Reader ---
+
+def current_generation():
+    return versioned_dir.current(_root())
+
+def read_manifest(generation):
+    with open(os.path.join(_root(), generation, MANIFEST_NAME), encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('version') != SNAPSHOT_FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot version {manifest.get('version')} in '{generation}'.")
+    return manifest
+
+def read_snapshot(generation=None, frames=None, columns=None, with_text=False):
+    """
+    Reads frames from a snapshot generation (default: `CURRENT`).
+
+    Args:
+        generation (str): Generation to read; the published one if None.
+        frames (iterable): Frame names to load; all frames if None.
+        columns (dict): Optional {frame_name: [column, ...]} restricting the
+                        columns read (and mapped) for a frame. Free-text
+                        columns are only read when named here or with `with_text`.
+        with_text (bool): Also decode the free-text columns of frames read in full.
+
+    Returns:
+        dict of DataFrames backed by read-only memory maps where possible,
+        or None if no snapshot exists.
+    """
+    generation = generation or current_generation()
+    if generation is None:
+        return None
+    manifest = read_manifest(generation)
+    base_dir = os.path.join(_root(), generation)
+    columns = columns or {}
+
+    result = {}
+    for frame_name in frames or manifest['frames'].keys():
+        frame_meta = manifest['frames'][frame_name]
+        directory = os.path.join(base_dir, frame_name)
+        wanted = columns.get(frame_name)
+
+        arrays = {}
+        for position, column_meta in enumerate(frame_meta['columns']):
+            if column_meta['name'] in wanted if wanted is not None else with_text or column_meta['kind'] != 'text':
+                arrays[column_meta['name']] = _read_column(directory, position, column_meta)
+
+        index = None
+        if frame_meta['index'] is not None:
+            index = pd.Index(
+                _read_column(directory, 'index', frame_meta['index']),
+                name=frame_meta['index']['name'],
+                copy=False
+            )
+        df = pd.DataFrame(arrays, index=index, copy=False)
+        if not arrays and index is None:
+            df = pd.DataFrame(index=pd.RangeIndex(frame_meta['rows']))
+        result[frame_name] = df
+    return result
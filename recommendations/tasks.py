@@ -1,12 +1,9 @@
 import logging
 from celery import shared_task
 from django.core.cache import cache
-from django.utils import timezone
-from datetime import timedelta
 from django.conf import settings
 import redis
-from review_place.models import CustomUser
-from recommendations import cache_keys
+from recommendations import cache_keys, hybrid
 from recommendations.engine import recommendation_engine
 
 logger = logging.getLogger(__name__)
@@ -51,50 +48,73 @@ def rebuild_global_recommendation_caches():
     lock_key = 'global_rebuild_lock'
     logger.info("Starting proactive global cache rebuild.")
     try:
-        cache.delete(cache_keys.CLEANED_DATA_KEY)
-        recommendation_engine.rebuild_user_similarity_cache()
-        recommendation_engine.rebuild_scaled_item_profiles_cache()
+        # Merge only what changed since the last build into the cleaned data.
+        recommendation_engine.load_and_clean_all_data(force_refresh=True, incremental=True)
+        # The user-item matrix feeds every batch component; the user neighbor lists
+        # are only built when user-based CF fills the collaborative slot.
+        collaborative_component = hybrid.get_collaborative_component()
+        recommendation_engine.rebuild_user_similarity_cache(with_neighbors=collaborative_component == 'user_based')
+        if collaborative_component == 'item_based':
+            recommendation_engine.rebuild_item_similarity_cache()
+        elif collaborative_component == 'als':
+            recommendation_engine.rebuild_als_model_cache()
+        recommendation_engine.rebuild_content_features_cache()
+        recommendation_engine.rebuild_similar_places()
         logger.info("Finished proactive global cache rebuild.")
     finally:
         release_lock(lock_key)
 
+# -----------------------------
+# Incremental Neighbor Update
+# -----------------------------
+@shared_task
+def update_dirty_user_neighbors():
+    """
+    Patches the cached user-neighbor structure for every user whose scores changed
+    since the last run (see `user_based.update_dirty_user_neighbors`).
+    """
+    patched = recommendation_engine.update_dirty_user_neighbors()
+    if patched:
+        logger.info(f"Patched neighbors of {patched} users.")
+
 # -----------------------------
 # Similar Places Invalidation
 # -----------------------------
 @shared_task
 def invalidate_similar_places_task(place_id):
-    key = cache_keys.place_similar_key(place_id)
-    cache.delete(key)
-    logger.info(f"Invalidated similar places cache for place {place_id}.")
+    recommendation_engine.remove_similar_places(place_id)
+    logger.info(f"Removed similar places of deleted place {place_id}.")
+
+@shared_task
+def rebuild_similar_places_task():
+    """Recomputes every place's top-K similar places in one bulk pass."""
+    written = recommendation_engine.rebuild_similar_places()
+    logger.info(f"Rebuilt similar places for {written} places.")
 
 # -----------------------------
 # Batch Recommendations
 # -----------------------------
 @shared_task
 def generate_batch_recommendations():
+    """
+    Scores every recently active user in one vectorized pass and writes the
+    results in bulk (see `recommendations.batch`).
+    """
     logger.info("Starting batch recommendation generation.")
+    written = recommendation_engine.generate_batch_recommendations()
+    logger.info(f"Finished batch recommendation generation for {written} users.")
 
-    seven_days_ago = timezone.now() - timedelta(days=7)
-    active_users = CustomUser.objects.filter(last_login__gte=seven_days_ago)
-
-    if not active_users.exists():
-        logger.info("No active users found for batch processing.")
-        return
-
-    logger.info(f"Found {active_users.count()} active users for batch processing.")
-
-    for user in active_users:
-        try:
-            scores = recommendation_engine._compute_hybrid_scores(user.id)
-            if scores:
-                key = cache_keys.batch_recommendations_key(user.id)
-                timeout = recommendation_engine.cache_config.get('GLOBAL_CACHE_TIMEOUT', 3600 * 2)
-                cache.set(key, scores, timeout=timeout)
-                logger.info(f"Successfully generated batch recommendations for user {user.id}")
-        except Exception as e:
-            logger.error(f"Failed to generate batch recommendations for user {user.id}: {e}")
-
-    logger.info("Finished batch recommendation generation.")
+# -----------------------------
+# Materialized Score Refresh
+# -----------------------------
+@shared_task
+def refresh_user_place_score_task(user_id, place_id):
+    """
+    Re-syncs one UserPlaceScore row, the user's stored content profile and their
+    neighbor flag after an interaction. Queued by the signal handlers once the
+    triggering write commits, so the request only pays for enqueueing it.
+    """
+    recommendation_engine.refresh_user_place_score(user_id, place_id)
 
 # -----------------------------
 # Realtime Interaction
@@ -0,0 +1,1168 @@
+import os
+import shutil
+import tempfile
+from datetime import date, timedelta
+from importlib import import_module
+from io import StringIO
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+from sklearn.preprocessing import normalize
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.test import SimpleTestCase, TestCase
+
+from recommendations import (
+    als, ann, batch, content_based, data_utils, hybrid, item_based, process_pool, selection, snapshot, tasks,
+    text_processing, user_based, vector_index, versioned_dir
+)
+from recommendations.models import UserPlaceScore
+from review_place.models import CustomUser, Place, PlaceLike, Review, UserActivity
+
+
+class FakeRedis:
+    """The few Redis set and hash commands the recommendations use, kept in memory."""
+
+    def __init__(self):
+        self.sets, self.hashes = {}, {}
+
+    def sadd(self, key, *members):
+        self.sets.setdefault(key, set()).update(str(member).encode() for member in members)
+
+    def smembers(self, key):
+        return set(self.sets.get(key, set()))
+
+    def delete(self, *keys):
+        for key in keys:
+            self.sets.pop(key, None)
+            self.hashes.pop(key, None)
+
+    def exists(self, *keys):
+        return sum(key in self.sets or key in self.hashes for key in keys)
+
+    def hset(self, key, mapping):
+        self.hashes.setdefault(key, {}).update({str(field): str(value).encode() for field, value in mapping.items()})
+
+    def hget(self, key, field):
+        return self.hashes.get(key, {}).get(str(field))
+
+    def hmget(self, key, fields):
+        return [self.hget(key, field) for field in fields]
+
+    def hdel(self, key, *fields):
+        return sum(self.hashes.get(key, {}).pop(str(field), None) is not None for field in fields)
+
+    def sunionstore(self, destination, keys, *args):
+        keys = (list(keys) if isinstance(keys, (list, tuple)) else [keys]) + list(args)
+        self.sets[destination] = set().union(*(self.sets.get(key, set()) for key in keys))
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client, self.calls = client, []
+
+    def __getattr__(self, name):
+        return lambda *args: self.calls.append((name, args))
+
+    def execute(self):
+        return [getattr(self.client, name)(*args) for name, args in self.calls]
+
+
+class RecommendationTestCase(TestCase):
+    """
+    Keeps signal handlers from scheduling Celery work, replaces the raw Redis
+    clients and points the on-disk stores and the cache at fresh locations.
+    """
+
+    def setUp(self):
+        for target in (
+            'recommendations.signals.schedule_global_rebuild_if_needed',
+            'recommendations.signals.invalidate_similar_places_task',
+            'recommendations.signals.process_realtime_interaction',
+            'recommendations.signals.refresh_user_place_score_task',
+        ):
+            self.patch(target)
+        self.redis = FakeRedis()
+        self.patch('recommendations.data_utils._get_redis_client', return_value=self.redis)
+        self.patch('recommendations.content_based._get_redis_client', return_value=self.redis)
+
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        rec_settings = settings.RECOMMENDATION_SETTINGS
+        for name in ('SNAPSHOT', 'FEATURE_STORE'):
+            patcher = mock.patch.dict(rec_settings[name], {'ROOT': f'{root}/{name.lower()}'})
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        cache.clear()
+        self.addCleanup(cache.clear)
+        data_utils._frame_memo.update(generation=None, frames={})
+
+    def patch(self, target, **kwargs):
+        patcher = mock.patch(target, **kwargs)
+        self.addCleanup(patcher.stop)
+        return patcher.start()
+
+
+class UserPlaceScoreBackfillTests(RecommendationTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = CustomUser.objects.create(username='visitor', mobile_phone='0800000001')
+        self.kept = Place.objects.create(place_name='Kept', category='restaurant', location='Bangkok')
+        self.deleted = Place.objects.create(place_name='Deleted', category='attraction', location='Chiang Mai')
+        PlaceLike.objects.create(user=self.user, place=self.kept)
+        for place in (self.kept, self.deleted):
+            UserActivity.objects.create(user=self.user, activity_type='view', content_object=place)
+            UserActivity.objects.create(user=self.user, activity_type='share', content_object=place)
+
+    def test_backfill_ignores_activities_of_deleted_places(self):
+        deleted_id = self.deleted.id
+        self.deleted.delete()
+        self.assertTrue(UserActivity.objects.filter(object_id=deleted_id).exists())
+
+        call_command('backfill_user_place_scores', stdout=StringIO())
+
+        rec_settings = settings.RECOMMENDATION_SETTINGS
+        scores = {row.place_id: row.score for row in UserPlaceScore.objects.all()}
+        self.assertEqual(set(scores), {self.kept.id})
+        self.assertAlmostEqual(
+            scores[self.kept.id],
+            rec_settings['LIKE_WEIGHT'] + rec_settings['VISIT_WEIGHT'] + rec_settings['SHARE_WEIGHT'],
+            places=5
+        )
+
+    def test_backfill_keeps_scores_refreshed_while_it_aggregates(self):
+        aggregate = data_utils.aggregate_user_place_scores
+
+        def aggregate_then_refresh_concurrently():
+            scores = aggregate()
+            UserPlaceScore.objects.update_or_create(user=self.user, place=self.kept, defaults={'score': 9.0})
+            return scores
+
+        with mock.patch.object(data_utils, 'aggregate_user_place_scores', side_effect=aggregate_then_refresh_concurrently):
+            call_command('backfill_user_place_scores', stdout=StringIO())
+
+        self.assertEqual(UserPlaceScore.objects.get(user=self.user, place=self.kept).score, 9.0)
+
+    def test_migration_backfills_scores_from_the_event_history(self):
+        UserPlaceScore.objects.all().delete()
+        migration = import_module('recommendations.migrations.0002_backfill_user_place_scores')
+
+        migration.backfill_user_place_scores(apps, None)
+
+        rec_settings = settings.RECOMMENDATION_SETTINGS
+        scores = {row.place_id: row.score for row in UserPlaceScore.objects.all()}
+        self.assertAlmostEqual(
+            scores[self.kept.id],
+            rec_settings['LIKE_WEIGHT'] + rec_settings['VISIT_WEIGHT'] + rec_settings['SHARE_WEIGHT'],
+            places=5
+        )
+        self.assertAlmostEqual(
+            scores[self.deleted.id], rec_settings['VISIT_WEIGHT'] + rec_settings['SHARE_WEIGHT'], places=5
+        )
+
+    def test_refresh_retries_when_a_concurrent_refresh_inserts_first(self):
+        create = UserPlaceScore.objects.create
+        calls = []
+
+        def create_racing_another_refresh(**kwargs):
+            calls.append(kwargs)
+            if len(calls) == 1:
+                raise IntegrityError('UNIQUE constraint failed')
+            return create(**kwargs)
+
+        with mock.patch.object(UserPlaceScore.objects, 'create', side_effect=create_racing_another_refresh):
+            _, new_score = data_utils.refresh_user_place_score(self.user.id, self.kept.id)
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(UserPlaceScore.objects.get(user=self.user, place=self.kept).score, new_score)
+
+
+class ScoreRefreshSignalTests(RecommendationTestCase):
+    def setUp(self):
+        super().setUp()
+        self.refresh_task = self.patch('recommendations.signals.refresh_user_place_score_task')
+        self.user = CustomUser.objects.create(username='visitor', mobile_phone='0800000001')
+        self.place = Place.objects.create(place_name='Cafe', category='restaurant', location='Bangkok')
+
+    def test_interactions_queue_the_score_refresh_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            PlaceLike.objects.create(user=self.user, place=self.place)
+            self.refresh_task.delay.assert_not_called()
+
+        self.refresh_task.delay.assert_called_once_with(self.user.id, self.place.id)
+        self.assertFalse(UserPlaceScore.objects.exists())
+
+    def test_queued_refresh_syncs_the_score_and_flags_neighbors(self):
+        PlaceLike.objects.create(user=self.user, place=self.place)
+
+        with mock.patch.object(user_based, 'incremental_updates_enabled', return_value=True), \
+                mock.patch.object(data_utils, 'mark_neighbors_dirty') as mark_dirty:
+            tasks.refresh_user_place_score_task(self.user.id, self.place.id)
+
+        score = UserPlaceScore.objects.get(user=self.user, place=self.place)
+        self.assertAlmostEqual(score.score, settings.RECOMMENDATION_SETTINGS['LIKE_WEIGHT'], places=5)
+        mark_dirty.assert_called_once_with([self.user.id])
+
+
+class PlaceRebuildTriggerTests(RecommendationTestCase):
+    def setUp(self):
+        super().setUp()
+        self.schedule = self.patch('recommendations.signals.schedule_global_rebuild_if_needed')
+        self.place = Place.objects.create(place_name='Cafe', category='restaurant', location='Bangkok')
+        self.schedule.reset_mock()
+
+    def test_non_structural_edits_do_not_schedule_a_rebuild(self):
+        self.place.description = 'A quiet cafe by the river'
+        self.place.save()
+        self.place.average_rating = 4.5
+        self.place.save(update_fields=['average_rating'])
+
+        self.schedule.delay.assert_not_called()
+
+    def test_structural_edits_schedule_a_rebuild(self):
+        self.place.category = 'attraction'
+        self.place.save()
+        self.place.refresh_from_db()
+        self.place.price_range = '100-200'
+        self.place.save(update_fields=['price_range'])
+
+        self.assertEqual(self.schedule.delay.call_count, 2)
+
+
+def _sorted_frame(df):
+    """Row order of a cleaned frame is not part of its contract."""
+    if 'place_id' in df:
+        return df.sort_values(['user_id', 'place_id']).reset_index(drop=True)
+    return df.sort_index()
+
+
+
+class ActivityQueryPlanTests(TestCase):
+    def test_place_activity_loader_is_served_by_the_type_object_index(self):
+        # The existing-places filter is an IN (SELECT id FROM place) subquery; the
+        # activity side must still be an index search, not a table scan.
+        queryset = data_utils._place_activities('view').values_list('user_id', 'object_id')
+
+        self.assertIn('useractivity_type_object_idx', queryset.explain())
+
+class DeltaRefreshTests(RecommendationTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = CustomUser.objects.create(username='alice', mobile_phone='0800000001', gender='female')
+        self.bob = CustomUser.objects.create(username='bob', mobile_phone='0800000002', gender='male')
+        self.cafe = Place.objects.create(place_name='Cafe', category='restaurant', location='Bangkok', price_range='$')
+        self.temple = Place.objects.create(place_name='Temple', category='attraction', location='Ayutthaya')
+        self.hotel = Place.objects.create(place_name='Hotel', category='accommodation', location='Phuket')
+        PlaceLike.objects.create(user=self.alice, place=self.cafe)
+        UserActivity.objects.create(user=self.bob, activity_type='view', content_object=self.temple)
+        UserActivity.objects.create(user=self.alice, activity_type='share', content_object=self.hotel)
+
+    def assert_matches_full_reload(self, data):
+        full = data_utils.apply_schemas(data_utils._load_full())
+        for name in data_utils.FRAME_NAMES:
+            with self.subTest(frame=name):
+                pd.testing.assert_frame_equal(_sorted_frame(data[name]), _sorted_frame(full[name]))
+
+    def test_delta_refresh_matches_a_full_reload(self):
+        data_utils.load_and_clean_all_data(force_refresh=True, incremental=True)
+        marks = cache.get(data_utils.cache_keys.CLEANED_DATA_WATERMARKS_KEY)
+
+        PlaceLike.objects.create(user=self.bob, place=self.cafe)
+        # Stamped before the watermark but committed after it was taken.
+        late = UserActivity.objects.create(user=self.bob, activity_type='view', content_object=self.cafe)
+        UserActivity.objects.filter(pk=late.pk).update(timestamp=marks['activities'] - timedelta(seconds=30))
+        # Leaves Alice's share behind (generic relation) without marking her dirty.
+        self.hotel.delete()
+
+        data = data_utils.load_and_clean_all_data(force_refresh=True, incremental=True)
+
+        self.assertIn(self.cafe.id, set(data['visits_df']['place_id']))
+        self.assertNotIn(self.hotel.id, set(data['shares_df']['place_id']))
+        # The free text left out of snapshot reads was carried through the merge.
+        self.assert_matches_full_reload(snapshot.read_snapshot(with_text=True))
+
+
+class SnapshotTests(RecommendationTestCase):
+    def test_snapshot_round_trip_keeps_values_and_dtypes(self):
+        places_df = data_utils.apply_schema(pd.DataFrame({
+            'id': [3, 1, 2],
+            'place_name': ['วัดอรุณ', 'Cafe', ''],
+            'category': ['attraction', 'restaurant', 'attraction'],
+            'location': ['Bangkok', 'Bangkok', 'Chiang Mai'],
+            'description': ['ริมแม่น้ำ', None, 'Old town'],
+            'average_rating': [4.5, 3.0, 0.0],
+            'price_range': ['$', None, '$$'],
+            'total_reviews': [10, 2, 0],
+            'visit_count': [100, 20, 0],
+        }).set_index('id'), 'places_df')
+        users_df = pd.DataFrame({
+            'gender': pd.Categorical(['male', 'female']),
+            'date_of_birth': pd.to_datetime(['1990-01-02', None]),
+            'age': np.array([34.0, np.nan], dtype=np.float32),
+        }, index=pd.Index(np.array([7, 9], dtype=np.int32), name='id'))
+        likes_df = data_utils.apply_schema(pd.DataFrame({'user_id': [7, 9], 'place_id': [1, 3]}), 'likes_df')
+        empty_df = data_utils.apply_schema(pd.DataFrame({'user_id': [], 'place_id': []}), 'shares_df')
+
+        data = {'places_df': places_df, 'users_df': users_df, 'likes_df': likes_df, 'shares_df': empty_df}
+        manifest = snapshot.write_snapshot(data)
+        read = snapshot.read_snapshot(with_text=True)
+
+        self.assertEqual(snapshot.current_generation(), manifest['generation'])
+        self.assertNotIn('description', snapshot.read_snapshot(frames=['places_df'])['places_df'].columns)
+        for name, df in data.items():
+            with self.subTest(frame=name):
+                # check_exact=False: memory-mapped columns are np.memmap, not ndarray.
+                pd.testing.assert_frame_equal(read[name], df, check_exact=False)
+
+    def test_read_snapshot_restricts_frames_and_columns(self):
+        likes_df = data_utils.apply_schema(pd.DataFrame({'user_id': [1], 'place_id': [2]}), 'likes_df')
+        generation = snapshot.write_snapshot({'likes_df': likes_df, 'visits_df': likes_df})['generation']
+
+        read = snapshot.read_snapshot(generation, frames=['likes_df'], columns={'likes_df': ['place_id']})
+
+        self.assertEqual(list(read), ['likes_df'])
+        self.assertEqual(list(read['likes_df'].columns), ['place_id'])
+
+
+
+class VersionedDirTests(SimpleTestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+
+    def _write(self, name):
+        def write(directory):
+            with open(os.path.join(directory, name), 'w', encoding='utf-8') as f:
+                f.write(name)
+        return write
+
+    def test_publish_swaps_current_and_prunes_old_versions(self):
+        for version in ['v1', 'v2', 'v3']:
+            versioned_dir.publish(self.root, version, self._write('data'), keep=2)
+
+        self.assertEqual(versioned_dir.current(self.root), 'v3')
+        self.assertEqual(sorted(os.listdir(self.root)), ['CURRENT', 'v2', 'v3'])
+
+    def test_failed_write_leaves_the_published_version_alone(self):
+        versioned_dir.publish(self.root, 'v1', self._write('data'), keep=2)
+
+        def fail(directory):
+            raise OSError('disk full')
+        with self.assertRaises(OSError):
+            versioned_dir.publish(self.root, 'v2', fail, keep=2)
+
+        self.assertEqual(versioned_dir.current(self.root), 'v1')
+        self.assertEqual(sorted(os.listdir(self.root)), ['CURRENT', 'v1'])
+
+    def test_prune_only_counts_directories_matching_is_version(self):
+        os.makedirs(os.path.join(self.root, 'a-other'))
+        is_export = lambda directory: os.path.isfile(os.path.join(directory, 'vectors.kv'))
+        for version in ['v1', 'v2']:
+            versioned_dir.publish(self.root, version, self._write('vectors.kv'), keep=1, is_version=is_export)
+
+        self.assertEqual(sorted(os.listdir(self.root)), ['CURRENT', 'a-other', 'v2'])
+
+
+class FrameSchemaTests(SimpleTestCase):
+    def test_apply_schema_casts_to_compact_dtypes(self):
+        places_df = pd.DataFrame({
+            'id': np.array([1, 2], dtype=np.int64),
+            'category': ['restaurant', 'attraction'],
+            'location': ['Bangkok', 'Bangkok'],
+            'price_range': ['$', '$$'],
+            'average_rating': np.array([4.5, 3.0], dtype=np.float64),
+            'total_reviews': np.array([3, 1], dtype=np.int64),
+            'visit_count': np.array([10, 2], dtype=np.int64),
+            'description': ['a', 'b'],
+        }).set_index('id')
+
+        places_df = data_utils.apply_schema(places_df, 'places_df')
+
+        self.assertEqual(places_df.index.dtype, np.int32)
+        for column in ('category', 'location', 'price_range'):
+            self.assertIsInstance(places_df[column].dtype, pd.CategoricalDtype)
+        self.assertEqual(places_df['average_rating'].dtype, np.float32)
+        self.assertEqual(places_df['total_reviews'].dtype, np.int32)
+        self.assertEqual(places_df['description'].dtype, object)
+
+    def test_apply_schema_resets_the_index_of_interaction_frames(self):
+        reviews_df = pd.DataFrame(
+            {'user_id': [1, 2], 'place_id': [3, 4], 'rating': [5.0, 4.0], 'extra': ['x', 'y']}, index=[10, 20]
+        )
+
+        reviews_df = data_utils.apply_schema(reviews_df, 'reviews_df')
+
+        self.assertIsInstance(reviews_df.index, pd.RangeIndex)
+        self.assertEqual(
+            reviews_df.dtypes.to_dict(),
+            {'user_id': np.int32, 'place_id': np.int32, 'rating': np.float32, 'extra': object}
+        )
+
+    def test_apply_schema_keeps_empty_frames_empty(self):
+        likes_df = data_utils.apply_schema(pd.DataFrame({'user_id': [], 'place_id': []}), 'likes_df')
+
+        self.assertTrue(likes_df.empty)
+        self.assertEqual(likes_df['user_id'].dtype, np.int32)
+
+
+class LoadFramesTests(RecommendationTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = CustomUser.objects.create(username='visitor', mobile_phone='0800000001')
+        self.place = Place.objects.create(place_name='Cafe', category='restaurant', location='Bangkok')
+        PlaceLike.objects.create(user=self.user, place=self.place)
+
+    def use_snapshots(self, enabled):
+        patcher = mock.patch.dict(settings.RECOMMENDATION_SETTINGS['SNAPSHOT'], {'ENABLED': enabled})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def publish_incomplete_generation(self):
+        cache.set(data_utils.cache_keys.CLEANED_DATA_GENERATION_KEY, 'incomplete-generation')
+
+    def test_builds_once_when_nothing_is_loaded(self):
+        self.use_snapshots(False)
+        with mock.patch.object(
+            data_utils, 'load_and_clean_all_data', wraps=data_utils.load_and_clean_all_data
+        ) as load:
+            frames = data_utils.load_frames('places', 'likes')
+            data_utils.load_frames('places')
+
+        load.assert_called_once_with(force_refresh=True)
+        self.assertEqual(list(frames['places_df'].index), [self.place.id])
+        self.assertIsNotNone(data_utils.get_data_generation())
+        self.assertFalse(cache.get(data_utils.CLEANED_DATA_BUILD_LOCK_KEY))
+
+    def test_serves_the_last_generation_this_process_read(self):
+        self.use_snapshots(False)
+        frames = data_utils.load_frames('places', 'likes')
+        self.publish_incomplete_generation()
+
+        with mock.patch.object(data_utils, 'load_and_clean_all_data') as load:
+            fallback = data_utils.load_frames('places', 'likes')
+
+        load.assert_not_called()
+        self.assertIs(fallback['places_df'], frames['places_df'])
+        self.assertEqual(data_utils.get_data_generation(), 'incomplete-generation')
+
+    def test_serves_the_published_snapshot_in_a_fresh_process(self):
+        self.use_snapshots(True)
+        data_utils.load_frames('places')
+        data_utils._frame_memo.update(generation=None, frames={})
+        self.publish_incomplete_generation()
+
+        with mock.patch.object(data_utils, 'load_and_clean_all_data') as load:
+            fallback = data_utils.load_frames('places', 'likes')
+
+        load.assert_not_called()
+        self.assertEqual(list(fallback['likes_df']['place_id']), [self.place.id])
+
+    def test_snapshot_frames_leave_free_text_to_load_text_column(self):
+        self.use_snapshots(True)
+        Place.objects.filter(pk=self.place.pk).update(description='ริมแม่น้ำ')
+
+        frames = data_utils.load_frames('places')
+        descriptions = data_utils.load_text_column('places', 'description')
+
+        self.assertNotIn('description', frames['places_df'].columns)
+        self.assertEqual(descriptions.to_dict(), {self.place.id: 'ริมแม่น้ำ'})
+
+    def test_loads_an_unpublished_copy_when_another_build_holds_the_lock(self):
+        self.use_snapshots(False)
+        cache.add(data_utils.CLEANED_DATA_BUILD_LOCK_KEY, 'building')
+
+        with mock.patch.object(data_utils, 'CLEANED_DATA_BUILD_LOCK_TIMEOUT', 0):
+            frames = data_utils.load_frames('places')
+
+        self.assertEqual(list(frames['places_df'].index), [self.place.id])
+        self.assertIsNone(data_utils.get_data_generation())
+
+
+def _random_ratings(n_users, n_places, density=0.3, seed=0):
+    """A sparse user-item matrix of continuous scores (no similarity ties)."""
+    rng = np.random.default_rng(seed)
+    ratings = rng.uniform(0.1, 2.0, (n_users, n_places)) * (rng.random((n_users, n_places)) < density)
+    ratings[np.arange(n_users), rng.integers(0, n_places, n_users)] += 1.0  # no empty rows
+    return csr_matrix(ratings.astype(np.float32))
+
+
+def _dense_cosine(matrix):
+    dense = matrix.toarray().astype(np.float64)
+    norms = np.linalg.norm(dense, axis=1)
+    norms[norms == 0] = 1
+    dense /= norms[:, None]
+    return dense @ dense.T
+
+
+class UserNeighborBuildTests(SimpleTestCase):
+    def test_exact_build_matches_dense_cosine_top_k(self):
+        ratings = _random_ratings(23, 15)
+        centered = user_based.mean_center_rows(ratings)
+        k = 5
+
+        neighbor_index, neighbor_scores = user_based.build_neighbors(centered, k, block_size=4)
+
+        similarity = _dense_cosine(centered)
+        np.fill_diagonal(similarity, -np.inf)
+        # Compared by score: float32 products may order near-ties differently.
+        expected_scores = -np.sort(-similarity, axis=1)[:, :k]
+        np.testing.assert_allclose(neighbor_scores, expected_scores, atol=1e-5)
+        np.testing.assert_allclose(
+            np.take_along_axis(similarity, neighbor_index, axis=1), neighbor_scores, atol=1e-5
+        )
+
+    def test_exact_build_pads_when_there_are_fewer_users_than_k(self):
+        centered = user_based.mean_center_rows(_random_ratings(3, 6))
+
+        neighbor_index, neighbor_scores = user_based.build_neighbors(centered, 5)
+
+        self.assertTrue((neighbor_index[:, :2] >= 0).all())
+        self.assertTrue((neighbor_index[:, 2:] == -1).all())
+        self.assertTrue((neighbor_scores[:, 2:] == 0).all())
+        for row in range(3):
+            self.assertNotIn(row, neighbor_index[row])
+
+
+def _clustered_vectors(n_clusters, per_cluster, dim, seed=0):
+    """Rows scattered tightly around a few random directions."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_clusters, dim))
+    vectors = np.repeat(centers, per_cluster, axis=0) + 0.3 * rng.normal(size=(n_clusters * per_cluster, dim))
+    return vectors.astype(np.float32)
+
+
+class IVFNeighborTests(SimpleTestCase):
+    def normalized(self, vectors):
+        return normalize(csr_matrix(vectors), norm='l2', axis=1)
+
+    def test_probing_every_list_is_exact(self):
+        matrix = self.normalized(_random_ratings(40, 12).toarray())
+        k = 5
+
+        neighbor_index, neighbor_scores = ann.ivf_neighbors(matrix, k, n_lists=4, n_probe=4)
+        exact_index, exact_scores = user_based.build_neighbors(matrix, k)
+
+        np.testing.assert_allclose(neighbor_scores, exact_scores, atol=1e-5)
+        self.assertEqual(ann.measure_recall(matrix, neighbor_index, k, sample_size=40), 1.0)
+
+    def test_recall_stays_high_on_clustered_users(self):
+        matrix = self.normalized(_clustered_vectors(8, 25, 16))
+        k = 10
+
+        neighbor_index, _ = ann.ivf_neighbors(matrix, k, n_lists=8, n_probe=2)
+
+        self.assertGreaterEqual(ann.measure_recall(matrix, neighbor_index, k), 0.9)
+        for row, neighbors in enumerate(neighbor_index):
+            self.assertNotIn(row, neighbors)
+
+
+class NeighborScoringTests(SimpleTestCase):
+    def test_scores_match_the_per_place_weighted_average(self):
+        ratings = _random_ratings(12, 9, density=0.4).toarray()
+        ratings[3, 2] = -0.5  # negative scores count as not scored
+        user_item_matrix = csr_matrix(ratings)
+        rows = np.array([3, 0, 7, 5])
+        similarities = np.array([0.9, 0.6, 0.4, 0.1], dtype=np.float32)
+
+        place_positions, scores = user_based.score_places_from_neighbors(rows, similarities, user_item_matrix)
+
+        expected = {}
+        for place in range(ratings.shape[1]):
+            weighted = normalizer = 0.0
+            for row, similarity in zip(rows, similarities):
+                if ratings[row, place] > 0:
+                    weighted += similarity * ratings[row, place]
+                    normalizer += similarity
+            if normalizer > 0:
+                expected[place] = weighted / normalizer
+        self.assertEqual(list(place_positions), sorted(expected))
+        np.testing.assert_allclose(scores, [expected[place] for place in place_positions], rtol=1e-6)
+
+
+class SelectionTests(SimpleTestCase):
+    def test_top_k_rows_pads_excluded_entries_and_short_rows(self):
+        scores = np.array([[0.3, -np.inf, 0.7], [-np.inf, -np.inf, 0.1]], dtype=np.float32)
+
+        positions, top_scores = selection.top_k_rows(scores, 4)
+
+        np.testing.assert_array_equal(positions, [[2, 0, -1, -1], [2, -1, -1, -1]])
+        np.testing.assert_allclose(top_scores, [[0.7, 0.3, 0, 0], [0.1, 0, 0, 0]])
+
+    def test_top_n_positions_orders_best_first(self):
+        scores = np.array([0.2, 0.9, 0.5, 0.8, 0.1])
+
+        self.assertEqual(list(selection.top_n_positions(scores, 3)), [1, 3, 2])
+        self.assertEqual(list(selection.top_n_positions(scores, 10)), [1, 3, 2, 0, 4])
+        self.assertEqual(len(selection.top_n_positions(scores, 0)), 0)
+
+
+class FakeWordVectors(dict):
+    """Stands in for the Thai2Vec KeyedVectors: word -> vector, plus `vector_size`."""
+    vector_size = 8
+
+    def __init__(self, words, seed=0):
+        rng = np.random.default_rng(seed)
+        super().__init__((word, rng.standard_normal(self.vector_size).astype(np.float32)) for word in words)
+
+
+class InteractionHistoryTestCase(RecommendationTestCase):
+    """
+    A small random review, like and activity history (written with bulk_create, so
+    no signal runs), its materialized scores and a word-vector model for content features.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.patch(
+            'recommendations.content_based._thai2vec_model',
+            new=FakeWordVectors(['ทะเล', 'สวย', 'อาหาร', 'อร่อย', 'ภูเขา', 'อากาศ', 'ดี', 'มาก'])
+        )
+        rng = np.random.default_rng(0)
+        users = CustomUser.objects.bulk_create([
+            CustomUser(
+                username=f'user{i}', mobile_phone=f'08{i:08d}', gender=('male', 'female', 'other')[i % 3],
+                date_of_birth=date(1970 + i, 1, 1) if i % 4 else None
+            )
+            for i in range(30)
+        ])
+        places = Place.objects.bulk_create([
+            Place(
+                place_name=f'place{i}', category=('accommodation', 'attraction', 'restaurant')[i % 3],
+                location=('Bangkok', 'Chiang Mai')[i % 2], price_range=('$', '$$', None)[i % 3],
+                description='ทะเลสวยมาก อาหารอร่อย' if i % 2 else 'ภูเขา อากาศดี',
+                average_rating=float(rng.uniform(0, 5)), visit_count=int(rng.integers(0, 100))
+            )
+            for i in range(20)
+        ])
+        Review.objects.bulk_create([
+            Review(
+                user=users[rng.integers(len(users))], place=places[rng.integers(len(places))],
+                review_text='review', rating=int(rng.integers(1, 6))
+            )
+            for _ in range(120)
+        ])
+        likes = {(users[rng.integers(len(users))].id, places[rng.integers(len(places))].id) for _ in range(80)}
+        PlaceLike.objects.bulk_create([PlaceLike(user_id=user_id, place_id=place_id) for user_id, place_id in likes])
+        place_type = ContentType.objects.get_for_model(Place)
+        UserActivity.objects.bulk_create([
+            UserActivity(
+                user=users[rng.integers(len(users))], activity_type=('view', 'share')[rng.integers(2)],
+                content_type=place_type, object_id=places[rng.integers(len(places))].id
+            )
+            for _ in range(150)
+        ])
+        call_command('backfill_user_place_scores', stdout=StringIO())
+        self.user_ids = np.array(sorted(user.id for user in users) + [max(user.id for user in users) + 1])
+
+
+class BatchScoringTests(InteractionHistoryTestCase):
+    def assert_batch_matches_per_user_scores(self):
+        data_utils.load_and_clean_all_data(force_refresh=True)
+        collab_data = user_based.rebuild_user_similarity_cache()
+        self.assertTrue(collab_data)
+        self.assertTrue(content_based.rebuild_content_features_cache())
+
+        batch_scores = dict(batch.compute_batch_scores(self.user_ids, collab_data))
+
+        for user_id in self.user_ids.tolist():
+            with self.subTest(user_id=user_id):
+                expected = hybrid.compute_hybrid_scores(user_id, collab_data)
+                scores = batch_scores.get(user_id, {})
+                self.assertEqual(set(scores), set(expected))
+                for place_id, score in expected.items():
+                    self.assertAlmostEqual(scores[place_id], score, places=9)
+
+    def use_collaborative_component(self, component):
+        patcher = mock.patch.dict(settings.RECOMMENDATION_SETTINGS, {'COLLABORATIVE_COMPONENT': component})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_user_based_batch_matches_per_user_hybrid_scores(self):
+        self.assert_batch_matches_per_user_scores()
+
+    def test_item_based_batch_matches_per_user_hybrid_scores(self):
+        self.use_collaborative_component('item_based')
+        self.assertTrue(item_based.rebuild_item_similarity_cache())
+        self.assert_batch_matches_per_user_scores()
+
+    def test_als_batch_matches_per_user_hybrid_scores(self):
+        self.use_collaborative_component('als')
+        with mock.patch.dict(settings.RECOMMENDATION_SETTINGS, {'ALS_SETTINGS': {'rank': 4, 'iterations': 3}}):
+            self.assertTrue(als.rebuild_als_model_cache())
+        self.assert_batch_matches_per_user_scores()
+
+
+class ItemBasedTests(InteractionHistoryTestCase):
+    def test_item_similarity_is_adjusted_cosine_of_place_columns(self):
+        with mock.patch.dict(settings.RECOMMENDATION_SETTINGS, {'ITEM_BASED_SETTINGS': {'top_k_neighbors': 100}}):
+            item_data = item_based.rebuild_item_similarity_cache()
+
+        user_item_matrix, _, place_ids = user_based.build_user_item_matrix(user_based._load_user_place_scores())
+        similarity = _dense_cosine(user_based.mean_center_rows(user_item_matrix).T)
+        np.fill_diagonal(similarity, 0)
+        expected = np.where(similarity > 1e-6, similarity, 0)
+        np.testing.assert_array_equal(item_data['place_ids'], place_ids)
+        np.testing.assert_allclose(item_data['item_similarity'].toarray(), expected, atol=1e-5)
+
+    def test_scores_sum_the_similarities_of_interacted_places(self):
+        item_similarity = csr_matrix(np.array([
+            [0.0, 0.5, 0.2],
+            [0.5, 0.0, 0.0],
+            [0.2, 0.0, 0.0],
+        ]))
+
+        scores = item_based.score_places_from_items(np.array([0, 1]), np.array([2.0, 1.0]), item_similarity)
+
+        np.testing.assert_allclose(scores, [2.0 * 0.0 + 1.0 * 0.5, 2.0 * 0.5, 2.0 * 0.2])
+
+    def test_a_miss_queues_the_global_rebuild_instead_of_building(self):
+        schedule = self.patch('recommendations.tasks.schedule_global_rebuild_if_needed')
+
+        with mock.patch.object(item_based, 'rebuild_item_similarity_cache') as rebuild:
+            self.assertEqual(item_based.get_item_based_data(), {})
+            self.assertEqual(item_based.get_item_based_recommendations(self.user_ids[0]), [])
+
+        rebuild.assert_not_called()
+        schedule.delay.assert_called_once_with()
+
+    def test_recommendations_rank_unscored_places_by_item_score(self):
+        item_data = item_based.rebuild_item_similarity_cache()
+        user_id = int(UserPlaceScore.objects.values_list('user_id', flat=True).first())
+        interacted = set(UserPlaceScore.objects.filter(user_id=user_id).values_list('place_id', flat=True))
+
+        recommendations = item_based.get_item_based_recommendations(user_id, num_recommendations=5, item_data=item_data)
+
+        place_ids, scores = item_based._get_user_scores(user_id, {})
+        positions = np.searchsorted(item_data['place_ids'], place_ids)
+        all_scores = dict(zip(
+            item_data['place_ids'].tolist(),
+            item_based.score_places_from_items(positions, scores, item_data['item_similarity'])
+        ))
+        expected = sorted(
+            (place_id for place_id, score in all_scores.items() if score > 0 and place_id not in interacted),
+            key=lambda place_id: -all_scores[place_id]
+        )[:5]
+        self.assertTrue(recommendations)
+        self.assertEqual(recommendations, expected)
+
+
+class ALSTests(SimpleTestCase):
+    config = {'rank': 2, 'regularization': 0.1, 'alpha': 20.0, 'iterations': 10, 'warm_start_iterations': 2, 'seed': 0}
+
+    def test_half_step_solves_the_dense_normal_equations(self):
+        scores = _random_ratings(6, 5, density=0.4)
+        confidence = scores.copy()
+        confidence.data *= self.config['alpha']
+        fixed = np.random.default_rng(1).standard_normal((5, 3)).astype(np.float32)
+
+        solved = als._solve_factors(confidence, fixed, 0.1)
+
+        for row, dense_confidence in enumerate(confidence.toarray()):
+            preference = (dense_confidence > 0).astype(np.float64)
+            weights = np.diag(1.0 + dense_confidence)
+            lhs = fixed.T @ weights @ fixed + 0.1 * np.eye(3)
+            np.testing.assert_allclose(
+                solved[row], np.linalg.solve(lhs, fixed.T @ weights @ preference), rtol=1e-4, atol=1e-5
+            )
+
+    def test_unscored_places_of_a_user_group_rank_above_the_other_group(self):
+        # Users 0-19 score places 0-7 and users 20-39 places 8-15; each user skipped one.
+        ratings = np.zeros((40, 16), dtype=np.float32)
+        ratings[:20, :8] = ratings[20:, 8:] = 1.0
+        skipped = np.r_[np.arange(20) % 8, 8 + np.arange(20) % 8]
+        ratings[np.arange(40), skipped] = 0
+        user_ids, place_ids = np.arange(40, dtype=np.int32), np.arange(100, 116, dtype=np.int32)
+
+        model = als.train_als(csr_matrix(ratings), user_ids, place_ids, config=self.config)
+
+        scores = model['user_factors'] @ model['item_factors'].T
+        for row in range(40):
+            other_group = slice(8, 16) if row < 20 else slice(0, 8)
+            self.assertGreater(scores[row, skipped[row]], scores[row, other_group].max())
+
+    def test_retraining_warm_starts_from_matching_ids(self):
+        ratings = _random_ratings(5, 4)
+        user_ids, place_ids = np.arange(1, 6, dtype=np.int32), np.arange(1, 5, dtype=np.int32)
+        previous = als.train_als(ratings, user_ids, place_ids, config=self.config)
+
+        factors, reused = als._initial_factors(
+            np.array([2, 4, 9], dtype=np.int32), previous['place_ids'], previous['item_factors'], 2,
+            np.random.default_rng(0)
+        )
+
+        self.assertEqual(reused, 2)
+        np.testing.assert_array_equal(factors[:2], previous['item_factors'][[1, 3]])
+        with mock.patch.object(als, '_solve_factors', wraps=als._solve_factors) as solve:
+            als.train_als(ratings, user_ids, place_ids, previous_model=previous, config=self.config)
+        self.assertEqual(solve.call_count, 2 * self.config['warm_start_iterations'])
+
+
+class IncrementalNeighborTests(InteractionHistoryTestCase):
+    def setUp(self):
+        super().setUp()
+        # Lists longer than the user count hold every user, so a patch must be exact.
+        patcher = mock.patch.dict(settings.RECOMMENDATION_SETTINGS, {'USER_BASED_SETTINGS': {'top_k_neighbors': 40}})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def bundle_by_id(self, collab_data):
+        """Scores and neighbor lists keyed by user and place id, ignoring users without scores."""
+        matrix = collab_data['user_item_matrix'].tocoo()
+        user_ids, place_ids = collab_data['user_ids'], collab_data['place_ids']
+        scores = {
+            (int(user_ids[row]), int(place_ids[column])): float(value)
+            for row, column, value in zip(matrix.row, matrix.col, matrix.data)
+        }
+        neighbors = {}
+        for row, user_id in enumerate(user_ids.tolist()):
+            if collab_data['user_item_matrix'][row].nnz == 0:
+                continue
+            listed = collab_data['neighbor_index'][row] >= 0
+            neighbors[user_id] = dict(zip(
+                user_ids[collab_data['neighbor_index'][row][listed]].tolist(),
+                collab_data['neighbor_scores'][row][listed].tolist()
+            ))
+        return scores, neighbors
+
+    def test_patching_dirty_users_matches_a_full_rebuild(self):
+        user_based.rebuild_user_similarity_cache()
+        rows = list(UserPlaceScore.objects.order_by('user_id', 'place_id'))
+        changed, emptied = rows[0].user_id, rows[-1].user_id
+        UserPlaceScore.objects.filter(pk=rows[0].pk).update(score=rows[0].score + 1.5)
+        UserPlaceScore.objects.filter(user_id=emptied).delete()
+        newcomer = CustomUser.objects.create(username='newcomer', mobile_phone='0899999999')
+        new_place = Place.objects.create(place_name='New', category='restaurant', location='Bangkok')
+        for place_id, score in ((new_place.id, 1.0), (rows[1].place_id, 0.4)):
+            UserPlaceScore.objects.create(user=newcomer, place_id=place_id, score=score)
+        data_utils.mark_neighbors_dirty([changed, emptied, newcomer.id])
+
+        self.assertEqual(user_based.update_dirty_user_neighbors(), 3)
+
+        patched = cache.get(data_utils.cache_keys.USER_COLLABORATIVE_FILTERING_DATA_KEY)
+        rebuilt = user_based._rebuild_user_similarity_matrix()
+        patched_scores, patched_neighbors = self.bundle_by_id(patched)
+        rebuilt_scores, rebuilt_neighbors = self.bundle_by_id(rebuilt)
+        self.assertEqual(patched_scores.keys(), rebuilt_scores.keys())
+        for pair, score in rebuilt_scores.items():
+            self.assertAlmostEqual(patched_scores[pair], score, places=5)
+        self.assertEqual(patched_neighbors.keys(), rebuilt_neighbors.keys())
+        for user_id, expected in rebuilt_neighbors.items():
+            with self.subTest(user_id=user_id):
+                self.assertEqual(patched_neighbors[user_id].keys(), expected.keys())
+                for neighbor_id, score in expected.items():
+                    self.assertAlmostEqual(patched_neighbors[user_id][neighbor_id], score, places=5)
+        self.assertEqual(self.redis.smembers(data_utils.cache_keys.DIRTY_NEIGHBOR_USERS_KEY), set())
+
+    def test_users_listed_by_every_other_user_are_re_sorted(self):
+        neighbor_index = np.array([[1, 2, -1], [0, 2, -1], [0, 1, -1]], dtype=np.int32)
+        neighbor_scores = np.array([[0.9, 0.5, 0], [0.9, 0.3, 0], [0.5, 0.3, 0]], dtype=np.float32)
+
+        touched = user_based.patch_neighbor_lists(
+            neighbor_index, neighbor_scores, 2, np.array([0.95, 0.1, 0.0], dtype=np.float32)
+        )
+
+        self.assertEqual(touched, 2)
+        np.testing.assert_array_equal(neighbor_index[:2], [[2, 1, -1], [0, 2, -1]])
+        np.testing.assert_allclose(neighbor_scores[:2], [[0.95, 0.9, 0], [0.9, 0.1, 0]])
+
+
+class VectorIndexTests(SimpleTestCase):
+    config = {'backend': 'exact', 'n_lists': None, 'n_probe': 8, 'seed': 0, 'recall_sample_size': 0}
+
+    def assert_same_neighbors(self, index, expected, k=5):
+        ids, scores = index.search_batch(index.vectors, k, query_ids=index.ids)
+        order = np.argsort(index.ids)
+        expected_ids, expected_scores = expected.search_batch(expected.vectors, k, query_ids=expected.ids)
+        expected_order = np.argsort(expected.ids)
+        np.testing.assert_array_equal(index.ids[order], expected.ids[expected_order])
+        np.testing.assert_allclose(scores[order], expected_scores[expected_order], atol=1e-6)
+
+    def test_add_update_and_remove_match_an_index_built_from_scratch(self):
+        vectors = _clustered_vectors(3, 10, 6)
+        index = vector_index.ExactIndex(6)
+        index.add(np.arange(1, 31), vectors)
+
+        index.remove([3, 30, 99])
+        index.update([5, 7], -vectors[[4, 6]])
+        index.add([7, 40], vectors[[0, 1]] * 2)
+
+        final_ids = np.array([i for i in range(1, 31) if i not in (3, 30)] + [40])
+        final_vectors = {place_id: vectors[place_id - 1] for place_id in final_ids if place_id <= 30}
+        final_vectors.update({5: -vectors[4], 7: vectors[0], 40: vectors[1]})
+        expected = vector_index.ExactIndex(6)
+        expected.add(final_ids, np.array([final_vectors[place_id] for place_id in final_ids]))
+        self.assertEqual(len(index), len(final_ids))
+        self.assertNotIn(3, index)
+        self.assertEqual({int(place_id): row for row, place_id in enumerate(index.ids)}, index._rows)
+        self.assert_same_neighbors(index, expected)
+
+    def test_search_excludes_ids_and_ranks_by_cosine(self):
+        index = vector_index.ExactIndex(2)
+        index.add([1, 2, 3], [[1, 0], [1, 1], [0, 1]])
+
+        ids, scores = index.search([2, 0], 2, exclude_ids={1})
+
+        self.assertEqual(ids.tolist(), [2, 3])
+        np.testing.assert_allclose(scores, [np.sqrt(0.5), 0], atol=1e-6)
+
+    def test_ivf_probing_every_list_is_exact(self):
+        vectors = _clustered_vectors(4, 15, 8)
+        ivf = vector_index.IVFIndex(8, n_lists=4, n_probe=4)
+        ivf.add(np.arange(60), vectors)
+        exact = vector_index.ExactIndex(8)
+        exact.add(np.arange(60), vectors)
+
+        self.assert_same_neighbors(ivf, exact)
+        self.assertEqual(vector_index.measure_recall(ivf, k=5), 1.0)
+
+    def test_ivf_batch_search_probes_each_querys_own_lists(self):
+        ivf = vector_index.IVFIndex(16, n_lists=8, n_probe=2)
+        ivf.add(np.arange(200), _clustered_vectors(8, 25, 16))
+
+        batch_ids, _ = ivf.search_batch(ivf.vectors[:40], 5, query_ids=ivf.ids[:40])
+
+        for row in range(40):
+            ids, _ = ivf.search(ivf.vectors[row], 5, exclude_ids={int(ivf.ids[row])})
+            self.assertEqual(batch_ids[row].tolist(), ids.tolist())
+        self.assertGreaterEqual(vector_index.measure_recall(ivf, k=10), 0.9)
+
+    def test_sync_applies_changes_to_the_existing_index(self):
+        vectors = _clustered_vectors(3, 10, 6)
+        index = vector_index.build_index(np.arange(30), vectors, self.config)
+        changed = vectors.copy()
+        changed[4] = -changed[4]
+        ids = np.r_[np.arange(1, 30), 50]
+        new_vectors = np.vstack([changed[1:], vectors[:1]])
+
+        synced = vector_index.sync_index(index, ids, new_vectors, self.config)
+
+        self.assertIs(synced, index)
+        self.assert_same_neighbors(synced, vector_index.build_index(ids, new_vectors, self.config))
+
+    def test_sync_rebuilds_and_retrains_ivf_when_every_vector_changed(self):
+        config = dict(self.config, backend='ivf', n_lists=3)
+        vectors = _clustered_vectors(3, 10, 6)
+        index = vector_index.build_index(np.arange(30), vectors, config)
+        rescaled = vectors * np.linspace(0.5, 2.0, 6)
+
+        synced = vector_index.sync_index(index, np.arange(30), rescaled, config, rebuild=True)
+
+        self.assertIsNot(synced, index)
+        rebuilt = vector_index.build_index(np.arange(30), rescaled, config)
+        np.testing.assert_allclose(synced.centroids, rebuilt.centroids, atol=1e-6)
+
+
+class ContentScalerTests(SimpleTestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.profiles = pd.DataFrame(rng.normal(size=(50, 3)), columns=['a', 'b', 'c'])
+        scaler, _ = content_based._fit_scaler(self.profiles, {})
+        self.previous = {'scaler': scaler, 'columns': ['a', 'b', 'c']}
+
+    def test_keeps_the_previous_scaler_while_the_fit_barely_moves(self):
+        edited = self.profiles.copy()
+        edited.iloc[0, 0] += 0.1
+
+        scaler, refit = content_based._fit_scaler(edited, self.previous)
+
+        self.assertIs(scaler, self.previous['scaler'])
+        self.assertFalse(refit)
+
+    def test_refits_when_the_fit_drifts_or_the_columns_change(self):
+        shifted = self.profiles + 1.0
+        renamed = self.profiles.rename(columns={'c': 'd'})
+
+        for profiles in (shifted, renamed):
+            scaler, refit = content_based._fit_scaler(profiles, self.previous)
+            self.assertIsNot(scaler, self.previous['scaler'])
+            self.assertTrue(refit)
+
+
+class UserProfileSequenceTests(InteractionHistoryTestCase):
+    def setUp(self):
+        super().setUp()
+        data_utils.load_and_clean_all_data(force_refresh=True)
+        self.features = content_based.rebuild_content_features_cache()
+        score = UserPlaceScore.objects.order_by('user_id', 'place_id').first()
+        self.user_id, self.place_id = score.user_id, score.place_id
+        self.profile_key = data_utils.cache_keys.user_content_profile_key(self.user_id)
+
+    def change_score(self, delta):
+        """Writes a score change the way the signal handlers do; returns its sequence number."""
+        score = UserPlaceScore.objects.get(user_id=self.user_id, place_id=self.place_id)
+        score.score += delta
+        score.save()
+        return content_based.next_profile_sequence(self.user_id)
+
+    def recomputed_profile(self):
+        cache.delete(self.profile_key)
+        return content_based.get_user_content_profile(self.user_id, self.features)
+
+    def test_in_order_deltas_keep_the_stored_profile_current(self):
+        content_based.get_user_content_profile(self.user_id, self.features)
+
+        for delta in (0.5, -0.2):
+            content_based.apply_user_profile_delta(self.user_id, self.place_id, delta, self.change_score(delta))
+
+        stored = cache.get(self.profile_key)
+        self.assertIsNotNone(stored)
+        np.testing.assert_allclose(
+            content_based.get_user_content_profile(self.user_id, self.features), self.recomputed_profile(), rtol=1e-6
+        )
+
+    def test_out_of_order_delta_drops_the_stored_profile(self):
+        content_based.get_user_content_profile(self.user_id, self.features)
+        first = self.change_score(0.5)
+        second = self.change_score(0.3)
+
+        content_based.apply_user_profile_delta(self.user_id, self.place_id, 0.3, second)
+
+        self.assertIsNone(cache.get(self.profile_key))
+        content_based.apply_user_profile_delta(self.user_id, self.place_id, 0.5, first)
+        self.assertIsNone(cache.get(self.profile_key))
+
+    def test_read_before_a_pending_delta_recomputes_the_profile(self):
+        content_based.get_user_content_profile(self.user_id, self.features)
+        sequence = self.change_score(0.5)
+
+        profile = content_based.get_user_content_profile(self.user_id, self.features)
+        # The recomputed profile already holds the change, so its delta must not add it again.
+        content_based.apply_user_profile_delta(self.user_id, self.place_id, 0.5, sequence)
+        after_delta = content_based.get_user_content_profile(self.user_id, self.features)
+
+        expected = self.recomputed_profile()
+        np.testing.assert_allclose(profile, expected, rtol=1e-6)
+        np.testing.assert_allclose(after_delta, expected, rtol=1e-6)
+
+
+class ALSModelCacheTests(RecommendationTestCase):
+    def test_a_miss_queues_the_global_rebuild_instead_of_training(self):
+        schedule = self.patch('recommendations.tasks.schedule_global_rebuild_if_needed')
+
+        with mock.patch.object(als, 'rebuild_als_model_cache') as rebuild:
+            self.assertEqual(als.get_als_model(), {})
+            self.assertEqual(als.get_als_model(), {})
+            self.assertEqual(als.get_als_recommendations(1), [])
+
+        rebuild.assert_not_called()
+        schedule.delay.assert_called_once_with()
+
+    def test_a_running_rebuild_is_not_queued_again(self):
+        schedule = self.patch('recommendations.tasks.schedule_global_rebuild_if_needed')
+        cache.add('global_rebuild_lock', 'locked')
+
+        self.assertEqual(als.get_als_model(), {})
+
+        schedule.delay.assert_not_called()
+
+
+class GlobalRebuildTests(RecommendationTestCase):
+    def rebuild_with(self, component):
+        with mock.patch.dict(settings.RECOMMENDATION_SETTINGS, {'COLLABORATIVE_COMPONENT': component}), \
+                mock.patch.object(tasks, 'recommendation_engine') as engine:
+            tasks.rebuild_global_recommendation_caches()
+        return engine
+
+    def test_builds_only_the_configured_collaborative_model(self):
+        for component, built, skipped in (
+            ('user_based', None, ('rebuild_item_similarity_cache', 'rebuild_als_model_cache')),
+            ('item_based', 'rebuild_item_similarity_cache', ('rebuild_als_model_cache',)),
+            ('als', 'rebuild_als_model_cache', ('rebuild_item_similarity_cache',)),
+        ):
+            with self.subTest(component=component):
+                engine = self.rebuild_with(component)
+
+                engine.rebuild_user_similarity_cache.assert_called_once_with(with_neighbors=component == 'user_based')
+                if built:
+                    getattr(engine, built).assert_called_once_with()
+                for name in skipped:
+                    getattr(engine, name).assert_not_called()
+                engine.rebuild_content_features_cache.assert_called_once_with()
+
+
+class MatrixOnlyBundleTests(InteractionHistoryTestCase):
+    def test_patches_rows_of_a_bundle_built_without_neighbors(self):
+        collab_data = user_based.rebuild_user_similarity_cache(with_neighbors=False)
+        self.assertEqual(collab_data['neighbor_index'].shape, (len(collab_data['user_ids']), 0))
+        score = UserPlaceScore.objects.order_by('user_id', 'place_id').first()
+        UserPlaceScore.objects.filter(pk=score.pk).update(score=score.score + 2)
+        data_utils.mark_neighbors_dirty([score.user_id])
+
+        self.assertEqual(user_based.update_dirty_user_neighbors(), 1)
+
+        patched = cache.get(data_utils.cache_keys.USER_COLLABORATIVE_FILTERING_DATA_KEY)
+        ratings = user_based.get_user_ratings(score.user_id, patched)
+        self.assertAlmostEqual(ratings[score.place_id], score.score + 2, places=5)
+        self.assertEqual(user_based.get_user_based_recommendations(score.user_id, patched), [])
+
+
+class SimilarPlacesTests(RecommendationTestCase):
+    def test_skips_places_deleted_since_the_build(self):
+        self.redis.hset(data_utils.cache_keys.SIMILAR_PLACES_KEY, {1: '3,2,4', 2: '1,3', 3: '1,2', 4: ''})
+
+        content_based.remove_similar_places(3)
+
+        self.assertEqual(content_based.get_similar_places(1), [2, 4])
+        self.assertEqual(content_based.get_similar_places(1, num_recommendations=1), [2])
+        self.assertEqual(content_based.get_similar_places(3), [])
+        self.assertEqual(content_based.get_similar_places(4), [])
+
+    def test_a_miss_queues_the_build_instead_of_running_it(self):
+        schedule = self.patch('recommendations.tasks.rebuild_similar_places_task')
+
+        with mock.patch.object(content_based, 'rebuild_similar_places') as rebuild:
+            self.assertEqual(content_based.get_similar_places(1), [])
+            self.assertEqual(content_based.get_similar_places(2), [])
+
+        rebuild.assert_not_called()
+        schedule.delay.assert_called_once_with()
+
+
+class ProcessPoolTests(SimpleTestCase):
+    def test_falls_back_to_serial_in_a_threaded_process(self):
+        parallel = mock.Mock()
+
+        with mock.patch('recommendations.process_pool.threading.active_count', return_value=2):
+            result = process_pool.run_parallel_or_serial(2, parallel, lambda: 'serial', 'testing')
+
+        self.assertEqual(result, 'serial')
+        parallel.assert_not_called()
+
+    def test_falls_back_to_serial_when_the_pool_cannot_start(self):
+        parallel = mock.Mock(side_effect=AssertionError('daemonic processes are not allowed to have children'))
+
+        with mock.patch.object(process_pool, 'can_fork_pool', return_value=True):
+            result = process_pool.run_parallel_or_serial(2, parallel, lambda: 'serial', 'testing')
+
+        self.assertEqual(result, 'serial')
+        parallel.assert_called_once()
+
+    def test_parallel_similarity_build_matches_the_serial_one(self):
+        centered = user_based.mean_center_rows(_random_ratings(30, 12))
+
+        serial = user_based.build_neighbors(centered, 5, workers=1, block_size=8)
+        with mock.patch.object(process_pool, 'can_fork_pool', return_value=True):
+            parallel = user_based.build_neighbors(centered, 5, workers=2, block_size=8)
+
+        np.testing.assert_array_equal(parallel[0], serial[0])
+        np.testing.assert_array_equal(parallel[1], serial[1])
+
+    def test_parallel_tokenization_keeps_input_order(self):
+        texts = ['ทะเลสวยมาก', 'ภูเขา อากาศดี', None, 'อาหารอร่อย'] * 3
+
+        serial = text_processing.tokenize_batch(texts, workers=1, chunk_size=2)
+        with mock.patch.object(process_pool, 'can_fork_pool', return_value=True):
+            parallel = text_processing.tokenize_batch(texts, workers=2, chunk_size=2)
+
+        self.assertEqual(parallel, serial)
@@ -0,0 +1,66 @@
+"""
+Thai text preprocessing shared by the content-based profiles and the Word2Vec trainer.
+
+`tokenize_batch` tokenizes many descriptions at once: the stopword set is loaded
+once per process, and large batches can be split into chunks tokenized by a
+process pool (newmm tokenization is pure Python, so threads would not help).
+The pool is off by default and is only forked from single-threaded processes.
+"""
+import logging
+import re
+import string
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+from django.conf import settings
+from pythainlp.corpus import thai_stopwords
+from pythainlp.tokenize import word_tokenize
+from pythainlp.util import normalize
+
+from recommendations import process_pool
+
+logger = logging.getLogger(__name__)
+
+_NON_THAI_PATTERN = re.compile(rf'[\s{re.escape(string.punctuation)}a-zA-Z0-9]+')
+
+
+def get_tokenize_settings():
+    """Returns (workers, chunk_size) for batch tokenization. workers <= 1 means serial."""
+    text_settings = settings.RECOMMENDATION_SETTINGS.get('TEXT_PROCESSING', {})
+    workers = text_settings.get('tokenize_workers') or 1
+    return int(workers), int(text_settings.get('tokenize_chunk_size', 200))
+
+@lru_cache(maxsize=1)
+def _stop_words():
+    return frozenset(thai_stopwords())
+
+def preprocess_thai_text(text):
+    if not isinstance(text, str):
+        return []
+    text = normalize(text)
+    text = _NON_THAI_PATTERN.sub('', text)
+    tokens = word_tokenize(text, engine='newmm')
+    stop_words = _stop_words()
+    return [word for word in tokens if word not in stop_words and not word.isspace()]
+
+def _tokenize_chunk(texts):
+    return [preprocess_thai_text(text) for text in texts]
+
+def tokenize_batch(texts, workers=None, chunk_size=None):
+    """
+    Preprocesses and tokenizes a list of texts, returning one token list per text
+    in input order. Uses a process pool when there is more than one chunk and
+    more than one worker, where `process_pool.run_parallel_or_serial` allows one.
+    """
+    texts = list(texts)
+    default_workers, default_chunk_size = get_tokenize_settings()
+    workers = workers or default_workers
+    chunk_size = chunk_size or default_chunk_size
+    chunks = [texts[start:start + chunk_size] for start in range(0, len(texts), chunk_size)]
+    workers = min(workers, len(chunks))
+
+    def tokenize_in_pool(context):
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            return [tokens for chunk in pool.map(_tokenize_chunk, chunks) for tokens in chunk]
+
+    return process_pool.run_parallel_or_serial(workers, tokenize_in_pool, lambda: _tokenize_chunk(texts), 'tokenizing')
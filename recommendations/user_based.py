@@ -1,111 +1,558 @@
 import pandas as pd
 import numpy as np
 from django.core.cache import cache
-from scipy.sparse import csr_matrix
-from sklearn.metrics.pairwise import cosine_similarity
+from scipy.sparse import coo_matrix, csr_matrix
+from sklearn.preprocessing import normalize
 import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
 from django.conf import settings
 
-from recommendations import cache_keys, data_utils, cache_management
+from recommendations import ann, cache_keys, data_utils, cache_management, process_pool, selection
 from recommendations.decorators import cache_with_build_lock
+from recommendations.models import UserPlaceScore
 
 logger = logging.getLogger(__name__)
 
 
-def _rebuild_user_similarity_matrix():
+def _load_user_place_scores():
     """
-    Core logic to compute the user similarity matrix using iterators for memory efficiency.
+    Reads the materialized UserPlaceScore table, which the
+    `0002_backfill_user_place_scores` migration filled from the event history.
     """
-    logger.info("Starting user similarity matrix computation using iterators.")
+    return data_utils.apply_schema(data_utils.get_user_place_scores(), 'scored_interactions')
 
-    rec_settings = settings.RECOMMENDATION_SETTINGS
-    REVIEW_MAX = rec_settings['REVIEW_MAX']
-    LIKE_WEIGHT = rec_settings['LIKE_WEIGHT']
-    VISIT_WEIGHT = rec_settings['VISIT_WEIGHT']
-    SHARE_WEIGHT = rec_settings.get('SHARE_WEIGHT', 0.4)
+def get_top_k_neighbors_setting():
+    return settings.RECOMMENDATION_SETTINGS.get('USER_BASED_SETTINGS', {}).get('top_k_neighbors', 50)
 
-    chunk_size = 2000
-    interaction_chunks = []
+def get_build_settings():
+    """Returns (workers, block_size) for the similarity build. workers <= 1 means serial."""
+    user_based_settings = settings.RECOMMENDATION_SETTINGS.get('USER_BASED_SETTINGS', {})
+    workers = user_based_settings.get('build_workers') or 1
+    return int(workers), int(user_based_settings.get('build_block_size', 500))
 
-    # Process reviews
-    for chunk in data_utils.chunked_iterator(data_utils.get_review_data(use_iterator=True), chunk_size):
-        df_chunk = data_utils.clean_interactions_df(pd.DataFrame(list(chunk)), 'reviews')
-        interaction_chunks.append(df_chunk.assign(score=df_chunk['rating'] / REVIEW_MAX)[['user_id', 'place_id', 'score']])
-
-    # Process likes
-    for chunk in data_utils.chunked_iterator(data_utils.get_like_data(use_iterator=True), chunk_size):
-        df_chunk = data_utils.clean_interactions_df(pd.DataFrame(list(chunk)), 'likes')
-        interaction_chunks.append(df_chunk.assign(score=LIKE_WEIGHT)[['user_id', 'place_id', 'score']])
-
-    # Process visits
-    for chunk in data_utils.chunked_iterator(data_utils.get_visit_data(use_iterator=True), chunk_size):
-        # The iterator returns dicts with 'object_id', so we must rename it here.
-        df_chunk_raw = pd.DataFrame(list(chunk))
-        if not df_chunk_raw.empty:
-            df_chunk_renamed = df_chunk_raw.rename(columns={'object_id': 'place_id'})
-            df_chunk_cleaned = data_utils.clean_interactions_df(df_chunk_renamed, 'visits')
-            interaction_chunks.append(df_chunk_cleaned.assign(score=VISIT_WEIGHT)[['user_id', 'place_id', 'score']])
-
-    # Process shares
-    for chunk in data_utils.chunked_iterator(data_utils.get_share_data(use_iterator=True), chunk_size):
-        df_chunk_raw = pd.DataFrame(list(chunk))
-        if not df_chunk_raw.empty:
-            df_chunk_renamed = df_chunk_raw.rename(columns={'object_id': 'place_id'})
-            df_chunk_cleaned = data_utils.clean_interactions_df(df_chunk_renamed, 'shares')
-            interaction_chunks.append(df_chunk_cleaned.assign(score=SHARE_WEIGHT)[['user_id', 'place_id', 'score']])
+def get_neighbor_backend_settings():
+    """
+    Returns (backend, ann_config). backend is 'exact' (all-pairs cosine) or 'ivf'
+    (approximate; see `recommendations.ann`).
+    """
+    user_based_settings = settings.RECOMMENDATION_SETTINGS.get('USER_BASED_SETTINGS', {})
+    return user_based_settings.get('neighbor_backend', 'exact'), user_based_settings.get('ANN', {})
 
-    if not interaction_chunks:
-        logger.warning("No interaction data available for similarity matrix.")
-        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+def _top_k_rows(chunk_sim, row_offset, k):
+    """
+    Keeps the k most similar other users of each row in a similarity block.
+    Returns (neighbor_index, neighbor_scores) of shape (rows, k), best first,
+    where index -1 marks padding for rows with fewer than k candidates.
+    """
+    rows = chunk_sim.shape[0]
+    chunk_sim = chunk_sim.astype(np.float32, copy=False)
+    # A user is never its own neighbor.
+    chunk_sim[np.arange(rows), np.arange(row_offset, row_offset + rows)] = -np.inf
+    neighbor_index, neighbor_scores = selection.top_k_rows(chunk_sim, k)
+    return neighbor_index.astype(np.int32), neighbor_scores
+
+def build_user_item_matrix(all_interactions):
+    """
+    Builds the sparse user-item matrix straight from (user_id, place_id, score) arrays.
 
-    all_interactions = pd.concat(interaction_chunks, ignore_index=True)
+    Returns (user_item_matrix, user_ids, place_ids): a float32 CSR matrix whose
+    rows and columns are the positions of the sorted `user_ids` / `place_ids` arrays.
+    """
+    user_ids, user_codes = np.unique(all_interactions['user_id'].to_numpy(dtype=np.int32), return_inverse=True)
+    place_ids, place_codes = np.unique(all_interactions['place_id'].to_numpy(dtype=np.int32), return_inverse=True)
+    user_item_matrix = coo_matrix(
+        (all_interactions['score'].to_numpy(dtype=np.float32), (user_codes, place_codes)),
+        shape=(len(user_ids), len(place_ids))
+    ).tocsr()  # duplicate (user, place) pairs are summed
+    user_item_matrix.eliminate_zeros()
+    return user_item_matrix, user_ids.astype(np.int32), place_ids.astype(np.int32)
+
+def row_means(user_item_matrix):
+    """Each user's mean score over their stored (nonzero) entries; 0 for empty rows."""
+    counts = np.diff(user_item_matrix.indptr)
+    sums = np.asarray(user_item_matrix.sum(axis=1)).ravel()
+    return np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0)
+
+def mean_center_rows(user_item_matrix):
+    """Subtracts each user's mean score from their stored (nonzero) entries only."""
+    centered = user_item_matrix.copy()
+    centered.data -= np.repeat(row_means(user_item_matrix), np.diff(user_item_matrix.indptr)).astype(centered.dtype)
+    return centered
+
+def _user_row(user_ids, user_id):
+    """Row position of a user in the sorted `user_ids` array, or None."""
+    row = np.searchsorted(user_ids, user_id)
+    if row >= len(user_ids) or user_ids[row] != user_id:
+        return None
+    return int(row)
+
+def get_user_ratings(user_id, collab_data):
+    """Returns the user's stored scores as a Series indexed by place id (empty if unknown)."""
+    user_ids = collab_data.get('user_ids')
+    user_item_matrix = collab_data.get('user_item_matrix')
+    if user_ids is None or user_item_matrix is None:
+        return pd.Series(dtype=np.float32)
+    row = _user_row(user_ids, user_id)
+    if row is None:
+        return pd.Series(dtype=np.float32)
+    start, end = user_item_matrix.indptr[row], user_item_matrix.indptr[row + 1]
+    place_ids = collab_data['place_ids'][user_item_matrix.indices[start:end]]
+    return pd.Series(user_item_matrix.data[start:end], index=place_ids)
+
+# --- Blockwise Similarity Build ---
+# Rows of the L2-normalized, mean-centered matrix are multiplied against the whole
+# matrix one block at a time, so a block's cosine similarities are a plain sparse
+# product and only its top-K survive. Blocks are independent, which lets the
+# parallel mode hand them to a process pool reading one shared copy of the CSR arrays.
+
+_shared_matrix = None
+
+def _similarity_block(matrix, start, end, k):
+    block_sim = (matrix[start:end] @ matrix.T).toarray()
+    return _top_k_rows(block_sim, start, k)
+
+def _share_csr(matrix):
+    """Copies the CSR arrays into shared memory. Returns (segments, spec)."""
+    segments, spec = [], {'shape': matrix.shape}
+    for name in ('data', 'indices', 'indptr'):
+        array = getattr(matrix, name)
+        segment = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf)[:] = array
+        segments.append(segment)
+        spec[name] = (segment.name, array.shape, array.dtype.str)
+    return segments, spec
+
+def _attach_shared_csr(spec):
+    """Pool initializer: maps the shared CSR arrays into this worker without copying."""
+    global _shared_matrix
+    arrays, segments = {}, []
+    for name in ('data', 'indices', 'indptr'):
+        segment_name, shape, dtype = spec[name]
+        segment = shared_memory.SharedMemory(name=segment_name)
+        segments.append(segment)
+        arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=segment.buf)
+    _shared_matrix = (
+        csr_matrix((arrays['data'], arrays['indices'], arrays['indptr']), shape=spec['shape'], copy=False),
+        segments  # keep the mappings alive for the worker's lifetime
+    )
+
+def _shared_similarity_block(start, end, k):
+    index, scores = _similarity_block(_shared_matrix[0], start, end, k)
+    return start, index, scores
+
+def _build_neighbors_serial(matrix, k, block_size):
+    n_users = matrix.shape[0]
+    neighbor_index = np.empty((n_users, k), dtype=np.int32)
+    neighbor_scores = np.empty((n_users, k), dtype=np.float32)
+    for start in range(0, n_users, block_size):
+        end = min(start + block_size, n_users)
+        neighbor_index[start:end], neighbor_scores[start:end] = _similarity_block(matrix, start, end, k)
+    return neighbor_index, neighbor_scores
+
+def _build_neighbors_parallel(matrix, k, block_size, workers, context):
+    n_users = matrix.shape[0]
+    neighbor_index = np.empty((n_users, k), dtype=np.int32)
+    neighbor_scores = np.empty((n_users, k), dtype=np.float32)
+    segments, spec = _share_csr(matrix)
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers, mp_context=context, initializer=_attach_shared_csr, initargs=(spec,)
+        ) as pool:
+            futures = [
+                pool.submit(_shared_similarity_block, start, min(start + block_size, n_users), k)
+                for start in range(0, n_users, block_size)
+            ]
+            for future in futures:
+                start, index, scores = future.result()
+                neighbor_index[start:start + len(index)] = index
+                neighbor_scores[start:start + len(index)] = scores
+    finally:
+        for segment in segments:
+            segment.close()
+            segment.unlink()
+    return neighbor_index, neighbor_scores
+
+def _build_neighbors_ivf(matrix, k, ann_config):
+    """Approximate neighbors; logs recall against exact search on a sample of users."""
+    neighbor_index, neighbor_scores = ann.ivf_neighbors(
+        matrix, k,
+        n_lists=ann_config.get('n_lists'),
+        n_probe=ann_config.get('n_probe', 8),
+        seed=ann_config.get('seed', 0)
+    )
+    sample_size = ann_config.get('recall_sample_size', 200)
+    if sample_size:
+        recall = ann.measure_recall(matrix, neighbor_index, k, sample_size=sample_size)
+        if recall is not None:
+            logger.info(f"IVF neighbor recall@{k} against exact search on up to {sample_size} sampled users: {recall:.3f}")
+    return neighbor_index, neighbor_scores
+
+def build_neighbors(user_item_centered, k, workers=1, block_size=500, backend='exact', ann_config=None):
+    """
+    Computes the top-K cosine neighbors of every row of a (mean-centered) CSR matrix.
 
-    user_item_df = all_interactions.groupby(['user_id', 'place_id'])['score'].sum().unstack().fillna(0)
-    if user_item_df.empty:
-        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+    With backend='exact', uses a process pool over shared memory when `workers` > 1
+    and there is more than one block, where `process_pool.run_parallel_or_serial`
+    allows one, and the serial loop otherwise.
+    With backend='ivf', users are only compared within nearby k-means lists
+    (see `recommendations.ann`).
+    """
+    matrix = normalize(user_item_centered.astype(np.float32), norm='l2', axis=1, copy=True).tocsr()
+    if backend == 'ivf':
+        return _build_neighbors_ivf(matrix, k, ann_config or {})
+    n_blocks = -(-matrix.shape[0] // block_size)
+    workers = min(workers, n_blocks)
+    return process_pool.run_parallel_or_serial(
+        workers,
+        lambda context: _build_neighbors_parallel(matrix, k, block_size, workers, context),
+        lambda: _build_neighbors_serial(matrix, k, block_size),
+        'building similarities'
+    )
+
+def _rebuild_user_similarity_matrix(with_neighbors=True):
+    """
+    Core logic to compute each user's top-K most similar users from the
+    materialized (user, place, score) table. Without `with_neighbors` only the
+    matrix and row statistics are built, and the neighbor arrays have no columns.
+
+    The user-item matrix is built as CSR from the score arrays and never
+    densified. Similarity is computed one block of rows at a time (in parallel
+    when configured) and only the top-K of each block is kept, so memory is
+    O(n_users * K + nnz).
+    Returns `collab_arrays`, holding `user_item_matrix`, `user_ids`, `place_ids`,
+    `neighbor_index`, `neighbor_scores` and the per-row `row_means` and
+    `row_norms` (of the mean-centered rows) used by incremental updates, or {}.
+    """
+    logger.info("Starting user similarity matrix computation.")
 
-    user_means = user_item_df.replace(0, np.nan).mean(axis=1)
-    user_item_df_centered = user_item_df.sub(user_means, axis=0).fillna(0)
-    user_item_sparse = csr_matrix(user_item_df_centered.values)
+    all_interactions = _load_user_place_scores()
 
-    n_users = user_item_sparse.shape[0]
-    sim_chunk_size = 500
-    similarity_chunks = []
-    for i in range(0, n_users, sim_chunk_size):
-        end = min(i + sim_chunk_size, n_users)
-        chunk = user_item_sparse[i:end]
-        chunk_sim = cosine_similarity(chunk, user_item_sparse)
-        similarity_chunks.append(chunk_sim)
+    if all_interactions.empty:
+        logger.warning("No interaction data available for similarity matrix.")
+        return {}
 
-    full_similarity_matrix = np.vstack(similarity_chunks)
-    user_similarity_df = pd.DataFrame(full_similarity_matrix, index=user_item_df.index, columns=user_item_df.index)
-    logger.info("Finished user similarity matrix computation.")
-    return user_similarity_df, user_item_df, all_interactions
+    user_item_matrix, user_ids, place_ids = build_user_item_matrix(all_interactions)
+    if user_item_matrix.nnz == 0:
+        return {}
 
-def rebuild_user_similarity_cache():
+    user_item_centered = mean_center_rows(user_item_matrix)
+
+    n_users = user_item_centered.shape[0]
+    k = get_top_k_neighbors_setting() if with_neighbors else 0
+    workers, block_size = get_build_settings()
+    backend, ann_config = get_neighbor_backend_settings()
+    if k > 0:
+        build_start = time.monotonic()
+        neighbor_index, neighbor_scores = build_neighbors(
+            user_item_centered, k, workers=workers, block_size=block_size, backend=backend, ann_config=ann_config
+        )
+        logger.info(
+            f"Built top-{k} neighbors for {n_users} users in {time.monotonic() - build_start:.2f}s "
+            f"(backend={backend}, workers={workers}, block_size={block_size})."
+        )
+    else:
+        neighbor_index = np.empty((n_users, 0), dtype=np.int32)
+        neighbor_scores = np.empty((n_users, 0), dtype=np.float32)
+
+    collab_arrays = {
+        'user_item_matrix': user_item_matrix,
+        'user_ids': user_ids,
+        'place_ids': place_ids,
+        'neighbor_index': neighbor_index,
+        'neighbor_scores': neighbor_scores,
+        'row_means': row_means(user_item_matrix),
+        'row_norms': np.sqrt(np.asarray(user_item_centered.multiply(user_item_centered).sum(axis=1)).ravel()),
+    }
+    logger.info(f"Finished user similarity matrix computation: {n_users} users, top {k} neighbors each.")
+    return collab_arrays
+
+def rebuild_user_similarity_cache(with_neighbors=True):
     """
-    Computes and caches the user similarity matrix and the user-item matrix.
+    Computes and caches the top-K user neighbors and the sparse user-item matrix.
+    `with_neighbors=False` caches the matrix alone, for when another model fills
+    the collaborative slot and only the batch layer's rating lookups need it.
     This function is intended to be called by a cache-building process (e.g., a task).
     """
     try:
-        user_similarity_df, user_item_matrix, all_interactions = _rebuild_user_similarity_matrix()
-        if not user_similarity_df.empty and not user_item_matrix.empty and not all_interactions.empty:
-            data_to_cache = {
-                'similarity_matrix': user_similarity_df,
-                'user_item_matrix': user_item_matrix,
-                'all_interactions': all_interactions
-            }
-            cache_config = settings.RECOMMENDATION_SETTINGS.get('CACHING', {})
-            timeout = cache_config.get('GLOBAL_CACHE_TIMEOUT', 3600 * 2)
-            cache.set(cache_keys.USER_COLLABORATIVE_FILTERING_DATA_KEY, data_to_cache, timeout=timeout)
+        # Users patched into the current bundle from here on may have changed after
+        # this build reads the scores; they are re-queued when it is published.
+        data_utils.clear_patched_neighbors()
+        collab_arrays = _rebuild_user_similarity_matrix(with_neighbors)
+        if collab_arrays:
+            _publish_collab_data(collab_arrays)
             logger.info("Successfully rebuilt and cached user collaborative filtering data.")
-            return data_to_cache
+            return collab_arrays
         logger.warning("Rebuild process resulted in empty dataframes. Not caching.")
         return {}
     except Exception as e:
         logger.error(f"Error rebuilding user similarity cache: {e}")
         return {}
 
+# --- Incremental Neighbor Maintenance ---
+# When one user's scores change, only their row of the user-item matrix, their own
+# top-K list and their entries in other users' lists can change (every other
+# user's mean-centered vector is untouched). Score changes only flag the user in a
+# Redis set; a periodic task patches all flagged users against one load of the
+# cached bundle, off the request path. A neighbor whose similarity to the user
+# dropped keeps the lowered score rather than being replaced by a user outside its
+# list; the periodic full rebuild is the consistency pass that restores exact
+# top-K lists.
+#
+# Patches and full builds write the bundle under one lock, so a patch of an older
+# bundle never overwrites a newer build. Users patched while a build was running
+# are re-queued when the build is published (a patch recomputes from the table,
+# so applying it twice is harmless).
+
+COLLAB_WRITE_LOCK_KEY = f"user_collab_write_lock:{cache_keys.USER_COLLABORATIVE_FILTERING_DATA_KEY}"
+COLLAB_WRITE_LOCK_TIMEOUT = 300
+
+def incremental_updates_enabled():
+    return settings.RECOMMENDATION_SETTINGS.get('USER_BASED_SETTINGS', {}).get('incremental_updates', True)
+
+def _publish_collab_data(collab_data):
+    """Caches a freshly built bundle once no patch is writing the previous one."""
+    deadline = time.monotonic() + COLLAB_WRITE_LOCK_TIMEOUT
+    locked = cache.add(COLLAB_WRITE_LOCK_KEY, 'publishing', timeout=COLLAB_WRITE_LOCK_TIMEOUT)
+    while not locked and time.monotonic() < deadline:
+        time.sleep(0.5)
+        locked = cache.add(COLLAB_WRITE_LOCK_KEY, 'publishing', timeout=COLLAB_WRITE_LOCK_TIMEOUT)
+    try:
+        cache_config = settings.RECOMMENDATION_SETTINGS.get('CACHING', {})
+        timeout = cache_config.get('GLOBAL_CACHE_TIMEOUT', 3600 * 2)
+        cache.set(cache_keys.USER_COLLABORATIVE_FILTERING_DATA_KEY, collab_data, timeout=timeout)
+        data_utils.requeue_patched_neighbors()
+    finally:
+        if locked:
+            cache.delete(COLLAB_WRITE_LOCK_KEY)
+
+def _load_user_scores(user_id):
+    """The user's current (place_ids, scores) from the materialized table, sorted by place."""
+    rows = UserPlaceScore.objects.filter(user_id=user_id, score__gt=0).order_by('place_id')
+    pairs = list(rows.values_list('place_id', 'score'))
+    if not pairs:
+        return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+    place_ids, scores = zip(*pairs)
+    return np.asarray(place_ids, dtype=np.int32), np.asarray(scores, dtype=np.float32)
+
+def _replace_user_row(collab_data, user_id, user_place_ids, user_scores):
+    """
+    Writes a user's scores into the cached matrix, adding a row for a new user and
+    columns for new places, and refreshes the row's mean and centered norm.
+    Only the user's own entries are spliced into the CSR arrays; no other row is
+    recentered. Updates `collab_data` in place and returns the user's row.
+    """
+    user_item_matrix = collab_data['user_item_matrix']
+    user_ids, place_ids = collab_data['user_ids'], collab_data['place_ids']
+    indices = user_item_matrix.indices
+
+    all_place_ids = np.union1d(place_ids, user_place_ids).astype(np.int32)
+    if len(all_place_ids) != len(place_ids):
+        indices = np.searchsorted(all_place_ids, place_ids[indices]).astype(indices.dtype)
+        place_ids = all_place_ids
+
+    indptr = user_item_matrix.indptr
+    row = _user_row(user_ids, user_id)
+    if row is None:
+        row = int(np.searchsorted(user_ids, user_id))
+        start = end = indptr[row]
+        indptr = np.concatenate([indptr[:row + 1], indptr[row:] + len(user_scores)]).astype(indptr.dtype)
+        user_ids = np.insert(user_ids, row, user_id).astype(np.int32)
+        neighbor_index = collab_data['neighbor_index']
+        neighbor_index[neighbor_index >= row] += 1
+        collab_data['neighbor_index'] = np.insert(neighbor_index, row, -1, axis=0)
+        collab_data['neighbor_scores'] = np.insert(collab_data['neighbor_scores'], row, 0, axis=0)
+        collab_data['row_means'] = np.insert(collab_data['row_means'], row, 0)
+        collab_data['row_norms'] = np.insert(collab_data['row_norms'], row, 0)
+    else:
+        start, end = indptr[row], indptr[row + 1]
+        indptr = indptr.copy()
+        indptr[row + 1:] += len(user_scores) - (end - start)
+
+    user_scores = user_scores.astype(np.float32)
+    collab_data['user_item_matrix'] = csr_matrix((
+        np.concatenate([user_item_matrix.data[:start], user_scores, user_item_matrix.data[end:]]),
+        np.concatenate([
+            indices[:start], np.searchsorted(place_ids, user_place_ids).astype(indices.dtype), indices[end:]
+        ]),
+        indptr
+    ), shape=(len(user_ids), len(place_ids)))
+    collab_data['user_ids'], collab_data['place_ids'] = user_ids, place_ids
+
+    mean = float(user_scores.mean()) if len(user_scores) else 0.0
+    centered = user_scores - np.float32(mean)
+    collab_data['row_means'][row] = mean
+    collab_data['row_norms'][row] = np.sqrt(np.dot(centered, centered))
+    return row
+
+def _row_similarities(collab_data, row):
+    """
+    Cosine similarity of one user's mean-centered row to every user's, computed
+    from the columns of the places they scored and the cached row means and norms.
+    """
+    user_item_matrix = collab_data['user_item_matrix']
+    means, norms = collab_data['row_means'], collab_data['row_norms']
+    start, end = user_item_matrix.indptr[row], user_item_matrix.indptr[row + 1]
+    centered_row = user_item_matrix.data[start:end] - np.float32(means[row])
+
+    columns = user_item_matrix[:, user_item_matrix.indices[start:end]]
+    columns.data -= np.repeat(means, np.diff(columns.indptr)).astype(columns.dtype)
+    dots = columns @ centered_row
+    denominators = norms * norms[row]
+    similarities = np.divide(dots, denominators, out=np.zeros(len(dots)), where=denominators > 0)
+    return similarities.astype(np.float32)
+
+def patch_neighbor_lists(neighbor_index, neighbor_scores, row, similarities):
+    """
+    Applies one user's new similarity column to every other user's top-K list in
+    place. `similarities` is None when the user no longer has any scores, which
+    removes them from all lists. Touched lists are re-sorted best first, padding last.
+    """
+    listed = neighbor_index == row
+    has_row = listed.any(axis=1)
+    if similarities is None:
+        neighbor_index[listed], neighbor_scores[listed] = -1, 0
+        touched = has_row
+    else:
+        neighbor_scores[listed] = np.broadcast_to(similarities[:, None], listed.shape)[listed]
+        enters = ~has_row & (
+            (neighbor_index[:, -1] < 0) | (similarities > neighbor_scores[:, -1])
+        )
+        enters[row] = False
+        neighbor_index[enters, -1], neighbor_scores[enters, -1] = row, similarities[enters]
+        touched = has_row | enters
+
+    rows = np.flatnonzero(touched)
+    if len(rows):
+        sort_key = np.where(neighbor_index[rows] < 0, np.inf, -neighbor_scores[rows])
+        order = np.argsort(sort_key, axis=1, kind='stable')
+        neighbor_index[rows] = np.take_along_axis(neighbor_index[rows], order, axis=1)
+        neighbor_scores[rows] = np.take_along_axis(neighbor_scores[rows], order, axis=1)
+    return len(rows)
+
+def _patch_user(collab_data, user_id):
+    """Patches one user into a loaded bundle. Returns the number of other lists touched."""
+    user_place_ids, user_scores = _load_user_scores(user_id)
+    if len(user_scores) == 0 and _user_row(collab_data['user_ids'], user_id) is None:
+        return 0
+    row = _replace_user_row(collab_data, user_id, user_place_ids, user_scores)
+
+    neighbor_index, neighbor_scores = collab_data['neighbor_index'], collab_data['neighbor_scores']
+    k = neighbor_index.shape[1]
+    if k == 0:  # a bundle built without neighbor lists
+        return 0
+    if len(user_scores):
+        similarities = _row_similarities(collab_data, row)
+        # Users left without scores stay in the arrays until the next full build,
+        # which drops them; they are never anyone's neighbor.
+        candidates = similarities[None, :].copy()
+        candidates[0, np.diff(collab_data['user_item_matrix'].indptr) == 0] = -np.inf
+        own_index, own_scores = _top_k_rows(candidates, row, k)
+        neighbor_index[row], neighbor_scores[row] = own_index[0], own_scores[0]
+    else:
+        similarities = None
+        neighbor_index[row], neighbor_scores[row] = -1, 0
+    return patch_neighbor_lists(neighbor_index, neighbor_scores, row, similarities)
+
+def update_user_neighbors(user_ids):
+    """
+    Patches the cached CF bundle after the given users' scores changed: their matrix
+    rows, their own top-K neighbors (exact, against every cached user) and their
+    entries in other users' top-K lists, with one cache read and write for the whole
+    batch. The caller must hold COLLAB_WRITE_LOCK_KEY. Returns False if there is no
+    cached bundle to patch; the next full build then picks the changes up.
+    """
+    collab_data = cache.get(cache_keys.USER_COLLABORATIVE_FILTERING_DATA_KEY)
+    if not collab_data:
+        logger.info("No cached CF data to patch; leaving the changes to the next rebuild.")
+        return False
+
+    started = time.monotonic()
+    patched = sum(_patch_user(collab_data, user_id) for user_id in user_ids)
+
+    cache_config = settings.RECOMMENDATION_SETTINGS.get('CACHING', {})
+    timeout = cache_config.get('GLOBAL_CACHE_TIMEOUT', 3600 * 2)
+    cache.set(cache_keys.USER_COLLABORATIVE_FILTERING_DATA_KEY, collab_data, timeout=timeout)
+    logger.info(
+        f"Incrementally updated neighbors of {len(user_ids)} users and {patched} other users' lists "
+        f"in {time.monotonic() - started:.3f}s."
+    )
+    return True
+
+def update_dirty_user_neighbors():
+    """
+    Patches every user flagged by `data_utils.mark_neighbors_dirty` since the last
+    run. Skipped (leaving the flags in place) while another patch or a full build
+    is writing the bundle. Returns the number of users patched.
+    This function is intended to be called by a periodic task.
+    """
+    if not cache.add(COLLAB_WRITE_LOCK_KEY, 'patching', timeout=COLLAB_WRITE_LOCK_TIMEOUT):
+        logger.info("CF bundle is being written; leaving dirty users for the next run.")
+        return 0
+    user_ids = set()
+    try:
+        user_ids = data_utils.pop_dirty_neighbors()
+        if not user_ids or not update_user_neighbors(sorted(user_ids)):
+            return 0
+        data_utils.mark_neighbors_patched(user_ids)
+        return len(user_ids)
+    except Exception as e:
+        logger.error(f"Error updating neighbors of {len(user_ids)} users: {e}", exc_info=True)
+        data_utils.restore_dirty_neighbors(user_ids)
+        return 0
+    finally:
+        cache.delete(COLLAB_WRITE_LOCK_KEY)
+
+def _neighbor_rows(user_id, collab_data, top_k=None):
+    """
+    Returns (rows, similarities) of a user's positive-similarity neighbors, best
+    first, as row positions into the cached arrays. Both are empty if unknown.
+    """
+    empty = np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+    user_ids = collab_data.get('user_ids')
+    neighbor_index = collab_data.get('neighbor_index')
+    neighbor_scores = collab_data.get('neighbor_scores')
+    if user_ids is None or neighbor_index is None or neighbor_scores is None:
+        return empty
+
+    row = _user_row(user_ids, user_id)
+    if row is None:
+        return empty
+
+    index, scores = neighbor_index[row], neighbor_scores[row]
+    keep = (index >= 0) & (scores > 0)
+    index, scores = index[keep], scores[keep]
+    if top_k is not None:
+        index, scores = index[:top_k], scores[:top_k]
+    return index, scores
+
+def get_similar_users(user_id, collab_data, top_k=None):
+    """
+    Returns a Series of {similar_user_id: similarity} for a user, best first,
+    read from the cached top-K neighbor arrays (positive similarities only).
+    """
+    rows, scores = _neighbor_rows(user_id, collab_data, top_k)
+    return pd.Series(scores, index=collab_data['user_ids'][rows] if len(rows) else rows)
+
+def score_places_from_neighbors(rows, similarities, user_item_matrix):
+    """
+    Neighbor-weighted average score of every place, as two sparse products over
+    the neighbors' CSR rows: sum(sim * score) / sum(sim over neighbors who scored it).
+    Returns (place_positions, scores) for places scored by at least one neighbor.
+    """
+    neighbor_items = user_item_matrix[rows].astype(np.float64)
+    neighbor_items.data[neighbor_items.data < 0] = 0
+    neighbor_items.eliminate_zeros()
+    similarities = similarities.astype(np.float64)
+
+    weighted = neighbor_items.T @ similarities
+    neighbor_items.data[:] = 1
+    normalizer = neighbor_items.T @ similarities
+
+    place_positions = np.flatnonzero(normalizer > 0)
+    return place_positions, weighted[place_positions] / normalizer[place_positions]
+
 # Note: The decorator needs a class instance to work, so we can't decorate a standalone function
 # in the same way. We will handle the locking logic inside the getter function instead.
 def get_user_collaborative_filtering_data(force_refresh=False):
@@ -143,62 +590,42 @@ def get_user_based_recommendations(user_id, collab_data, num_recommendations=10,
             logger.warning(f"UBF: Exiting for user {user_id} because collab_data is not available.")
             return []
 
-        user_similarity_df = collab_data.get('similarity_matrix')
+        user_ids = collab_data.get('user_ids')
         user_item_matrix = collab_data.get('user_item_matrix')
 
-        if user_similarity_df is None or user_item_matrix is None or user_similarity_df.empty or user_item_matrix.empty:
+        if user_ids is None or user_item_matrix is None or len(user_ids) == 0 or user_item_matrix.nnz == 0:
             logger.warning(f"UBF: Exiting for user {user_id} due to missing or empty matrices.")
             return []
         
-        if user_id not in user_similarity_df.index:
-            logger.warning(f"UBF: Exiting because user {user_id} not in similarity matrix.")
-            return []
-
-        num_users = len(user_similarity_df.columns)
+        num_users = len(user_ids)
         top_k = max(10, int(num_users * 0.1))
         logger.info(f"UBF: User {user_id}: Found {num_users} users in matrix, using top_k={top_k}.")
 
-        similar_users = user_similarity_df[user_id].sort_values(ascending=False)
-        similar_users = similar_users[similar_users > 0][1:top_k + 1]
+        rows, similarities = _neighbor_rows(user_id, collab_data, top_k=top_k)
 
-        if similar_users.empty:
-            logger.warning(f"UBF: User {user_id} has no similar users with score > 0. Exiting.")
+        if len(rows) == 0:
+            logger.warning(f"UBF: User {user_id} has no similar users with score > 0 (or is not in the matrix). Exiting.")
             return []
         
-        logger.info(f"UBF: User {user_id}: Found {len(similar_users)} similar users.")
-
-        place_scores = {}
-        total_similarity = {}
-
-        for similar_user_id, similarity_score in similar_users.items():
-            if similar_user_id in user_item_matrix.index:
-                similar_user_ratings = user_item_matrix.loc[similar_user_id]
-                for place_id, rating in similar_user_ratings[similar_user_ratings > 0].items():
-                    place_scores.setdefault(place_id, 0)
-                    place_scores[place_id] += similarity_score * rating
-                    total_similarity.setdefault(place_id, 0)
-                    total_similarity[place_id] += similarity_score
+        logger.info(f"UBF: User {user_id}: Found {len(rows)} similar users.")
+
+        place_positions, scores = score_places_from_neighbors(rows, similarities, user_item_matrix)
         
-        if not place_scores:
+        if len(place_positions) == 0:
             logger.warning(f"UBF: User {user_id}: No place scores generated from similar users. Exiting.")
             return []
 
-        recommendation_scores = {
-            place_id: score / total_similarity[place_id]
-            for place_id, score in place_scores.items() if total_similarity.get(place_id, 0) > 0
-        }
-        
-        logger.info(f"UBF: User {user_id}: Generated {len(recommendation_scores)} raw recommendations.")
+        place_ids = collab_data['place_ids'][place_positions]
+        logger.info(f"UBF: User {user_id}: Generated {len(place_ids)} raw recommendations.")
 
         if filter_interacted:
             user_interacted_places = cache_management.get_user_interacted_places(user_id)
             logger.info(f"UBF: User {user_id}: Found {len(user_interacted_places)} interacted places to filter.")
-            for place_id in user_interacted_places:
-                recommendation_scores.pop(place_id, None)
+            if user_interacted_places:
+                keep = ~np.isin(place_ids, np.fromiter(user_interacted_places, dtype=np.int64))
+                place_ids, scores = place_ids[keep], scores[keep]
 
-        sorted_recommendations = sorted(recommendation_scores.items(), key=lambda item: item[1], reverse=True)
-        
-        final_recs = [place_id for place_id, score in sorted_recommendations[:num_recommendations]]
+        final_recs = place_ids[selection.top_n_positions(scores, num_recommendations)].tolist()
         logger.info(f"UBF: User {user_id}: Successfully generated {len(final_recs)} final recommendations.")
         return final_recs
 
@@ -0,0 +1,330 @@
+"""
+Vector indexes over place vectors, with cosine similarity as a float32 dot product.
+
+`ExactIndex` scans every stored vector. `IVFIndex` clusters the vectors into
+`n_lists` inverted lists with spherical k-means and scans only the `n_probe`
+lists whose centroids are closest to the query (see `recommendations.ann` for the
+same idea over user vectors). Both support adding, removing and updating single
+places, so catalogue edits are applied in place; an IVF index keeps its centroids
+until its size has drifted far from the size it was trained at.
+"""
+import logging
+
+import numpy as np
+from django.conf import settings
+
+from recommendations import selection
+
+logger = logging.getLogger(__name__)
+
+
+def get_vector_index_settings():
+    index_settings = settings.RECOMMENDATION_SETTINGS.get('VECTOR_INDEX', {})
+    return {
+        'backend': index_settings.get('backend', 'exact'),
+        'n_lists': index_settings.get('n_lists'),
+        'n_probe': index_settings.get('n_probe', 8),
+        'seed': index_settings.get('seed', 0),
+        'recall_sample_size': index_settings.get('recall_sample_size', 200),
+        'scaler_tolerance': index_settings.get('scaler_tolerance', 0.05),
+    }
+
+def _normalize(vectors):
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+class ExactIndex:
+    """
+    Brute-force cosine search over a contiguous float32 matrix, with an int32 id
+    array and an id -> row dict.
+    """
+
+    backend = 'exact'
+
+    def __init__(self, dim):
+        self.dim = dim
+        self.ids = np.empty(0, dtype=np.int32)
+        self.vectors = np.empty((0, dim), dtype=np.float32)
+        self._rows = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, place_id):
+        return int(place_id) in self._rows
+
+    def add(self, ids, vectors):
+        """Adds vectors for new ids; ids already in the index are updated instead."""
+        ids = np.asarray(ids, dtype=np.int32).ravel()
+        vectors = _normalize(vectors)
+        existing = np.fromiter((place_id in self._rows for place_id in ids.tolist()), dtype=bool, count=len(ids))
+        if existing.any():
+            self.update(ids[existing], vectors[existing])
+        new_ids, new_vectors = ids[~existing], vectors[~existing]
+        if len(new_ids):
+            start = len(self.ids)
+            self.ids = np.concatenate([self.ids, new_ids])
+            self.vectors = np.vstack([self.vectors, new_vectors])
+            self._rows.update(zip(new_ids.tolist(), range(start, start + len(new_ids))))
+            self._on_add(start)
+
+    def update(self, ids, vectors):
+        """Replaces the vectors of ids already in the index."""
+        rows = np.fromiter((self._rows[place_id] for place_id in np.ravel(ids).tolist()), dtype=np.int64)
+        self.vectors[rows] = _normalize(vectors)
+        self._on_update(rows)
+
+    def remove(self, ids):
+        """Removes ids (unknown ids are ignored) by moving the last row into each hole."""
+        removed = 0
+        for place_id in np.ravel(ids).tolist():
+            row = self._rows.pop(place_id, None)
+            if row is None:
+                continue
+            last = len(self.ids) - 1
+            if row != last:
+                self.ids[row], self.vectors[row] = self.ids[last], self.vectors[last]
+                self._rows[int(self.ids[row])] = row
+                self._on_move(last, row)
+            self.ids, self.vectors = self.ids[:last], self.vectors[:last]
+            self._on_truncate(last)
+            removed += 1
+        return removed
+
+    def _candidate_rows(self, queries):
+        """Rows to scan for a block of queries; None means all rows."""
+        return None
+
+    # Hooks for subclasses that keep per-row state in step with the vectors.
+    def _on_add(self, start):
+        pass
+
+    def _on_update(self, rows):
+        pass
+
+    def _on_move(self, source, target):
+        pass
+
+    def _on_truncate(self, size):
+        pass
+
+    def search(self, query, k, exclude_ids=None):
+        """Returns (ids, scores) of the k stored vectors most similar to `query`, best first."""
+        query = _normalize(query)
+        rows = self._candidate_rows(query)
+        ids = self.ids if rows is None else self.ids[rows]
+        scores = (self.vectors if rows is None else self.vectors[rows]) @ query[0]
+        if exclude_ids:
+            scores[np.isin(ids, np.fromiter(exclude_ids, dtype=np.int64))] = -np.inf
+        top = selection.top_n_positions(scores, k)
+        return ids[top], scores[top]
+
+    def search_batch(self, queries, k, query_ids=None, block_size=1000):
+        """
+        Top-k neighbors of many queries at once, in blocks of `block_size` queries.
+        A query never matches its own id in `query_ids`. Returns (ids, scores) of
+        shape (n_queries, k), best first, where id -1 marks padding.
+        """
+        queries = _normalize(queries)
+        neighbor_ids = np.full((len(queries), k), -1, dtype=np.int32)
+        neighbor_scores = np.zeros((len(queries), k), dtype=np.float32)
+        for start in range(0, len(queries), block_size):
+            block = queries[start:start + block_size]
+            rows = self._candidate_rows(block)
+            ids = self.ids if rows is None else self.ids[rows]
+            scores = block @ (self.vectors if rows is None else self.vectors[rows]).T
+            if query_ids is not None:
+                block_ids = np.asarray(query_ids[start:start + block_size], dtype=np.int64)
+                scores[block_ids[:, None] == ids[None, :]] = -np.inf
+            top, top_scores = selection.top_k_rows(scores, k)
+            neighbor_ids[start:start + len(block)] = np.where(top >= 0, ids[top], -1)
+            neighbor_scores[start:start + len(block)] = top_scores
+        return neighbor_ids, neighbor_scores
+
+
+class IVFIndex(ExactIndex):
+    """
+    Approximate cosine search: each query scans only the vectors of its `n_probe`
+    closest k-means lists.
+    """
+
+    backend = 'ivf'
+
+    def __init__(self, dim, n_lists=None, n_probe=8, seed=0, iterations=10):
+        super().__init__(dim)
+        self.n_lists, self.n_probe, self.seed, self.iterations = n_lists, n_probe, seed, iterations
+        self.centroids = None
+        self.assignments = np.empty(0, dtype=np.int32)
+        self.trained_size = 0
+
+    def train(self):
+        """Clusters the stored vectors with spherical k-means and reassigns every row."""
+        n_vectors = len(self.ids)
+        if n_vectors == 0:
+            self.centroids, self.trained_size = None, 0
+            return
+        n_lists = min(self.n_lists or max(1, int(np.sqrt(n_vectors))), n_vectors)
+        rng = np.random.default_rng(self.seed)
+        centroids = self.vectors[rng.choice(n_vectors, n_lists, replace=False)]
+        for _ in range(self.iterations):
+            labels = (self.vectors @ centroids.T).argmax(axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, self.vectors)
+            empty = np.flatnonzero(~sums.any(axis=1))
+            # Re-seed empty lists with random vectors so every list stays useful.
+            sums[empty] = self.vectors[rng.choice(n_vectors, len(empty), replace=False)]
+            centroids = _normalize(sums)
+        self.centroids = centroids
+        self.assignments = (self.vectors @ centroids.T).argmax(axis=1).astype(np.int32)
+        self.trained_size = n_vectors
+
+    def needs_retrain(self):
+        """True once the index has grown or shrunk by half since the last training."""
+        return self.centroids is None or not (self.trained_size / 2 <= len(self.ids) <= self.trained_size * 2)
+
+    def _assign(self, rows):
+        self.assignments[rows] = (self.vectors[rows] @ self.centroids.T).argmax(axis=1)
+
+    def _on_add(self, start):
+        self.assignments = np.concatenate([self.assignments, np.zeros(len(self.ids) - start, dtype=np.int32)])
+        if self.needs_retrain():
+            self.train()
+        else:
+            self._assign(np.arange(start, len(self.ids)))
+
+    def _on_update(self, rows):
+        if self.centroids is not None:
+            self._assign(rows)
+
+    def _on_move(self, source, target):
+        self.assignments[target] = self.assignments[source]
+
+    def _on_truncate(self, size):
+        self.assignments = self.assignments[:size]
+
+    def _candidate_rows(self, queries):
+        if self.centroids is None:
+            return None
+        n_probe = min(self.n_probe, len(self.centroids))
+        direction = _normalize(queries.sum(axis=0))[0]
+        probes = np.argpartition(-(self.centroids @ direction), n_probe - 1)[:n_probe]
+        return np.flatnonzero(np.isin(self.assignments, probes))
+
+    def _probes(self, queries):
+        """Each query's `n_probe` closest lists, as sorted rows of list ids."""
+        n_probe = min(self.n_probe, len(self.centroids))
+        probes = np.argpartition(-(queries @ self.centroids.T), n_probe - 1, axis=1)[:, :n_probe]
+        return np.sort(probes, axis=1)
+
+    def search_batch(self, queries, k, query_ids=None, block_size=1000):
+        """
+        Probes each query's own closest lists, like `search`. Queries that share the
+        same set of lists are scanned together, in blocks of `block_size`.
+        """
+        queries = _normalize(queries)
+        if self.centroids is None or len(queries) == 0:
+            return super().search_batch(queries, k, query_ids, block_size)
+        neighbor_ids = np.full((len(queries), k), -1, dtype=np.int32)
+        neighbor_scores = np.zeros((len(queries), k), dtype=np.float32)
+        query_ids = None if query_ids is None else np.asarray(query_ids, dtype=np.int64)
+
+        # Rows of each list, so a probe set is gathered without scanning the assignments.
+        order = np.argsort(self.assignments, kind='stable')
+        bounds = np.searchsorted(self.assignments[order], np.arange(len(self.centroids) + 1))
+        probe_sets, groups = np.unique(self._probes(queries), axis=0, return_inverse=True)
+        groups = groups.ravel()
+        for group, probes in enumerate(probe_sets):
+            rows = np.concatenate([order[bounds[list_id]:bounds[list_id + 1]] for list_id in probes])
+            members = np.flatnonzero(groups == group)
+            for start in range(0, len(members), block_size):
+                block = members[start:start + block_size]
+                ids, scores = self._search_rows(
+                    queries[block], k, None if query_ids is None else query_ids[block], rows
+                )
+                neighbor_ids[block], neighbor_scores[block] = ids, scores
+        return neighbor_ids, neighbor_scores
+
+    def _search_rows(self, queries, k, query_ids, rows):
+        """Searches a block of queries against the given stored rows."""
+        ids = self.ids[rows]
+        scores = queries @ self.vectors[rows].T
+        if query_ids is not None:
+            scores[query_ids[:, None] == ids[None, :]] = -np.inf
+        top, top_scores = selection.top_k_rows(scores, k)
+        return np.where(top >= 0, ids[top], -1), top_scores.astype(np.float32)
+
+
+def measure_recall(index, k=10, sample_size=200, seed=0):
+    """
+    Recall@k of `index.search_batch` against exact search on a random sample of
+    the stored vectors (each queried for its k nearest other vectors): the share
+    of the exact top-k the index also returned. Returns None if there is nothing
+    to measure.
+    """
+    k_eff = min(k, len(index) - 1)
+    if k_eff <= 0 or sample_size <= 0:
+        return None
+    sample = np.random.default_rng(seed).choice(len(index), min(sample_size, len(index)), replace=False)
+    queries, query_ids = index.vectors[sample], index.ids[sample]
+    exact = queries @ index.vectors.T
+    exact[np.arange(len(sample)), sample] = -np.inf
+    truth = index.ids[selection.top_k_rows(exact, k_eff)[0]]
+    found, _ = index.search_batch(queries, k_eff, query_ids=query_ids)
+    return sum(len(np.intersect1d(t, f)) for t, f in zip(truth, found)) / truth.size
+
+def build_index(ids, vectors, config=None):
+    """Builds an index of the configured backend over (ids, vectors)."""
+    config = config or get_vector_index_settings()
+    dim = np.asarray(vectors).shape[1]
+    if config['backend'] == 'ivf':
+        index = IVFIndex(dim, n_lists=config['n_lists'], n_probe=config['n_probe'], seed=config['seed'])
+    else:
+        index = ExactIndex(dim)
+    index.add(ids, vectors)
+    return index
+
+def sync_index(index, ids, vectors, config=None, rebuild=False):
+    """
+    Brings an existing index in line with (ids, vectors): removes ids that are
+    gone, adds new ones and updates changed vectors. An IVF index keeps its
+    centroids, and is only retrained if the sync leaves it too far from its
+    training size. Builds a new index (retraining IVF centroids) when there is
+    none, its backend or dimension changed, an IVF index has already drifted too
+    far, or `rebuild` is set because every vector was re-derived (e.g. the
+    feature scaling was refit). Logs the measured recall of an IVF index.
+    """
+    config = config or get_vector_index_settings()
+    ids = np.asarray(ids, dtype=np.int32)
+    vectors = _normalize(vectors)
+    if (
+        rebuild or index is None or index.backend != config['backend'] or index.dim != vectors.shape[1]
+        or (isinstance(index, IVFIndex) and index.needs_retrain())
+    ):
+        index = build_index(ids, vectors, config)
+        _log_recall(index, config)
+        return index
+
+    removed = index.remove(np.setdiff1d(index.ids, ids))
+    known = np.fromiter((place_id in index for place_id in ids.tolist()), dtype=bool, count=len(ids))
+    rows = np.fromiter((index._rows[place_id] for place_id in ids[known].tolist()), dtype=np.int64)
+    changed = np.abs(index.vectors[rows] - vectors[known]).max(axis=1) > 1e-6 if len(rows) else np.zeros(0, bool)
+    if changed.any():
+        index.update(ids[known][changed], vectors[known][changed])
+    index.add(ids[~known], vectors[~known])
+    logger.info(
+        f"Synced {index.backend} vector index: {removed} removed, {int((~known).sum())} added, "
+        f"{int(changed.sum())} updated, {len(index)} total."
+    )
+    if isinstance(index, IVFIndex) and index.needs_retrain():
+        index.train()
+    _log_recall(index, config)
+    return index
+
+def _log_recall(index, config):
+    sample_size = config.get('recall_sample_size', 200)
+    if index.backend != 'ivf' or not sample_size:
+        return
+    recall = measure_recall(index, k=10, sample_size=sample_size, seed=config.get('seed', 0))
+    if recall is not None:
+        logger.info(f"IVF vector index recall@10 against exact search on up to {sample_size} sampled places: {recall:.3f}")
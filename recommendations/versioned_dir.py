@@ -0,0 +1,65 @@
+"""
+Versioned directories published behind a `CURRENT` pointer, shared by the data
+snapshots, the content feature store and the exported Thai2Vec vectors.
+
+A version is fully written under a temporary name and renamed into place before
+`CURRENT` is swapped, so readers only ever see complete versions. Processes that
+still have a pruned version memory-mapped keep working: unlinked files stay valid
+until unmapped.
+
+Layout:
+    <root>/CURRENT                      id of the published version
+    <root>/<version>/...
+"""
+import os
+import shutil
+
+CURRENT_NAME = 'CURRENT'
+
+
+def publish(root, version, write, keep, is_version=None):
+    """
+    Calls `write(directory)` to fill a new version directory, publishes it as
+    `CURRENT` and prunes all but the newest `keep` versions.
+
+    Args:
+        root (str): Directory holding the versions and the pointer.
+        version (str): Sortable, unique version id (see `snapshot.new_generation_id`).
+        write (callable): Writes the version's files into the directory it is given.
+        keep (int): Versions to keep on disk; 0 or less keeps all.
+        is_version (callable): Optional predicate on a directory path telling the
+                               versions apart from other directories under `root`.
+    """
+    os.makedirs(root, exist_ok=True)
+    tmp_dir = os.path.join(root, f'.tmp-{version}')
+    try:
+        os.makedirs(tmp_dir)
+        write(tmp_dir)
+        os.rename(tmp_dir, os.path.join(root, version))
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    current_tmp = os.path.join(root, f'.{CURRENT_NAME}-{version}')
+    with open(current_tmp, 'w', encoding='utf-8') as f:
+        f.write(version)
+    os.replace(current_tmp, os.path.join(root, CURRENT_NAME))
+    prune(root, keep, is_version)
+
+def prune(root, keep, is_version=None):
+    """Removes all but the newest `keep` versions under `root`."""
+    is_version = is_version or os.path.isdir
+    versions = sorted(
+        name for name in os.listdir(root)
+        if not name.startswith('.') and is_version(os.path.join(root, name))
+    )
+    for name in versions[:-keep] if keep > 0 else []:
+        shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+def current(root):
+    """Id of the published version under `root`, or None if nothing is published."""
+    try:
+        with open(os.path.join(root, CURRENT_NAME), encoding='utf-8') as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
@@ -26,11 +26,17 @@ app.conf.beat_schedule = {
         'task': 'recommendations.tasks.generate_batch_recommendations',
         'schedule': crontab(minute=0, hour='*/6'),
     },
-    # Global rebuild every 30 minutes
+    # Global rebuild every 30 minutes; also the consistency pass for the
+    # incrementally patched user neighbors (see user_based.update_dirty_user_neighbors)
     'schedule-global-rebuild-every-30-minutes': {
         'task': 'recommendations.tasks.schedule_global_rebuild_if_needed',
         'schedule': crontab(minute='*/30'),
     },
+    # Patch the cached neighbors of users whose scores changed in the last minute
+    'update-dirty-user-neighbors-every-minute': {
+        'task': 'recommendations.tasks.update_dirty_user_neighbors',
+        'schedule': crontab(),
+    },
 }
 
 # -----------------------------
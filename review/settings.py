@@ -198,7 +198,32 @@ RECOMMENDATION_SETTINGS = {
     'DECAY_ALPHA': 0.99,
     'USER_BASED_SETTINGS': {
         'min_similarity': 0.1, # ลองปรับค่าให้ต่ำลง
+        'top_k_neighbors': 50, # neighbors kept per user by the similarity build
+        'build_workers': 1, # similarity build processes; 1 = serial. Pools run only from single-threaded processes (e.g. a --pool=solo Celery worker)
+        'build_block_size': 500, # user rows per similarity block
+        'neighbor_backend': 'exact', # 'exact' or 'ivf' (approximate, for very large user bases)
+        'incremental_updates': True, # patch changed users' neighbors every minute; full rebuilds stay periodic
+        'ANN': {
+            'n_lists': None, # k-means lists; None = sqrt(active users)
+            'n_probe': 8, # lists searched per list: higher -> better recall, slower build
+            'seed': 0,
+            'recall_sample_size': 200, # users checked against exact search after each build; 0 disables
+        },
 },
+    # Collaborative slot of the hybrid: 'user_based', 'item_based' or 'als'.
+    'COLLABORATIVE_COMPONENT': 'user_based',
+    'ITEM_BASED_SETTINGS': {
+        'top_k_neighbors': 50, # similar places kept per place
+        'build_block_size': 500,
+    },
+    'ALS_SETTINGS': {
+        'rank': 64, # latent factors per user / place (float32)
+        'regularization': 0.1,
+        'alpha': 20.0, # confidence = 1 + alpha * interaction score
+        'iterations': 15, # cold-start training
+        'warm_start_iterations': 3, # retrains starting from the previous factors
+        'seed': 0,
+    },
     'POPULARITY_WEIGHTS': {
         'rating': 0.3,
         'reviews': 0.2,
@@ -213,16 +238,58 @@ RECOMMENDATION_SETTINGS = {
         "medium_weight": (0.3, 0.4, 0.3),
         "high_weight": (0.6, 0.4, 0.0)
     },
+    'BATCH': {
+        'active_days': 7, # users who logged in within this window are batch-scored
+        'block_size': 1000, # users scored per matrix block
+        'write_chunk_size': 1000, # cache entries per set_many round trip
+    },
+    # Place vector search used by content-based scoring and the similar-places build.
+    'VECTOR_INDEX': {
+        'backend': 'exact', # 'exact' or 'ivf' (approximate, for catalogues of tens of thousands of places)
+        'n_lists': None, # k-means lists; None = sqrt(places)
+        'n_probe': 8, # lists searched per query: higher -> better recall, slower search
+        'seed': 0,
+        'recall_sample_size': 200, # places checked against exact search after each index sync; 0 disables
+        'scaler_tolerance': 0.05, # feature scaling is refit (and the index rebuilt) once a fresh fit moves this many std devs
+    },
+    'SIMILAR_PLACES': {
+        'top_k': 20, # similar places stored per place (the most any caller asks for)
+        'block_size': 1000, # places per similarity block in the bulk build
+    },
     'CACHING': {
 #        'USER_RECS_KEY_TEMPLATE': 'recommendations_{user_id}_{filter_interacted}_v3',
-        'SIMILAR_PLACES_KEY_TEMPLATE': 'place_{place_id}_similar_places_v2',
         'BATCH_RECS_KEY_TEMPLATE': 'batch_recs_{user_id}_v1',
         'BOOST_SCORES_KEY_TEMPLATE': 'user:{user_id}:boost_scores',
         'USER_INTERACTIONS_TIMEOUT': 3600 * 3, # 3 hours
         'GLOBAL_CACHE_TIMEOUT': 3600 * 6, #62 hours
-        'SIMILAR_PLACES_TIMEOUT': 3600 * 6, # 6 hours
+        'FULL_DATA_REFRESH_INTERVAL': 3600 * 6, # delta refreshes in between
+        'DELTA_OVERLAP_SECONDS': 300, # re-read window behind each high-water mark, for rows committed late
         'LOCK_TIMEOUT': 300 # 5 minutes
-    }
+    },
+    # Cleaned data is published as memory-mapped columnar files shared by all
+    # processes on the host; Redis then only stores the generation id.
+    'SNAPSHOT': {
+        'ENABLED': True,
+        'ROOT': os.path.join(BASE_DIR, 'recommendation_data', 'snapshots'),
+        'KEEP': 3,
+    },
+    # Versioned fits of the content feature pipeline, memory-mapped by every
+    # process on the host; the cache holds a copy and the published version id.
+    'FEATURE_STORE': {
+        'ENABLED': True,
+        'ROOT': os.path.join(BASE_DIR, 'recommendation_data', 'features'),
+        'KEEP': 3,
+    },
+    'TEXT_PROCESSING': {
+        'tokenize_workers': 1, # description tokenization processes; 1 = serial. Pools run only from single-threaded processes
+        'tokenize_chunk_size': 200, # descriptions per pool task
+    },
+    # Word vectors exported once by `manage.py export_thai2vec` and loaded with
+    # mmap='r', so every web and Celery process shares the same page-cache pages.
+    'THAI2VEC': {
+        'PATH': os.path.join(BASE_DIR, 'recommendation_data', 'thai2vec', 'thai2vec.kv'), # exports live in <dir>/<version>/thai2vec.kv; <dir>/CURRENT names the published one
+        'MMAP': True,
+    },
 }
 
 # Custom settings for recommendation ordering
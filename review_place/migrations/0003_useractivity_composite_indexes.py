@@ -0,0 +1,22 @@
+# Generated by Django 5.2.5 on 2026-10-17 02:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('review_place', '0002_notification'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='useractivity',
+            index=models.Index(fields=['activity_type', 'content_type', 'object_id', 'user'], name='useractivity_type_object_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useractivity',
+            index=models.Index(fields=['user', 'activity_type', 'timestamp'], name='useractivity_user_type_ts_idx'),
+        ),
+    ]
@@ -241,6 +241,13 @@ class UserActivity(models.Model):
         ordering = ['-timestamp']
         verbose_name = "User Activity"
         verbose_name_plural = "User Activities"
+        indexes = [
+            # Place-scoped reads by type: the recommendation loaders probe it once per existing
+            # place id (object_id IN the Place ids), and popularity analytics group on it.
+            models.Index(fields=['activity_type', 'content_type', 'object_id', 'user'], name='useractivity_type_object_idx'),
+            # Per-user history by type and time (dynamic hybrid weights, delta loads).
+            models.Index(fields=['user', 'activity_type', 'timestamp'], name='useractivity_user_type_ts_idx'),
+        ]
 
     def __str__(self):
         return f'{self.user.username} - {self.get_activity_type_display()} on {self.timestamp.strftime("%Y-%m-%d %H:%M")}'
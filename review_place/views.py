@@ -621,25 +621,30 @@ class AdminActivityView(AdminActivityMixin, LoginRequiredMixin, View):
 
     def _get_content_popularity_data(self, activities_qs):
         """Determines the most popular content based on views and shares."""
+        # Group on the content_type_id column itself so the query uses the
+        # (activity_type, content_type, object_id, user) index without a join.
+        place_type_id = ContentType.objects.get_for_model(Place).id
+        review_type_id = ContentType.objects.get_for_model(Review).id
         content_popularity = (
             activities_qs.filter(activity_type__in=['view', 'share'])
-            .values('content_type__model', 'object_id')
+            .values('content_type_id', 'object_id')
             .annotate(count=Count('id'))
             .order_by('-count')[:10]
         )
-        place_ids = [item['object_id'] for item in content_popularity if item['content_type__model'] == 'place']
-        review_ids = [item['object_id'] for item in content_popularity if item['content_type__model'] == 'review']
+        place_ids = [item['object_id'] for item in content_popularity if item['content_type_id'] == place_type_id]
+        review_ids = [item['object_id'] for item in content_popularity if item['content_type_id'] == review_type_id]
         places = Place.objects.in_bulk(place_ids)
         reviews = Review.objects.in_bulk(review_ids)
         content_popularity_data = []
         for item in content_popularity:
-            if item['content_type__model'] == 'place':
+            if item['content_type_id'] == place_type_id:
                 name = places.get(item['object_id'], 'Unknown Place').place_name
-            elif item['content_type__model'] == 'review':
+            elif item['content_type_id'] == review_type_id:
                 review_obj = reviews.get(item['object_id'])
                 name = f"Review for {review_obj.place.place_name}" if review_obj else "Unknown Review"
             else:
-                name = f"{item['content_type__model']} #{item['object_id']}"
+                model_name = ContentType.objects.get_for_id(item['content_type_id']).model if item['content_type_id'] else 'unknown'
+                name = f"{model_name} #{item['object_id']}"
             content_popularity_data.append({'name': name, 'count': item['count']})
         return content_popularity_data
 